@@ -1,84 +1,91 @@
 import os
+import time
 import streamlit as st
 import pandas as pd
 import json
-from docx import Document
-from youtube_summarizer import summarize_youtube_video
-from document_summarizer import generate_summary_from_file
-from video_summarizer import get_summary_from_video
-from datetime import datetime
-from openai import OpenAI
-import re
-from docx.enum.text import WD_PARAGRAPH_ALIGNMENT
-from tavily import TavilyClient
-from youtube_fetch import main as youtube_main
-from reddit_fetch import main as reddit_main
-from urls_fetch import main as urls_main
-from gpt import main as gpt_main
-from claude import main as claude_main
 from dotenv import load_dotenv
+import job_queue
+import metrics
+import asr_pool
+import profiling
+import output_budget
+import guide_store
+from providers import get_search_provider
+from workspace import create_workspace, get_workspace_paths, cleanup_old_workspaces
+from ingest import save_upload
+from document_summarizer import sniff_format
 
 load_dotenv()
 # Configuration
 os.environ["STREAMLIT_WATCH_USE_POLLING"] = "true"
 
-# API Keys and Clients
-openai_api_key = os.getenv("OPENAI_API_KEY")
-client = OpenAI(api_key=openai_api_key)
-TAVILY_API_KEY = os.getenv("TAVILY_API_KEY")
-tavily_client = TavilyClient(api_key=TAVILY_API_KEY)
-
-# Setup directories
-UPLOAD_DIR = "uploads"
-os.makedirs(UPLOAD_DIR, exist_ok=True)
-uploaded_filenames = []
-
-# Helper Functions for Summary Generator
-def add_formatted_run(paragraph, text):
-    pattern = re.compile(r'(\*\*.*?\*\*|\*.*?\*\*)')
-    pos = 0
-    for match in pattern.finditer(text):
-        start, end = match.span()
-        if pos < start:
-            paragraph.add_run(text[pos:start])
-        matched_text = match.group()
-        cleaned_text = matched_text.strip('*')
-        run = paragraph.add_run(cleaned_text)
-        run.bold = True
-        pos = end
-    if pos < len(text):
-        paragraph.add_run(text[pos:])
-
-def write_to_word(text, output_file="generated_summary.docx"):
-    doc = Document()
-    title = doc.add_heading("Generated Topic-Wise Plan", level=1)
-    title.alignment = WD_PARAGRAPH_ALIGNMENT.CENTER
-
-    lines = text.split("\n")
-    for line in lines:
-        line = line.strip()
-        if not line:
-            continue
-
-        if line.startswith("### "):
-            doc.add_heading(line[4:], level=3)
-        elif line.startswith("## "):
-            doc.add_heading(line[3:], level=2)
-        elif line.startswith("# "):
-            doc.add_heading(line[2:], level=1)
-        elif re.match(r"^Chapter \d+: ", line, re.IGNORECASE):
-            doc.add_heading(line, level=2)
-        elif line.startswith(("-", "*", "•")):
-            p = doc.add_paragraph(style="List Bullet")
-            add_formatted_run(p, line[1:].strip())
-        elif re.match(r"^\d+\.", line):
-            p = doc.add_paragraph(style="List Number")
-            add_formatted_run(p, line.strip())
-        else:
-            p = doc.add_paragraph()
-            add_formatted_run(p, line)
-
-    doc.save(output_file)
+JOB_POLL_SECONDS = 2
+# Job kinds shown in another kind's slot of the page
+JOB_STATE_KEYS = {"bulk_summary": "summary_job"}
+
+# Background job workers (started once per server process)
+@st.cache_resource
+def start_job_workers():
+    cleanup_old_workspaces()
+    if os.getenv("JOB_WORKERS_AUTOSTART", "true").lower() != "true":
+        return []
+    return job_queue.start_workers(int(os.getenv("JOB_WORKERS", "2")))
+
+# Warm ASR worker pool, so transcription never runs in the Streamlit or job worker processes
+@st.cache_resource
+def start_asr_pool():
+    if os.getenv("ASR_POOL_AUTOSTART", "true").lower() != "true":
+        return None
+    return asr_pool.start_pool_process()
+
+# Prometheus-style /metrics endpoint (spans from all job workers), enabled by METRICS_PORT
+@st.cache_resource
+def start_metrics_endpoint():
+    port = os.getenv("METRICS_PORT")
+    return metrics.start_metrics_server(int(port)) if port else None
+
+def attach_job(state_key):
+    """Adopt a job id from the URL (?<state_key>=...) so a refreshed page reattaches to it."""
+    if not st.session_state.get(state_key) and state_key in st.query_params:
+        st.session_state[state_key] = st.query_params[state_key]
+
+def track_job(state_key, job_id):
+    st.session_state[state_key] = job_id
+    st.query_params[state_key] = job_id
+
+def forget_job(state_key):
+    st.session_state[state_key] = ""
+    if state_key in st.query_params:
+        del st.query_params[state_key]
+
+def show_job(job_id):
+    """Render status, progress and log of a job. Returns the job dict (or None)."""
+    job = job_queue.get_job(job_id)
+    if job is None:
+        st.warning(f"⚠ Unknown job id: {job_id}")
+        return None
+    st.caption(f"Job `{job_id}` — {job['status']}")
+    st.progress(job["progress"], text=job["message"])
+    with st.expander("Job log", expanded=job["status"] in job_queue.ACTIVE_STATUSES):
+        for event in job_queue.get_job_events(job_id):
+            st.write(event["message"])
+    if job["status"] == "failed":
+        st.error(f"❌ {job['message']}")
+    models = (job.get("result") or {}).get("models") if job["status"] == "done" else None
+    if models:
+        with st.expander("🧭 Models used"):
+            st.dataframe(pd.DataFrame([
+                {"stage": stage, "models": ", ".join(f"{m} ×{n}" for m, n in usage["models"].items()),
+                 "calls": usage["calls"], "latency_s": usage["latency_s"], "tokens_in": usage["tokens_in"],
+                 "tokens_out": usage["tokens_out"], "cost_usd": usage["cost_usd"]}
+                for stage, usage in models.items()]))
+    profiles = profiling.list_profiles(job_id)
+    if profiles and job["status"] not in job_queue.ACTIVE_STATUSES:
+        with st.expander("🔬 Profiles"):
+            for profile_path in profiles:
+                with open(profile_path, "rb") as f:
+                    st.download_button(os.path.basename(profile_path), f, file_name=os.path.basename(profile_path), key=f"profile_{profile_path}")
+    return job
 
 # Helper Functions for Study Plan Generator
 def search_and_extract(prompt, category, include_domains=None, exclude_domains=None):
@@ -86,8 +93,8 @@ def search_and_extract(prompt, category, include_domains=None, exclude_domains=N
     if category == "YouTube Videos":
         max_result = 5
 
-    response = tavily_client.search(
-        query=prompt,
+    response = get_search_provider().search(
+        prompt,
         search_depth="advanced",
         max_results=max_result,
         include_answer='advanced',
@@ -100,6 +107,41 @@ def search_and_extract(prompt, category, include_domains=None, exclude_domains=N
 
 # App Configuration
 st.set_page_config(page_title="Smart Academic Assistant", layout="centered")
+start_job_workers()
+start_asr_pool()
+start_metrics_endpoint()
+
+# Every browser session gets its own workspace so concurrent users never share files
+if "workspace" not in st.session_state:
+    st.session_state.workspace = create_workspace()
+paths = get_workspace_paths(st.session_state.workspace)
+
+# Sidebar: reattach to a job started earlier (e.g. from another tab or before a refresh)
+with st.sidebar:
+    st.subheader("🔁 Reattach to a Job")
+    reattach_id = st.text_input("Job ID", placeholder="e.g. 3f9c2a7b1d4e")
+    if st.button("Reattach") and reattach_id.strip():
+        reattach_job = job_queue.get_job(reattach_id.strip())
+        if reattach_job is None:
+            st.warning("⚠ No job found with that ID.")
+        else:
+            track_job(JOB_STATE_KEYS.get(reattach_job["kind"], f"{reattach_job['kind']}_job"), reattach_job["id"])
+            st.success(f"✔ Attached to {reattach_job['kind']} job — open the matching feature.")
+
+    asr_workers = asr_pool.pool_health()
+    if asr_workers is not None:
+        busy = sum(w["busy"] for w in asr_workers.values())
+        st.caption(f"🎙️ ASR pool: {len(asr_workers)} workers, {busy} busy")
+
+    st.subheader("⏱️ Output Length")
+    st.radio("Summary and study-plan length", options=list(output_budget.MODES), key="output_mode",
+             index=list(output_budget.MODES).index(output_budget.current_mode()),
+             format_func=output_budget.MODE_LABELS.get,
+             help="Shorter output finishes faster and costs less; exhaustive keeps the original, unlimited prompts.")
+
+    st.subheader("🔬 Profiling")
+    st.checkbox("Profile my jobs", key="profile_jobs",
+                help="Record a flamegraph-compatible stack profile and top allocations for the hot paths of new jobs.")
 
 # Main App Title and Feature Selection
 st.title("🎓 Smart Academic Assistant")
@@ -113,6 +155,7 @@ feature_choice = st.radio(
 )
 
 st.divider()
+job_active = False
 
 # FEATURE 1: SUMMARY GENERATOR
 if feature_choice == "📝 Summary Generator":
@@ -126,6 +169,12 @@ if feature_choice == "📝 Summary Generator":
         st.session_state.summary_path = ""
     if "timestamp" not in st.session_state:
         st.session_state.timestamp = ""
+    if "summary_job" not in st.session_state:
+        st.session_state.summary_job = ""
+    if "reformat_job" not in st.session_state:
+        st.session_state.reformat_job = ""
+    attach_job("summary_job")
+    attach_job("reformat_job")
     
     # Clear study plan session states when in summary mode
     if "search_results" in st.session_state:
@@ -148,168 +197,105 @@ if feature_choice == "📝 Summary Generator":
     # === Optional Input: Document Upload ===
     use_docs = st.checkbox("📄 I want to upload documents (PDF/DOCX)")
     document_files = []
+    bulk_mode = False
     if use_docs:
         st.subheader("📄 Upload Document Files")
         document_files = st.file_uploader("Upload documents", type=["pdf", "docx"], accept_multiple_files=True)
+        bulk_mode = st.checkbox("📦 Bulk mode (Batch API)",
+                                help="Send all document chunks as one batch job: much higher throughput and half the "
+                                     "token price, but results can take from minutes up to 24 hours.")
 
-    # === Generate Summaries ===
+    # === Generate Summaries (queued as a background job) ===
     if st.button("🚀 Generate Summary"):
-        doc = Document()
-        doc.add_heading("Merged Summaries", level=1)
-        added_any_summary = False
-
-        for video_file in video_files:
-            video_path = os.path.join(UPLOAD_DIR, video_file.name)
-            with open(video_path, "wb") as f:
-                f.write(video_file.read())
-            st.write(f"🔄 Generating summary for video: {video_file.name}")
-            summary = get_summary_from_video(video_path)
-            if summary:
-                doc.add_heading("Video File Summary", level=2)
-                doc.add_heading(f"File: {video_file.name}", level=2)
-                doc.add_paragraph(summary)
-                added_any_summary = True
-                st.success(f"✔ Summary added for video: {video_file.name}")
-            else:
-                st.warning(f"⚠ No summary generated for video: {video_file.name}")
-
-        count = 1
-        for url in youtube_urls:
-            if url.strip():
-                st.write(f"🔄 Generating summary for YouTube URL-{count}")
-                summary = summarize_youtube_video(url)
-                if summary:
-                    doc.add_heading("YouTube Video Summary", level=2)
-                    doc.add_heading(f"URL: {url}", level=2)
-                    doc.add_paragraph(summary)
-                    added_any_summary = True
-                    st.success(f"✔ Summary added for: URL-{count}")
-                    count += 1
-                else:
-                    st.warning(f"⚠ No summary for: {url}")
-
+        # Streamed to disk in fixed-size chunks; the content hash keys the summary cache
+        videos = [save_upload(video_file, paths["uploads"]) for video_file in video_files]
+        documents = []
         for doc_file in document_files:
-            doc_path = os.path.join(UPLOAD_DIR, doc_file.name)
-            with open(doc_path, "wb") as f:
-                f.write(doc_file.read())
-            st.write(f"🔄 Generating summary for document: {doc_file.name}")
-            summary = generate_summary_from_file(doc_path)
-            if summary:
-                doc.add_heading("Document Summary", level=2)
-                doc.add_heading(f"File: {doc_file.name}", level=2)
-                doc.add_paragraph(summary)
-                added_any_summary = True
-                st.success(f"✔ Summary added for document: {doc_file.name}")
-            else:
-                st.warning(f"⚠ No summary generated for document: {doc_file.name}")
-
-        if added_any_summary:
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            output_path = os.path.join(UPLOAD_DIR, f"merged_summary_{timestamp}.docx")
-            doc.save(output_path)
-
-            # Store in session state
-            st.session_state.summary_generated = True
-            st.session_state.summary_path = output_path
-            st.session_state.timestamp = timestamp
-            st.success("✅ Summary generation complete!")
+            # Trust the file's magic bytes, not its extension
+            if sniff_format(doc_file.getbuffer()) is None:
+                st.warning(f"⚠ Skipping {doc_file.name}: not a valid PDF or DOCX file.")
+                continue
+            documents.append(save_upload(doc_file, paths["uploads"]))
+
+        job_id = job_queue.submit_job("bulk_summary" if bulk_mode and documents else "summary", {
+            "workspace": st.session_state.workspace,
+            "videos": videos,
+            "youtube_urls": youtube_urls,
+            "documents": documents,
+            "profile": st.session_state.profile_jobs,
+            "output_mode": st.session_state.output_mode,
+        })
+        track_job("summary_job", job_id)
+        forget_job("reformat_job")
+        st.session_state.summary_generated = False
+
+    if st.session_state.summary_job:
+        job = show_job(st.session_state.summary_job)
+        if job and job["status"] in job_queue.ACTIVE_STATUSES:
+            job_active = True
+        elif job and job["status"] == "done":
+            result = job["result"]
+            for warning in result.get("warnings", []):
+                st.warning(warning)
+            if result.get("summary_path"):
+                st.session_state.summary_generated = True
+                st.session_state.summary_path = result["summary_path"]
+                st.session_state.timestamp = result["timestamp"]
+                st.success("✅ Summary generation complete!")
 
     # === GPT Reformatting ===
     if st.session_state.summary_generated:
         st.subheader("✨ Enhance Summary with GPT")
         selected_model = st.selectbox(
                 "Choose GPT Model",
-                options=["gpt-4.1-mini", "gpt-5-mini", "gpt-5"],
-                index=0
+                options=["auto", "gpt-4.1-mini", "gpt-5-mini", "gpt-5"],
+                index=0,
+                help="auto: the model router picks the model from the summary's size and the cost/latency budget"
             )
 
+        # Sources added after a guide exists are merged into it section by section instead of rebuilding it
+        guide = guide_store.load_guide(paths)
+        rebuild = False
+        if guide["sections"]:
+            added = guide_store.new_sources(guide, guide_store.load_summary_sources(st.session_state.summary_path))
+            st.caption(f"📖 This workspace has a guide built from {len(guide['sources'])} source(s); "
+                       f"{len(added)} new source(s) will be merged into the sections they affect.")
+            rebuild = st.checkbox("Rebuild the guide from all sources", value=False)
+        if guide["sections"] or guide["sources"]:
+            if st.button("🗑️ Start a new guide"):
+                guide_store.clear_guide(paths)
+                st.rerun()
 
         if st.button("🔄 Reformat Using GPT"):
-            with st.spinner("🧠 GPT is processing and enhancing the summary..."):
-                try:
-                    with open(st.session_state.summary_path, "rb") as f:
-                        docx_file = Document(f)
-                        full_text = "\n".join([para.text for para in docx_file.paragraphs if para.text.strip()])
-
-                    if not full_text.strip():
-                        st.error("❌ Summary content is empty. Cannot process.")
-                    else:
-                        prompt = f"""
-        You are an expert tutor. Merge these study materials summaries into one complete learning guide.
-
-        TASK:
-        1. Combine all notes/chapters/topics into a single, organized summary
-        2. Arrange topics in logical learning order (basics → advanced)
-        3. Include ALL points from every source
-        4. Highlight any conflicts between sources and explain why they exist
-        5. Add your own knowledge to fill gaps and provide context
-        6. Ensure the final summary is comprehensive and easy to follow
-
-        note: generate a detailed summary as much as tokens allow 
-
-        STRUCTURE:
-        ## FUNDAMENTALS
-        Core concepts and definitions
-
-        ## KEY TOPICS  
-        Main ideas with examples and applications
-
-        ## ADVANCED CONCEPTS
-        Complex topics and expert insights
-
-        ## SUMMARY
-        Key takeaways and important points to remember
-
-        Make it easy to understand and study from. Don't skip anything.
-
-        Study Material summaries:
-        {full_text}
-        Now write the final, detailed, well-organized explanation """
-
-                        if selected_model == "gpt-4.1-mini":
-                            response = client.chat.completions.create(
-                                model="gpt-4.1-mini",
-                                messages=[
-                                    {"role": "system", "content": "You are an expert summarizer and tutor."},
-                                    {"role": "user", "content": prompt}
-                                ],
-                                max_tokens=10000,
-                                temperature=0.5
-                            )
-                            formatted_content = response.choices[0].message.content.strip()
-                        else:
-                            response = client.responses.create(
-                                        model=selected_model,
-                                        input=[{"role": "user", "content": prompt}],
-                                        text={"verbosity": "high"},
-                                        reasoning={"effort": "low"},
-
-                                    )
-
-                            formatted_content = response.output_text
-                        gpt_path = os.path.join(UPLOAD_DIR, f"enhanced_summary.docx")
-
-                        write_to_word(formatted_content, gpt_path)
-
-                        with open(gpt_path, "rb") as f:
-                            st.download_button(
-                                label="📥 Download GPT-Enhanced Summary",
-                                data=f,
-                                file_name="Formatted_summary.docx",
-                                mime="application/vnd.openxmlformats-officedocument.wordprocessingml.document"
-                            )
-                        st.success("✅ GPT-enhanced summary is ready!")
-
-                        try:
-                            for filename in os.listdir(UPLOAD_DIR):
-                                file_path = os.path.join(UPLOAD_DIR, filename)
-                                if os.path.isfile(file_path):
-                                    os.remove(file_path)
-                            st.info("🧹 Temporary uploaded files have been deleted.")
-                        except Exception as e:
-                            st.warning(f"⚠ Error during cleanup: {e}")
-                except Exception as e:
-                    st.error(f"❌ GPT API Error: {e}")
+            job_id = job_queue.submit_job("reformat", {
+                "workspace": st.session_state.workspace,
+                "summary_path": st.session_state.summary_path,
+                "model": selected_model,
+                "rebuild": rebuild,
+                "profile": st.session_state.profile_jobs,
+                "output_mode": st.session_state.output_mode,
+            })
+            track_job("reformat_job", job_id)
+
+        if st.session_state.reformat_job:
+            job = show_job(st.session_state.reformat_job)
+            if job and job["status"] in job_queue.ACTIVE_STATUSES:
+                job_active = True
+            elif job and job["status"] == "done":
+                gpt_path = job["result"]["enhanced_path"]
+                if os.path.exists(gpt_path):
+                    with open(gpt_path, "rb") as f:
+                        st.download_button(
+                            label="📥 Download GPT-Enhanced Summary",
+                            data=f,
+                            file_name="Formatted_summary.docx",
+                            mime="application/vnd.openxmlformats-officedocument.wordprocessingml.document"
+                        )
+                    st.success("✅ GPT-enhanced summary is ready!")
+                    merge = job["result"].get("merge", {})
+                    if merge.get("mode") == "incremental":
+                        st.caption(f"🧩 Merged {len(merge['sources'])} new source(s): rewrote "
+                                   f"{len(merge.get('sections', []))} section(s), added {len(merge.get('new_sections', []))}.")
 
 # FEATURE 2: STUDY PLAN GENERATOR
 elif feature_choice == "🎯 Study Plan Generator":
@@ -318,6 +304,12 @@ elif feature_choice == "🎯 Study Plan Generator":
     # Initialize session state for study plan generator
     if "uploaded_files" not in st.session_state:
         st.session_state.uploaded_files = []
+    if "saved_uploads" not in st.session_state:
+        st.session_state.saved_uploads = {}  # (name, size) -> save_upload result, so reruns don't re-save
+    if "study_plan_job" not in st.session_state:
+        st.session_state.study_plan_job = ""
+    attach_job("study_plan_job")
+    study_plan_path = paths["study_plan"]
     
     # Clear summary session states when in study plan mode
     if "summary_generated" in st.session_state:
@@ -378,19 +370,25 @@ elif feature_choice == "🎯 Study Plan Generator":
         files = st.file_uploader("Upload PDF or DOCX files", type=["pdf", "docx"], accept_multiple_files=True)
 
         if files:
-            os.makedirs("data", exist_ok=True)
-
             for f in files:
-                file_path = os.path.join("data", f.name)
-                with open(file_path, "wb") as out_file:
-                    out_file.write(f.read())
-                uploaded_filenames.append(f.name)
-                st.markdown(f"- ✅ Saved: `{file_path}`")
-
-            st.session_state.uploaded_files = uploaded_filenames
+                upload_key = (f.name, f.size)
+                saved = st.session_state.saved_uploads.get(upload_key)
+                if saved is None:
+                    saved = save_upload(f, paths["data"])
+                    st.session_state.saved_uploads[upload_key] = saved
+                if f.name not in st.session_state.uploaded_files:
+                    st.session_state.uploaded_files.append(f.name)
+                if saved["duplicate"]:
+                    st.markdown(f"- ♻️ Already stored: `{f.name}`")
+                else:
+                    st.markdown(f"- ✅ Saved: `{f.name}`")
 
         # Submit and Save
         st.divider()
+        force_stages = st.multiselect(
+            "Force re-run stages (completed stages with unchanged inputs are reused)",
+            options=["youtube", "reddit", "web", "gpt", "claude"],
+        )
         if st.button("✅ Submit "):
             # Combine Tavily + manual
             def parse_links(text): return [url.strip() for url in text.split(",") if url.strip()]
@@ -402,40 +400,39 @@ elif feature_choice == "🎯 Study Plan Generator":
                 "answers": st.session_state["answers"]  # Add this line
             }
 
-            # ---- Run the fetchers after saving ----
-            st.divider()
-            st.subheader("🚀 Running Data Fetch Modules")
-
-            # Ensure folders exist
-            os.makedirs("logs", exist_ok=True)
-            os.makedirs("data", exist_ok=True)
-
-            # Call YouTube Fetch
-            st.write("▶️ Running YouTube transcript fetcher...")
-            youtube_main(final_data["youtube"])
-
-            # Call Reddit Fetch
-            st.write("▶️ Running Reddit post fetcher...")
-            reddit_main(final_data["reddit"])
-
-            # Call Tavily Web Extractor
-            st.write("▶️ Running Webpage text extractor...")
-            urls_main(final_data["other"],final_data["answers"]["web"])
-
-            st.write("🧠 Generating topic insights with GPT...")
-            gpt_main(certificate_name=user_input)
-            
-            # === Run CLAUDE.py ===
-            st.write("📚 Generating final study plan with Claude...")
-            claude_main(certificate_name=user_input)
-
-            # Final Output Info
-            st.success("📝 Study Plan Generated: `generated_study_plan.docx`")
-
+            # ---- Run the fetchers, GPT and Claude in a background job ----
+            job_id = job_queue.submit_job("study_plan", {
+                "workspace": st.session_state.workspace,
+                "certificate_name": user_input,
+                "final_data": final_data,
+                "force_stages": force_stages,
+                "profile": st.session_state.profile_jobs,
+                "output_mode": st.session_state.output_mode,
+            })
+            track_job("study_plan_job", job_id)
+
+    if st.session_state.study_plan_job:
+        st.divider()
+        st.subheader("🚀 Running Data Fetch Modules")
+        job = show_job(st.session_state.study_plan_job)
+        if job and job["status"] in job_queue.ACTIVE_STATUSES:
+            job_active = True
+        elif job and job["status"] == "done":
+            study_plan_path = job["result"]["study_plan_path"]
+            for warning in job["result"].get("warnings", []):
+                st.warning(warning)
+            st.success(f"📝 Study Plan Generated: `{os.path.basename(study_plan_path)}`")
+        elif job and job["status"] == "failed":
+            if st.button("🔁 Retry (completed stages are skipped)"):
+                retry_params = dict(job["params"], force_stages=[])
+                track_job("study_plan_job", job_queue.submit_job("study_plan", retry_params))
+                st.rerun()
+
+    if "search_results" in st.session_state or st.session_state.study_plan_job:
         # Placeholder for future output
         st.subheader("📦 Final Output")
 
-        docx_path = "generated_study_plan.docx"
+        docx_path = study_plan_path
         if os.path.exists(docx_path):
             with open(docx_path, "rb") as docx_file:
                 st.download_button(
@@ -443,4 +440,9 @@ elif feature_choice == "🎯 Study Plan Generator":
                     data=docx_file,
                     file_name="study_plan.docx",
                     mime="application/vnd.openxmlformats-officedocument.wordprocessingml.document"
-                )
\ No newline at end of file
+                )
+
+# Poll running jobs: rerun the script until they finish (closing the tab does not stop them)
+if job_active:
+    time.sleep(JOB_POLL_SECONDS)
+    st.rerun()
@@ -0,0 +1,178 @@
+import os
+import time
+import threading
+import subprocess
+from dotenv import load_dotenv
+import metrics
+import vad
+
+load_dotenv()
+# === Configuration ===
+# ASR_BACKEND=faster-whisper runs the same Whisper weights through CTranslate2 with int8 quantization,
+# which is several times faster than PyTorch fp32 on CPU-only machines.
+ASR_BACKEND = os.getenv("ASR_BACKEND", "whisper")
+ASR_MODEL = os.getenv("ASR_MODEL", "base")                 # "tiny", "base", "small", "medium", "large-v3"
+ASR_DEVICE = os.getenv("ASR_DEVICE", "cpu")
+ASR_COMPUTE_TYPE = os.getenv("ASR_COMPUTE_TYPE", "int8")   # faster-whisper only: int8, int8_float16, float32
+ASR_CPU_THREADS = int(os.getenv("ASR_CPU_THREADS", "0"))   # 0 = library default
+ASR_BEAM_SIZE = int(os.getenv("ASR_BEAM_SIZE", "1"))       # 1 = greedy, like openai-whisper's default
+ASR_STREAM_BLOCK = float(os.getenv("ASR_STREAM_BLOCK", "120"))  # seconds of speech per call for non-lazy engines
+
+
+# === Interface ===
+class ASRBackend:
+    """
+    transcribe_segments() yields {"start", "end", "text"} dicts (seconds from the start of the media)
+    as soon as the engine produces them; transcribe() returns the whole result at once.
+    audio is a file path or a 16 kHz mono float32 array.
+    streaming is True when transcribe_segments() yields while it is still decoding.
+    """
+    name = "asr"
+    streaming = False
+
+    def transcribe_segments(self, audio):
+        raise NotImplementedError
+
+    def transcribe(self, audio):
+        segments = list(self.transcribe_segments(audio))
+        return {
+            "text": " ".join(s["text"].strip() for s in segments if s["text"].strip()),
+            "segments": segments,
+            "duration": segments[-1]["end"] if segments else 0.0,
+        }
+
+
+class WhisperBackend(ASRBackend):
+    """openai-whisper on PyTorch (the original engine)."""
+
+    def __init__(self, model_name=ASR_MODEL, device=ASR_DEVICE):
+        import whisper
+        self.name = f"whisper-{model_name}"
+        self.model = whisper.load_model(model_name, device=device)
+        # fp16 is unsupported on CPU; asking for it only produces a warning per call
+        self.fp16 = self.model.device.type == "cuda"
+
+    def transcribe_segments(self, audio):
+        result = self.model.transcribe(audio, fp16=self.fp16)
+        for segment in result["segments"]:
+            yield {"start": segment["start"], "end": segment["end"], "text": segment["text"]}
+
+
+class FasterWhisperBackend(ASRBackend):
+    """faster-whisper (CTranslate2) with quantized weights; segments are decoded lazily."""
+    streaming = True
+
+    def __init__(self, model_name=ASR_MODEL, device=ASR_DEVICE, compute_type=ASR_COMPUTE_TYPE,
+                 cpu_threads=ASR_CPU_THREADS, beam_size=ASR_BEAM_SIZE):
+        from faster_whisper import WhisperModel
+        self.name = f"faster-whisper-{model_name}-{compute_type}"
+        self.beam_size = beam_size
+        self.model = WhisperModel(model_name, device=device, compute_type=compute_type, cpu_threads=cpu_threads)
+
+    def transcribe_segments(self, audio):
+        segments, _info = self.model.transcribe(audio, beam_size=self.beam_size)
+        for segment in segments:
+            yield {"start": segment.start, "end": segment.end, "text": segment.text}
+
+
+ASR_BACKENDS = {
+    "whisper": WhisperBackend,
+    "faster-whisper": FasterWhisperBackend,
+}
+
+
+# === Backend Lookup ===
+_backends = {}
+_backends_lock = threading.Lock()
+
+
+def get_asr_backend(name=None):
+    """The configured backend, loaded on first use and shared by the whole process."""
+    name = name or ASR_BACKEND
+    with _backends_lock:
+        if name not in _backends:
+            if name not in ASR_BACKENDS:
+                raise ValueError(f"Unknown ASR backend: {name} (choose from {', '.join(ASR_BACKENDS)})")
+            print(f"🎙️ Loading ASR backend '{name}' ({ASR_MODEL})...")
+            _backends[name] = ASR_BACKENDS[name]()
+        return _backends[name]
+
+
+def set_asr_backend(name, backend):
+    """Override a backend in-process (benchmarks, or an already-loaded model)."""
+    with _backends_lock:
+        _backends[name] = backend
+
+
+def _without_silence(audio_path):
+    """(compressed_audio, TimeMap, duration) or None when the file can't be decoded here."""
+    try:
+        return vad.remove_silence(audio_path)
+    except (OSError, subprocess.CalledProcessError) as e:
+        print(f"⚠️ Silence removal skipped for {audio_path}: {e}")
+        return None
+
+
+def _blocks(audio, time_map, block_seconds=ASR_STREAM_BLOCK):
+    """Split compressed audio at the joins between speech regions into (offset_s, samples) blocks."""
+    total = len(audio) / vad.SAMPLE_RATE
+    joins = [piece[0] for piece in time_map.pieces[1:]] + [total]
+    start = 0.0
+    for join in joins:
+        if join - start >= block_seconds or join == total:
+            yield start, audio[int(start * vad.SAMPLE_RATE):int(join * vad.SAMPLE_RATE)]
+            start = join
+
+
+def _speech_segments(engine, audio, time_map):
+    # Engines that decode lazily stream by themselves; the others get one block at a time
+    blocks = [(0.0, audio)] if engine.streaming else _blocks(audio, time_map)
+    for offset, block in blocks:
+        for segment in engine.transcribe_segments(block):
+            yield dict(segment, start=time_map.to_original(offset + segment["start"]),
+                       end=time_map.to_original(offset + segment["end"]))
+
+
+def transcribe_stream(audio_path, backend=None, use_vad=None, info=None):
+    """
+    Yield {"start", "end", "text"} segments as they are transcribed, with times in the original media.
+    With VAD on (VAD_ENABLED, the default) only speech is decoded, so the cost follows speech time
+    rather than file length. info, when given, receives "duration" once the stream is exhausted.
+    """
+    engine = get_asr_backend(backend)
+    use_vad = vad.VAD_ENABLED if use_vad is None else use_vad
+    # Timed by hand: a context-managed span must not stay open across yields
+    s = metrics.Span("asr.transcribe", {"engine": engine.name, "vad": use_vad})
+    start = time.perf_counter()
+    duration = 0.0
+    try:
+        trimmed = _without_silence(audio_path) if use_vad else None
+        if trimmed is None:
+            for segment in engine.transcribe_segments(audio_path):
+                duration = segment["end"]
+                yield segment
+        else:
+            audio, time_map, duration = trimmed
+            s.set(speech_s=round(len(audio) / vad.SAMPLE_RATE, 2))
+            if len(audio):
+                yield from _speech_segments(engine, audio, time_map)
+    except Exception as e:
+        s.error = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        elapsed = time.perf_counter() - start
+        s.set(audio_s=round(duration, 2), rtf=round(elapsed / duration, 4) if duration else None)
+        metrics.finish_span(s, elapsed)
+        if info is not None:
+            info["duration"] = duration
+
+
+def transcribe(audio_path, backend=None, use_vad=None):
+    """Transcribe an audio/video file in one go. Returns {"text", "segments", "duration"}."""
+    info = {}
+    segments = list(transcribe_stream(audio_path, backend, use_vad, info))
+    return {
+        "text": " ".join(seg["text"].strip() for seg in segments if seg["text"].strip()),
+        "segments": segments,
+        "duration": info["duration"],
+    }
@@ -0,0 +1,384 @@
+import os
+import sys
+import time
+import atexit
+import signal
+import uuid
+import queue
+import threading
+import subprocess
+import multiprocessing
+from multiprocessing.managers import SyncManager, DictProxy
+from dotenv import load_dotenv
+import metrics
+import profiling
+import asr
+
+load_dotenv()
+# === Configuration ===
+# A separate process tree keeps warm ASR models out of the Streamlit server and the job workers.
+ASR_POOL_HOST = os.getenv("ASR_POOL_HOST", "127.0.0.1")
+ASR_POOL_PORT = int(os.getenv("ASR_POOL_PORT", "50070"))
+# The manager speaks pickle over a socket, so its key must not be guessable. Without a configured key,
+# one is generated once and kept in a private file, so a pool that outlives the server that started it
+# still shares its key with the next server and with cli.py runs.
+ASR_POOL_KEY_FILE = os.getenv("ASR_POOL_KEY_FILE", os.path.join("cache", "asr_pool.key"))
+ASR_POOL_WORKERS = int(os.getenv("ASR_POOL_WORKERS", "2"))          # worker processes, one warm model each
+ASR_WORKER_CONCURRENCY = int(os.getenv("ASR_WORKER_CONCURRENCY", "1"))  # requests one worker runs at once
+ASR_POOL_TIMEOUT = float(os.getenv("ASR_POOL_TIMEOUT", "900"))      # max wait for the next segment, once started
+ASR_POOL_QUEUE_TIMEOUT = float(os.getenv("ASR_POOL_QUEUE_TIMEOUT", str(6 * 3600)))  # max wait for a free worker
+HEARTBEAT_INTERVAL = 5
+STALE_AFTER = 60          # a worker silent for this long is considered hung and restarted
+SUPERVISE_INTERVAL = 2
+
+
+
+def _load_authkey():
+    configured = os.getenv("ASR_POOL_AUTHKEY")
+    if configured:
+        return configured.encode("utf-8")
+    directory = os.path.dirname(ASR_POOL_KEY_FILE)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    try:
+        # O_EXCL: when several processes start at once, exactly one writes the key and the rest read it
+        fd = os.open(ASR_POOL_KEY_FILE, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+    except FileExistsError:
+        for _ in range(50):
+            with open(ASR_POOL_KEY_FILE, "r", encoding="utf-8") as f:
+                key = f.read().strip()
+            if key:
+                return key.encode("utf-8")
+            time.sleep(0.1)  # its writer has created the file but not filled it yet
+        raise RuntimeError(f"ASR pool key file {ASR_POOL_KEY_FILE} is empty; delete it to generate a new key")
+    key = os.urandom(32).hex()
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        f.write(key)
+    return key.encode("utf-8")
+
+
+ASR_POOL_AUTHKEY = _load_authkey()
+# Errors that mean "no usable pool here": nothing listening, a dropped connection, or a pool using another key
+POOL_UNAVAILABLE = (OSError, EOFError, multiprocessing.AuthenticationError)
+
+
+# === Manager (server-side objects) ===
+class ReplyBoard:
+    """
+    Reply queues by request id. The client opens its queue before queueing the request and drops it when
+    it stops listening; a dropped id is cancelled, so workers skip it (or stop mid-way) and its replies
+    are discarded instead of filling a queue nobody reads.
+    """
+
+    def __init__(self):
+        self._queues = {}
+        self._lock = threading.Lock()
+
+    def open(self, request_id):
+        with self._lock:
+            self._queues.setdefault(request_id, queue.Queue())
+
+    def get(self, request_id, timeout):
+        with self._lock:
+            reply = self._queues.get(request_id)
+        if reply is None:
+            raise queue.Empty
+        return reply.get(timeout=timeout)
+
+    def put(self, request_id, message):
+        """Deliver a message; False when the client has dropped the request."""
+        with self._lock:
+            reply = self._queues.get(request_id)
+        if reply is None:
+            return False
+        reply.put(message)
+        return True
+
+    def cancelled(self, request_id):
+        with self._lock:
+            return request_id not in self._queues
+
+    def drop(self, request_id):
+        with self._lock:
+            self._queues.pop(request_id, None)
+
+
+_requests = queue.Queue()
+_replies = ReplyBoard()
+_status = {}
+
+
+def _get_requests():
+    return _requests
+
+
+def _get_replies():
+    return _replies
+
+
+def _get_status():
+    return _status
+
+
+class PoolManager(SyncManager):
+    pass
+
+
+PoolManager.register("requests", callable=_get_requests)
+PoolManager.register("replies", callable=_get_replies)
+PoolManager.register("status", callable=_get_status, proxytype=DictProxy)
+
+
+def _address():
+    return (ASR_POOL_HOST, ASR_POOL_PORT)
+
+
+def _connect():
+    manager = PoolManager(address=_address(), authkey=ASR_POOL_AUTHKEY)
+    manager.connect()
+    return manager
+
+
+# === Worker Processes ===
+def _handle(manager, request, name):
+    replies = manager.replies()
+    request_id = request["id"]
+    # A request whose client gave up while it was queued is skipped rather than transcribed for nobody
+    if replies.cancelled(request_id) or not replies.put(request_id, ("started", {"worker": name, "pid": os.getpid()})):
+        print(f"⏭️ {name}: skipping cancelled request {request_id}")
+        return
+    try:
+        # Profiled here, where Whisper runs: in the job's process the call only waits on this socket.
+        # The worker name keeps profiles of one job's videos on different workers apart.
+        with metrics.job_context(request.get("job_id")), profiling.job_profiling(request.get("profile")):
+            info = profiling.profiled(f"transcribe_video.{name}")(_transcribe)(replies, request, name)
+        if info is not None:
+            replies.put(request_id, ("done", info))
+    except Exception as e:
+        replies.put(request_id, ("error", f"{type(e).__name__}: {e}"))
+
+
+def _transcribe(replies, request, name):
+    """Stream a request's segments to its client. Returns the transcription info, or None if the client left."""
+    info = {}
+    for segment in asr.transcribe_stream(request["path"], use_vad=request.get("use_vad"), info=info):
+        if not replies.put(request["id"], ("segment", segment)):
+            print(f"⏹️ {name}: request {request['id']} was dropped by its client; stopping")
+            return None
+    return info
+
+
+def _worker_main(name):
+    multiprocessing.current_process().authkey = ASR_POOL_AUTHKEY
+    manager = _connect()
+    state = {"busy": 0, "served": 0, "backend": None}
+    lock = threading.Lock()
+
+    def heartbeat():
+        status = manager.status()
+        while True:
+            with lock:
+                beat = {"pid": os.getpid(), "backend": state["backend"], "heartbeat": time.time(),
+                        "busy": state["busy"], "served": state["served"],
+                        "capacity": ASR_WORKER_CONCURRENCY, "ready": state["backend"] is not None}
+            try:
+                status[name] = beat
+            except (EOFError, OSError):
+                return
+            time.sleep(HEARTBEAT_INTERVAL)
+
+    def serve_requests():
+        requests = manager.requests()
+        while True:
+            try:
+                request = requests.get()
+            except (EOFError, OSError):
+                return  # pool server went away; let the process exit
+            with lock:
+                state["busy"] += 1
+            try:
+                _handle(manager, request, name)
+            finally:
+                with lock:
+                    state["busy"] -= 1
+                    state["served"] += 1
+
+    # Beat while the model loads too, so a slow first load isn't mistaken for a hang
+    threading.Thread(target=heartbeat, daemon=True).start()
+    state["backend"] = asr.get_asr_backend().name  # load once; every request after this is warm
+    print(f"🎙️ {name} ready ({state['backend']}, pid {os.getpid()})")
+    threads = [threading.Thread(target=serve_requests, daemon=True) for _ in range(ASR_WORKER_CONCURRENCY)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+
+def serve(num_workers=ASR_POOL_WORKERS, parent_pid=None):
+    """
+    Run the pool: a manager server holding the request queue plus supervised worker processes.
+    With parent_pid, the pool shuts down once that process (the server that started it) is gone.
+    """
+    multiprocessing.current_process().authkey = ASR_POOL_AUTHKEY
+    server = PoolManager(address=_address(), authkey=ASR_POOL_AUTHKEY).get_server()
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    print(f"🎙️ ASR pool listening on {ASR_POOL_HOST}:{ASR_POOL_PORT} with {num_workers} workers")
+
+    ctx = multiprocessing.get_context("spawn")
+    workers = {}
+
+    def start(name):
+        p = ctx.Process(target=_worker_main, args=(name,), daemon=True)
+        p.start()
+        workers[name] = (p, time.time())
+
+    for i in range(num_workers):
+        start(f"asr-worker-{i + 1}")
+
+    # Health checks: restart workers that died or stopped sending heartbeats
+    while True:
+        time.sleep(SUPERVISE_INTERVAL)
+        if parent_pid and os.getppid() != parent_pid:
+            print("🛑 ASR pool: the process that started it has exited; shutting down")
+            for p, _ in workers.values():
+                p.kill()
+            return
+        for name, (p, started) in list(workers.items()):
+            beat = _status.get(name, {}).get("heartbeat", started)
+            if not p.is_alive() or time.time() - max(beat, started) > STALE_AFTER:
+                print(f"⚠️ {name} {'exited' if not p.is_alive() else 'stopped responding'}; restarting")
+                if p.is_alive():
+                    p.kill()
+                p.join()
+                _status.pop(name, None)
+                start(name)
+
+
+def start_pool_process(num_workers=ASR_POOL_WORKERS):
+    """Launch the pool as an independent process (no-op for callers if one is already listening)."""
+    if pool_health() is not None:
+        return None
+    process = subprocess.Popen([sys.executable, os.path.abspath(__file__), str(num_workers), str(os.getpid())])
+    atexit.register(_stop_pool_process, process)
+    return process
+
+
+def _stop_pool_process(process):
+    if process.poll() is None:
+        process.terminate()
+        try:
+            process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+
+# === Client ===
+_client = None
+_client_lock = threading.Lock()
+
+
+def _get_client():
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = _connect()
+        return _client
+
+
+def _reset_client():
+    """Forget a broken connection so the next call reconnects (e.g. after the pool restarted)."""
+    global _client
+    with _client_lock:
+        _client = None
+
+
+def pool_health():
+    """Per-worker status ({name: {"pid", "busy", "served", "heartbeat", ...}}), or None if no pool is running."""
+    try:
+        return dict(_get_client().status())
+    except POOL_UNAVAILABLE:
+        _reset_client()
+        return None
+
+
+def _next_message(manager, replies, request_id, worker):
+    """
+    Wait for the worker's next message, giving up if its worker dies or hangs. Until a worker has
+    started the request it is only waiting its turn in the queue, which gets the longer queue timeout.
+    """
+    timeout = ASR_POOL_TIMEOUT if worker else ASR_POOL_QUEUE_TIMEOUT
+    waited = 0.0
+    while True:
+        try:
+            return replies.get(request_id, HEARTBEAT_INTERVAL)
+        except queue.Empty:
+            waited += HEARTBEAT_INTERVAL
+        if worker:
+            status = manager.status().get(worker["worker"], {})
+            if status.get("pid") != worker["pid"] or time.time() - status.get("heartbeat", 0) > STALE_AFTER:
+                raise RuntimeError(f"ASR pool worker {worker['worker']} died while transcribing")
+        if waited >= timeout:
+            if worker:
+                raise TimeoutError(f"ASR pool sent nothing for {timeout:.0f}s")
+            raise TimeoutError(f"No ASR pool worker picked the request up within {timeout:.0f}s")
+
+
+def transcribe_stream(audio_path, use_vad=None, info=None):
+    """
+    Same contract as asr.transcribe_stream, but decoded by a warm pool worker.
+    Falls back to in-process transcription when no pool is running.
+    """
+    try:
+        manager = _get_client()
+        request_id = uuid.uuid4().hex
+        replies = manager.replies()
+        replies.open(request_id)
+        requests = manager.requests()
+        queued = requests.qsize()
+        requests.put({"id": request_id, "path": os.path.abspath(audio_path), "use_vad": use_vad,
+                      "job_id": metrics.current_job_id(), "profile": profiling.profiling_enabled()})
+    except POOL_UNAVAILABLE:
+        _reset_client()
+        print("⚠️ ASR pool unavailable; transcribing in-process")
+        yield from asr.transcribe_stream(audio_path, use_vad=use_vad, info=info)
+        return
+
+    worker = None
+    try:
+        with metrics.span("asr.pool_wait", queued_ahead=queued) as s:
+            kind, payload = _next_message(manager, replies, request_id, worker)
+            if kind == "started":
+                worker = payload
+                s.set(worker=worker["worker"])
+        while True:
+            if kind == "segment":
+                yield payload
+            elif kind == "done":
+                if info is not None:
+                    info.update(payload)
+                return
+            elif kind == "error":
+                raise RuntimeError(f"ASR pool: {payload}")
+            kind, payload = _next_message(manager, replies, request_id, worker)
+    finally:
+        # Also cancels the request if it is still queued, so no worker transcribes it for nobody
+        replies.drop(request_id)
+
+
+def transcribe(audio_path, use_vad=None):
+    """Whole-file transcription through the pool. Returns {"text", "segments", "duration"}."""
+    info = {}
+    segments = list(transcribe_stream(audio_path, use_vad, info))
+    return {
+        "text": " ".join(seg["text"].strip() for seg in segments if seg["text"].strip()),
+        "segments": segments,
+        "duration": info.get("duration", 0.0),
+    }
+
+
+# === CLI Entry ===
+if __name__ == "__main__":
+    # terminate() from the parent's atexit: exit normally so the daemon workers are stopped too
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    serve(int(sys.argv[1]) if len(sys.argv) > 1 else ASR_POOL_WORKERS,
+          int(sys.argv[2]) if len(sys.argv) > 2 else None)
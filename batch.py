@@ -0,0 +1,97 @@
+import os
+import json
+import time
+import hashlib
+from dotenv import load_dotenv
+from providers import get_chat_provider, BATCH_DONE_STATUSES
+import metrics
+
+load_dotenv()
+# === Configuration ===
+# Batch jobs trade latency (minutes to hours) for throughput and half-price tokens;
+# they suit offline bulk work where nobody is waiting on the page.
+BATCH_POLL_INTERVAL = float(os.getenv("BATCH_POLL_INTERVAL", "30"))
+BATCH_TIMEOUT = float(os.getenv("BATCH_TIMEOUT", str(24 * 3600)))  # the API's own completion window
+
+
+def make_request(custom_id, prompt, model="gpt-4.1-mini", max_tokens=None, temperature=None):
+    """One chat request of a batch; custom_id maps its result back to the caller's item."""
+    return {"custom_id": custom_id, "messages": [{"role": "user", "content": prompt}],
+            "model": model, "max_tokens": max_tokens, "temperature": temperature}
+
+
+def _fingerprint(requests):
+    payload = json.dumps([[r["custom_id"], r["model"], r["messages"]] for r in requests], sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def _load_state(state_path, fingerprint):
+    """Batch id saved by an earlier attempt at the same requests (e.g. before a worker restart)."""
+    if not state_path or not os.path.exists(state_path):
+        return None
+    try:
+        with open(state_path, "r", encoding="utf-8") as f:
+            state = json.load(f)
+    except (OSError, ValueError):
+        return None
+    return state.get("batch_id") if state.get("fingerprint") == fingerprint else None
+
+
+def _save_state(state_path, fingerprint, batch_id):
+    if state_path:
+        with open(state_path, "w", encoding="utf-8") as f:
+            json.dump({"fingerprint": fingerprint, "batch_id": batch_id, "submitted_at": time.time()}, f)
+
+
+def run_batch(requests, provider="openai", poll_interval=None, timeout=None, state_path=None, progress=None):
+    """
+    Submit requests as one asynchronous batch, poll until it finishes and return
+    {custom_id: {"text", "error", "model", "tokens_in", "tokens_out"}}.
+    With state_path, the batch id is saved so a rerun resumes polling instead of paying for the batch twice.
+    progress(fraction, message) is called on every poll.
+    """
+    if not requests:
+        return {}
+    poll_interval = BATCH_POLL_INTERVAL if poll_interval is None else poll_interval
+    timeout = BATCH_TIMEOUT if timeout is None else timeout
+    chat = get_chat_provider(provider)
+    fingerprint = _fingerprint(requests)
+
+    with metrics.span("batch.run", requests=len(requests)) as s:
+        batch_id = _load_state(state_path, fingerprint)
+        status = None
+        if batch_id:
+            try:
+                status = chat.batch_status(batch_id)
+                print(f"♻️ Resuming batch {batch_id}")
+            except Exception as e:
+                print(f"⚠️ Saved batch {batch_id} is not available ({e}); submitting again")
+                batch_id = None
+        if not batch_id:
+            batch_id = chat.submit_batch(requests)
+            _save_state(state_path, fingerprint, batch_id)
+            print(f"📦 Submitted batch {batch_id} with {len(requests)} requests")
+        s.set(batch_id=batch_id)
+
+        started = time.time()
+        while True:
+            status = status or chat.batch_status(batch_id)
+            done = status["completed"] + status["failed"]
+            if progress:
+                progress(done / max(1, status["total"] or len(requests)),
+                         f"📦 Batch {batch_id}: {status['status']} ({done}/{status['total'] or len(requests)})")
+            if status["status"] in BATCH_DONE_STATUSES:
+                break
+            if time.time() - started > timeout:
+                chat.cancel_batch(batch_id)
+                raise TimeoutError(f"Batch {batch_id} did not finish within {timeout:.0f}s")
+            time.sleep(poll_interval)
+            status = None
+
+        s.set(status=status["status"], waited_s=round(time.time() - started, 1))
+        results = chat.batch_results(batch_id)
+        if status["status"] != "completed" and not results:
+            raise RuntimeError(f"Batch {batch_id} {status['status']}")
+        if state_path and os.path.exists(state_path):
+            os.remove(state_path)
+        return results
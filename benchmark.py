@@ -0,0 +1,569 @@
+import os
+import glob
+import sys
+import json
+import time
+import random
+import shutil
+import tempfile
+import hashlib
+import types
+import argparse
+import platform
+import threading
+import multiprocessing
+import subprocess
+from datetime import datetime
+
+# The benchmark never calls live services: pacing sleeps off, every provider local
+os.environ.setdefault("RATE_LIMIT_DELAY", "0")
+os.environ.setdefault("LLM_PROVIDER", "local")
+
+import tiktoken
+from docx import Document
+import providers
+from workspace import create_workspace, get_workspace_paths, remove_workspace
+
+# === Configuration ===
+DEFAULT_DOCUMENTS = "uploads/*.pdf"
+DEFAULT_TRANSCRIPTS = "data/merged_transcripts.docx"
+DEFAULT_REDDIT = "data/reddit_combined_text.docx"
+DEFAULT_OUTPUT = "bench_results.json"
+RSS_SAMPLE_INTERVAL = 0.02
+
+_encoding = tiktoken.encoding_for_model("gpt-4")
+
+
+def count_tokens(text):
+    return len(_encoding.encode(text, disallowed_special=()))
+
+
+# === Resource Sampling ===
+def current_rss_mb():
+    try:
+        with open("/proc/self/statm", "r") as f:
+            pages = int(f.read().split()[1])
+        return pages * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+    except (OSError, ValueError):
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+class RSSSampler:
+    """Background thread recording the highest RSS seen while a stage runs."""
+
+    def __init__(self):
+        self.peak = current_rss_mb()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(RSS_SAMPLE_INTERVAL):
+            self.peak = max(self.peak, current_rss_mb())
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self.peak = max(self.peak, current_rss_mb())
+
+
+# === Stage Recording ===
+class StageRecorder:
+    def __init__(self):
+        self.stages = {}
+        self.current = None
+
+    def add_tokens(self, sent=0, received=0, calls=1):
+        if self.current:
+            stage = self.stages[self.current]
+            stage["tokens_sent"] += sent
+            stage["tokens_received"] += received
+            stage["llm_calls"] += calls
+
+    def run(self, name, func, *args, **kwargs):
+        stage = self.stages.setdefault(name, {
+            "wall_s": 0.0, "cpu_s": 0.0, "peak_rss_mb": 0.0,
+            "tokens_sent": 0, "tokens_received": 0, "llm_calls": 0, "runs": 0, "errors": 0,
+        })
+        self.current = name
+        wall, cpu = time.perf_counter(), time.process_time()
+        result = None
+        with RSSSampler() as sampler:
+            try:
+                result = func(*args, **kwargs)
+            except Exception as e:
+                stage["errors"] += 1
+                print(f"❌ Stage {name} failed: {e}")
+        stage["wall_s"] += time.perf_counter() - wall
+        stage["cpu_s"] += time.process_time() - cpu
+        stage["peak_rss_mb"] = max(stage["peak_rss_mb"], sampler.peak)
+        stage["runs"] += 1
+        self.current = None
+        return result
+
+
+class CountingProvider(providers.ChatProvider, providers.SearchProvider):
+    """Wraps a provider and attributes tokens sent/received to the running stage."""
+
+    def __init__(self, inner, recorder):
+        self.inner = inner
+        self.recorder = recorder
+
+    def complete(self, messages, model, max_tokens=None, temperature=None, **options):
+        return "".join(self.stream(messages, model, max_tokens, temperature, **options))
+
+    def stream(self, messages, model, max_tokens=None, temperature=None, **options):
+        parts = []
+        for delta in self.inner.stream(messages, model, max_tokens, temperature, **options):
+            parts.append(delta)
+            yield delta
+        sent = sum(count_tokens(m["content"]) for m in messages)
+        self.recorder.add_tokens(sent, count_tokens("".join(parts)))
+
+    def submit_batch(self, requests):
+        return self.inner.submit_batch(requests)
+
+    def batch_status(self, batch_id):
+        return self.inner.batch_status(batch_id)
+
+    def batch_results(self, batch_id):
+        # Batch tokens are attributed to the stage that collects the results
+        results = self.inner.batch_results(batch_id)
+        self.recorder.add_tokens(sum(r["tokens_in"] for r in results.values()),
+                                 sum(r["tokens_out"] for r in results.values()), calls=len(results))
+        return results
+
+    def cancel_batch(self, batch_id):
+        return self.inner.cancel_batch(batch_id)
+
+    def search(self, query, **kwargs):
+        return self.inner.search(query, **kwargs)
+
+    def extract(self, urls, **kwargs):
+        return self.inner.extract(urls, **kwargs)
+
+
+# === Stubbed External Services ===
+def load_paragraphs(docx_path):
+    if not os.path.exists(docx_path):
+        return []
+    return [p.text for p in Document(docx_path).paragraphs if p.text.strip()]
+
+
+class FakeTranscriptApi:
+    """Stands in for YouTubeTranscriptApi, replaying recorded transcript text as timed segments."""
+    paragraphs = []
+    latency = 0.0
+
+    @classmethod
+    def get_transcript(cls, video_id):
+        time.sleep(cls.latency)
+        words = " ".join(cls.paragraphs).split() or ["transcript"]
+        offset = sum(ord(c) for c in video_id) % len(words)
+        words = words[offset:] + words[:offset]
+        return [{"text": " ".join(words[i:i + 12]), "start": i / 2.5, "duration": 4.8}
+                for i in range(0, len(words), 12)]
+
+
+class FakeSubmission:
+    def __init__(self, post_id, paragraphs):
+        self.title = f"Recorded thread {post_id}"
+        self.selftext = paragraphs[0] if paragraphs else ""
+        bodies = paragraphs[1:] or ["No comments"]
+        self.comments = types.SimpleNamespace(
+            replace_more=lambda limit=None: [],
+            list=lambda: [types.SimpleNamespace(body=b.replace("[Comment] ", "")) for b in bodies],
+        )
+
+
+class FakeReddit:
+    """Stands in for praw.Reddit, replaying the recorded Reddit dump."""
+    paragraphs = []
+    latency = 0.0
+
+    def submission(self, id):
+        time.sleep(self.latency)
+        return FakeSubmission(id, self.paragraphs)
+
+
+def install_stubs(latency=0.0, tokens_per_second=0.0, error_rate=0.0, output_tokens=800, recorder=None,
+                  transcripts_path=DEFAULT_TRANSCRIPTS, reddit_path=DEFAULT_REDDIT):
+    """Route LLM/search calls to the local provider and replace YouTube/Reddit clients with recordings."""
+    import youtube_fetch
+    import youtube_summarizer
+    import reddit_fetch
+
+    local = providers.use_local_provider(latency=latency, tokens_per_second=tokens_per_second,
+                                         error_rate=error_rate, output_tokens=output_tokens)
+    if recorder is not None:
+        counting = CountingProvider(local, recorder)
+        for name in ("openai", "anthropic", "tavily"):
+            providers.set_provider(name, counting)
+
+    FakeTranscriptApi.paragraphs = load_paragraphs(transcripts_path)
+    FakeTranscriptApi.latency = latency
+    FakeReddit.paragraphs = load_paragraphs(reddit_path)
+    FakeReddit.latency = latency
+    youtube_fetch.YouTubeTranscriptApi = FakeTranscriptApi
+    youtube_summarizer.YouTubeTranscriptApi = FakeTranscriptApi
+    youtube_fetch.time = types.SimpleNamespace(sleep=lambda seconds: None)  # skip rate-limit pacing
+    reddit_fetch.reddit = FakeReddit()
+    return local
+
+
+# === Flows ===
+def bench_summary_flow(recorder, paths, documents, videos, youtube_urls):
+    import document_summarizer as ds
+    import youtube_summarizer as ys
+    from pipelines import write_to_word
+
+    merged = []
+    for path in documents:
+        name = os.path.basename(path)
+        raw_text = recorder.run("document.extract", ds.extract_text, path)
+        if not raw_text:
+            continue
+        chunks = recorder.run("document.tokenize",
+                              lambda: ds.split_text_by_tokens(ds.clean_text(raw_text), max_tokens=280000))
+        for chunk in chunks or []:
+            summary = recorder.run("document.summarize", ds.get_gpt_response, ds.build_summary_prompt(chunk))
+            merged.append((f"File: {name}", summary or ""))
+
+    if videos:
+        import video_summarizer as vs
+        for path in videos:
+            transcript = recorder.run("video.asr", vs.transcribe_video, path)
+            if isinstance(transcript, str) and transcript:
+                summary = recorder.run("video.summarize", vs.summarize_text, transcript)
+                merged.append((f"File: {os.path.basename(path)}", summary or ""))
+
+    for url in youtube_urls:
+        segments = recorder.run("youtube.transcript", ys.get_youtube_transcript, ys.extract_video_id(url))
+        if segments:
+            summary = recorder.run("youtube.summarize", ys.summarize_segments, url, segments)
+            merged.append((f"URL: {url}", summary or ""))
+
+    def render_merged():
+        doc = Document()
+        doc.add_heading("Merged Summaries", level=1)
+        for heading, summary in merged:
+            doc.add_heading(heading, level=2)
+            doc.add_paragraph(summary)
+        path = os.path.join(paths["outputs"], "merged_summary_bench.docx")
+        doc.save(path)
+        return path
+
+    summary_path = recorder.run("summary.render", render_merged)
+
+    from pipelines import build_reformat_prompt
+    full_text = "\n".join(summary for _, summary in merged)
+    formatted = recorder.run("reformat.llm", lambda: providers.get_chat_provider("openai").complete(
+        [{"role": "user", "content": build_reformat_prompt(full_text)}], model="gpt-4.1-mini", max_tokens=10000))
+    recorder.run("reformat.render", write_to_word, formatted or "",
+                 os.path.join(paths["outputs"], "enhanced_summary_bench.docx"))
+    return summary_path
+
+
+def bench_study_plan_flow(recorder, paths, youtube_urls, reddit_urls, web_urls):
+    from youtube_fetch import main as youtube_main
+    from reddit_fetch import main as reddit_main
+    from urls_fetch import main as urls_main
+    from gpt import main as gpt_main
+    from claude import main as claude_main
+
+    recorder.run("fetch.youtube", youtube_main, youtube_urls, paths["transcripts"],
+                 os.path.join(paths["logs"], "transcript_log.txt"))
+    recorder.run("fetch.reddit", reddit_main, reddit_urls, paths["reddit"])
+    recorder.run("fetch.web", urls_main, web_urls, "Recorded web answer", paths["data"], paths["logs"])
+    recorder.run("gpt.main", gpt_main, "PMP", paths["data"], paths["gpt_plan"])
+    recorder.run("claude.main", claude_main, "PMP", paths["gpt_plan"], paths["study_plan"])
+
+
+def _asr_worker(backend_name, videos, results, use_vad):
+    """Runs in a fresh process so each backend's model load and peak RSS are measured in isolation."""
+    import asr
+    try:
+        with RSSSampler() as sampler:
+            start = time.perf_counter()
+            engine = asr.get_asr_backend(backend_name)
+            load_s = time.perf_counter() - start
+            runs = []
+            for path in videos:
+                wall, cpu = time.perf_counter(), time.process_time()
+                result = asr.transcribe(path, backend_name, use_vad=use_vad)
+                wall, cpu = time.perf_counter() - wall, time.process_time() - cpu
+                duration = result["duration"]
+                runs.append({"video": path, "audio_s": round(duration, 2), "wall_s": round(wall, 3),
+                             "cpu_s": round(cpu, 3), "rtf": round(wall / duration, 4) if duration else None,
+                             "words": len(result["text"].split())})
+        audio = sum(r["audio_s"] for r in runs)
+        rtf = round(sum(r["wall_s"] for r in runs) / audio, 4) if audio else None
+        results.put({"backend": backend_name, "engine": engine.name, "vad": use_vad, "load_s": round(load_s, 3),
+                     "peak_rss_mb": round(sampler.peak, 1), "rtf": rtf, "videos": runs})
+    except Exception as e:
+        results.put({"backend": backend_name, "vad": use_vad, "error": f"{type(e).__name__}: {e}"})
+
+
+def bench_asr(backends, videos, vad_modes=(False, True)):
+    """Real-time factor (transcription time / audio duration) and peak memory of each ASR backend and VAD mode."""
+    ctx = multiprocessing.get_context("spawn")
+    report = []
+    for name in backends:
+        for use_vad in vad_modes:
+            results = ctx.Queue()
+            p = ctx.Process(target=_asr_worker, args=(name, videos, results, use_vad))
+            p.start()
+            report.append(results.get())
+            p.join()
+    baseline = next((r for r in report if r.get("rtf")), None)
+    for r in report:
+        if "error" in r:
+            print(f"  {r['backend']:<16} vad={r['vad']!s:<5} ❌ {r['error']}")
+            continue
+        speedup = baseline["rtf"] / r["rtf"] if r.get("rtf") else 0.0
+        print(f"  {r['engine']:<30} vad={r['vad']!s:<5} RTF {r['rtf'] or 0:>7.3f}  {speedup:>5.1f}x  "
+              f"load {r['load_s']:>6.2f}s  peak {r['peak_rss_mb']:>7.1f} MB")
+    return report
+
+
+def _docx_worker(reader, docx_paths, results):
+    """Read each file with one reader in a fresh process, so peak RSS is the reader's own."""
+    try:
+        with RSSSampler() as sampler:
+            runs = []
+            for path in docx_paths:
+                wall, cpu = time.perf_counter(), time.process_time()
+                if reader == "python-docx":
+                    text = "\n".join(p.text for p in Document(path).paragraphs if p.text.strip())
+                else:
+                    import docx_reader
+                    text = docx_reader.read_text(path)
+                runs.append({"file": path, "mb": round(os.path.getsize(path) / 1024 / 1024, 2),
+                             "wall_s": round(time.perf_counter() - wall, 4),
+                             "cpu_s": round(time.process_time() - cpu, 4),
+                             "chars": len(text), "sha256": hashlib.sha256(text.encode("utf-8")).hexdigest()})
+        results.put({"reader": reader, "peak_rss_mb": round(sampler.peak, 1), "files": runs})
+    except Exception as e:
+        results.put({"reader": reader, "error": f"{type(e).__name__}: {e}"})
+
+
+def bench_docx(docx_paths):
+    """python-docx vs the streaming docx_reader: time, peak memory and whether the text matches."""
+    ctx = multiprocessing.get_context("spawn")
+    report = []
+    for reader in ("python-docx", "docx_reader"):
+        results = ctx.Queue()
+        p = ctx.Process(target=_docx_worker, args=(reader, docx_paths, results))
+        p.start()
+        report.append(results.get())
+        p.join()
+    if any("error" in r for r in report):
+        for r in report:
+            print(f"  {r['reader']:<12} {'❌ ' + r['error'] if 'error' in r else 'ok'}")
+        return report
+    baseline, streaming = report
+    for before, after in zip(baseline["files"], streaming["files"]):
+        speedup = before["wall_s"] / after["wall_s"] if after["wall_s"] else 0.0
+        same = "same text" if before["sha256"] == after["sha256"] else "⚠ TEXT DIFFERS"
+        print(f"  {os.path.basename(after['file']):<32} {after['mb']:>6.1f} MB  python-docx {before['wall_s']:>7.3f}s  "
+              f"docx_reader {after['wall_s']:>7.3f}s  {speedup:>5.1f}x  {same}")
+    print(f"  peak RSS: python-docx {baseline['peak_rss_mb']:.1f} MB, docx_reader {streaming['peak_rss_mb']:.1f} MB")
+    return report
+
+
+CORPUS_WORDS = ("exam", "scope", "schedule", "risk", "stakeholder", "baseline", "agile", "variance",
+                "critical", "path", "earned", "value", "quality", "procurement", "charter", "sprint")
+CORPUS_FILE_MB = 4
+
+
+def make_corpus(folder, size_mb):
+    """Fill folder with .docx files holding about size_mb of text, CORPUS_FILE_MB per file."""
+    rng = random.Random(size_mb)
+    written, index = 0, 0
+    while written < size_mb * 1024 * 1024:
+        doc = Document()
+        file_bytes = 0
+        while file_bytes < CORPUS_FILE_MB * 1024 * 1024:
+            paragraph = " ".join(rng.choice(CORPUS_WORDS) for _ in range(120))
+            doc.add_paragraph(paragraph)
+            file_bytes += len(paragraph) + 1
+        doc.save(os.path.join(folder, f"corpus_{index:03d}.docx"))
+        written += file_bytes
+        index += 1
+
+
+def _corpus_worker(mode, folder, results):
+    """Load, clean and chunk a corpus the old way (whole string) or streaming, in a fresh process."""
+    try:
+        import gpt
+        base = current_rss_mb()
+        wall = time.perf_counter()
+        with RSSSampler() as sampler:
+            if mode == "load_all_text":
+                chunks = gpt.split_text_by_tokens(gpt.clean_text(gpt.load_all_text(folder)), gpt.CHUNK_TOKENS)
+                count = len(chunks)
+                del chunks
+            else:
+                count = sum(1 for _ in gpt.iter_corpus_chunks(folder, gpt.CHUNK_TOKENS))
+        results.put({"mode": mode, "chunks": count, "wall_s": round(time.perf_counter() - wall, 3),
+                     "peak_rss_mb": round(sampler.peak, 1), "growth_mb": round(sampler.peak - base, 1)})
+    except Exception as e:
+        results.put({"mode": mode, "error": f"{type(e).__name__}: {e}"})
+
+
+def bench_corpus(sizes_mb, tolerance_mb):
+    """
+    Peak memory of gpt's corpus loading as the corpus grows. The streaming path passes when its peak
+    growth on the largest corpus stays within tolerance_mb of the smallest.
+    """
+    ctx = multiprocessing.get_context("spawn")
+    report = []
+    for size_mb in sizes_mb:
+        folder = tempfile.mkdtemp(prefix=f"bench-corpus-{size_mb}mb-")
+        try:
+            make_corpus(folder, size_mb)
+            for mode in ("load_all_text", "streaming"):
+                results = ctx.Queue()
+                p = ctx.Process(target=_corpus_worker, args=(mode, folder, results))
+                p.start()
+                run = dict(results.get(), corpus_mb=size_mb)
+                p.join()
+                report.append(run)
+                if "error" in run:
+                    print(f"  {size_mb:>5} MB  {mode:<14} ❌ {run['error']}")
+                else:
+                    print(f"  {size_mb:>5} MB  {mode:<14} {run['wall_s']:>8.2f}s  +{run['growth_mb']:>7.1f} MB peak"
+                          f"  {run['chunks']} chunks")
+        finally:
+            shutil.rmtree(folder, ignore_errors=True)
+    streaming = [r for r in report if r["mode"] == "streaming" and "error" not in r]
+    flat = len(streaming) == len(sizes_mb) and streaming[-1]["growth_mb"] - streaming[0]["growth_mb"] <= tolerance_mb
+    print(f"  {'✅' if flat else '❌'} streaming peak growth {'stays' if flat else 'does not stay'} "
+          f"within {tolerance_mb:.0f} MB from {sizes_mb[0]} MB to {sizes_mb[-1]} MB of text")
+    return {"runs": report, "flat": flat}
+
+
+# === Reporting ===
+def git_revision():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True).strip()
+    except Exception:
+        return "unknown"
+
+
+def round_stage(stage):
+    return {k: round(v, 4) if isinstance(v, float) else v for k, v in stage.items()}
+
+
+def compare(old_path, new_results):
+    """Print per-stage wall time / token deltas against an earlier results file."""
+    with open(old_path, "r", encoding="utf-8") as f:
+        old = json.load(f)
+    print(f"\n📊 {old.get('commit')} → {new_results.get('commit')}")
+    print(f"{'stage':<22}{'wall_s':>10}{'Δ%':>9}{'peak_mb':>10}{'tok_sent':>10}{'Δ':>9}")
+    for name, stage in new_results["stages"].items():
+        before = old.get("stages", {}).get(name)
+        if not before:
+            print(f"{name:<22}{stage['wall_s']:>10.3f}{'new':>9}")
+            continue
+        pct = (stage["wall_s"] - before["wall_s"]) / before["wall_s"] * 100 if before["wall_s"] else 0.0
+        print(f"{name:<22}{stage['wall_s']:>10.3f}{pct:>8.1f}%{stage['peak_rss_mb']:>10.1f}"
+              f"{stage['tokens_sent']:>10}{stage['tokens_sent'] - before['tokens_sent']:>9}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-stage benchmark of the summary and study-plan pipelines.")
+    parser.add_argument("--documents", default=DEFAULT_DOCUMENTS, help="glob of fixture PDFs/DOCX")
+    parser.add_argument("--videos", default="", help="glob of short sample videos (ASR runs for real)")
+    parser.add_argument("--youtube", type=int, default=3, help="number of stubbed YouTube videos")
+    parser.add_argument("--latency", type=float, default=0.0, help="simulated first-token / request latency")
+    parser.add_argument("--tps", type=float, default=0.0, help="simulated output tokens per second (0 = instant)")
+    parser.add_argument("--output-tokens", type=int, default=800, help="size of synthesized LLM replies")
+    parser.add_argument("--flows", default="summary,study_plan", help="any of summary, study_plan, asr, docx, corpus")
+    parser.add_argument("--docx", default=f"{DEFAULT_TRANSCRIPTS},{DEFAULT_REDDIT}",
+                        help="comma-separated .docx files read by the docx flow")
+    parser.add_argument("--corpus-mb", default="8,16,32", help="corpus sizes (MB of text) for the corpus flow")
+    parser.add_argument("--corpus-tolerance", type=float, default=16.0,
+                        help="allowed growth in streaming peak RSS (MB) from the smallest to the largest corpus")
+    parser.add_argument("--asr-backends", default="whisper,faster-whisper",
+                        help="ASR backends compared by the asr flow (needs --videos)")
+    parser.add_argument("--asr-vad", choices=["off", "on", "both"], default="both",
+                        help="run the asr flow without and/or with silence removal")
+    parser.add_argument("--output", default=DEFAULT_OUTPUT)
+    parser.add_argument("--compare", default="", help="earlier results file to diff against")
+    args = parser.parse_args()
+
+    recorder = StageRecorder()
+    install_stubs(args.latency, args.tps, 0.0, args.output_tokens, recorder)
+    workspace_dir = create_workspace(f"bench-{os.getpid()}")
+    paths = get_workspace_paths(workspace_dir)
+
+    documents = sorted(glob.glob(args.documents)) if args.documents else []
+    videos = sorted(glob.glob(args.videos)) if args.videos else []
+    youtube_urls = [f"https://www.youtube.com/watch?v=bench{i:06d}" for i in range(args.youtube)]
+    flows = [f.strip() for f in args.flows.split(",") if f.strip()]
+
+    started = time.perf_counter()
+    asr_report = []
+    docx_report = []
+    corpus_report = {}
+    try:
+        if "summary" in flows:
+            print(f"🚀 Summary flow: {len(documents)} documents, {len(videos)} videos, {len(youtube_urls)} YouTube")
+            bench_summary_flow(recorder, paths, documents, videos, youtube_urls)
+        if "study_plan" in flows:
+            print("🚀 Study plan flow")
+            bench_study_plan_flow(recorder, paths, youtube_urls,
+                                  [f"https://www.reddit.com/r/pmp/comments/bench{i}/post/" for i in range(3)],
+                                  [f"https://example.com/guide/{i}" for i in range(3)])
+        if "asr" in flows:
+            if not videos:
+                print("⚠️ The asr flow needs sample videos (--videos)")
+            else:
+                print(f"🚀 ASR backends on {len(videos)} videos")
+                vad_modes = {"off": (False,), "on": (True,), "both": (False, True)}[args.asr_vad]
+                backends = [b.strip() for b in args.asr_backends.split(",") if b.strip()]
+                asr_report = bench_asr(backends, videos, vad_modes)
+        if "docx" in flows:
+            docx_paths = [p.strip() for p in args.docx.split(",") if p.strip() and os.path.exists(p.strip())]
+            print(f"🚀 DOCX readers on {len(docx_paths)} files")
+            docx_report = bench_docx(docx_paths)
+        if "corpus" in flows:
+            sizes = sorted(float(size) for size in args.corpus_mb.split(",") if size.strip())
+            print(f"🚀 Corpus loading at {', '.join(f'{size:g}' for size in sizes)} MB")
+            corpus_report = bench_corpus(sizes, args.corpus_tolerance)
+    finally:
+        remove_workspace(workspace_dir)
+
+    results = {
+        "commit": git_revision(),
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "settings": vars(args),
+        "fixtures": {"documents": documents, "videos": videos, "youtube": youtube_urls},
+        "total_wall_s": round(time.perf_counter() - started, 4),
+        "stages": {name: round_stage(stage) for name, stage in recorder.stages.items()},
+        "asr": asr_report,
+        "docx": docx_report,
+        "corpus": corpus_report,
+    }
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2)
+    print(f"✅ Benchmark results saved to {args.output}")
+
+    for name, stage in results["stages"].items():
+        print(f"  {name:<22} {stage['wall_s']:>8.3f}s wall {stage['cpu_s']:>8.3f}s cpu "
+              f"{stage['peak_rss_mb']:>8.1f} MB  {stage['tokens_sent']:>8} → {stage['tokens_received']} tok")
+    if args.compare:
+        compare(args.compare, results)
+    if corpus_report and not corpus_report["flat"]:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+import os
+import json
+import time
+import hashlib
+from datetime import datetime
+import metrics
+
+# === Configuration ===
+CHECKPOINT_DIR = "checkpoints"
+HASH_CHUNK_SIZE = 1024 * 1024
+
+
+# === Fingerprints ===
+def file_sha256(file_path):
+    """Hash a file in fixed-size chunks. Returns None if the file does not exist."""
+    if not os.path.isfile(file_path):
+        return None
+    h = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for block in iter(lambda: f.read(HASH_CHUNK_SIZE), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def fingerprint(inputs, input_files=()):
+    """Fingerprint a stage's parameters plus the content of the files it reads."""
+    h = hashlib.sha256()
+    h.update(json.dumps(inputs, sort_keys=True, default=str).encode("utf-8"))
+    for path in sorted(input_files):
+        h.update(path.encode("utf-8"))
+        h.update((file_sha256(path) or "missing").encode("utf-8"))
+    return h.hexdigest()
+
+
+# === Checkpoint Storage ===
+def _checkpoint_path(stage, checkpoint_dir):
+    return os.path.join(checkpoint_dir, f"{stage}.json")
+
+
+def load_checkpoint(stage, checkpoint_dir=CHECKPOINT_DIR):
+    path = _checkpoint_path(stage, checkpoint_dir)
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def save_checkpoint(stage, record, checkpoint_dir=CHECKPOINT_DIR):
+    os.makedirs(checkpoint_dir, exist_ok=True)
+    path = _checkpoint_path(stage, checkpoint_dir)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(record, f, indent=2)
+    os.replace(tmp_path, path)  # atomic, so a crash never leaves a half-written checkpoint
+
+
+def clear_checkpoint(stage, checkpoint_dir=CHECKPOINT_DIR):
+    """Forget a stage so the next run executes it again."""
+    path = _checkpoint_path(stage, checkpoint_dir)
+    if os.path.exists(path):
+        os.remove(path)
+
+
+def is_stage_current(stage, fp, outputs, checkpoint_dir=CHECKPOINT_DIR):
+    """True if the stage last completed with this fingerprint and its outputs are unchanged on disk."""
+    record = load_checkpoint(stage, checkpoint_dir)
+    if not record or record.get("fingerprint") != fp:
+        return False
+    saved_outputs = record.get("outputs", {})
+    return all(path in saved_outputs and file_sha256(path) == saved_outputs[path] for path in outputs)
+
+
+# === Stage Runner ===
+def run_stage(stage, func, inputs, input_files=(), outputs=(), force=False, checkpoint_dir=CHECKPOINT_DIR):
+    """
+    Run func() unless the stage already completed with the same inputs and its outputs still exist.
+    Returns True if the stage ran, False if it was skipped.
+    """
+    with metrics.span(f"checkpoint.{stage}", forced=force) as s:
+        return _run_stage(s, stage, func, inputs, input_files, outputs, force, checkpoint_dir)
+
+
+def _run_stage(s, stage, func, inputs, input_files, outputs, force, checkpoint_dir):
+    fp = fingerprint(inputs, input_files)
+    if not force and is_stage_current(stage, fp, outputs, checkpoint_dir):
+        s.add("cache_hits")
+        print(f"⏭️ Skipping stage '{stage}' (inputs unchanged)")
+        return False
+    s.add("cache_misses")
+
+    start = time.time()
+    func()
+    duration = time.time() - start
+
+    missing = [path for path in outputs if not os.path.exists(path)]
+    if missing:
+        # Don't checkpoint a stage that didn't produce its outputs; rerun it next time
+        print(f"⚠️ Stage '{stage}' finished without producing: {', '.join(missing)}")
+        clear_checkpoint(stage, checkpoint_dir)
+        return True
+
+    save_checkpoint(stage, {
+        "stage": stage,
+        "fingerprint": fp,
+        "outputs": {path: file_sha256(path) for path in outputs},
+        "completed_at": datetime.now().isoformat(timespec="seconds"),
+        "duration": round(duration, 2),
+    }, checkpoint_dir)
+    return True
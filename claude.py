@@ -1,4 +1,3 @@
-import anthropic
 from docx import Document
 from docx.shared import Pt
 from docx.oxml.ns import qn
@@ -7,12 +6,17 @@ import re
 import sys
 import os
 from dotenv import load_dotenv
+import model_router
+import output_budget
+from metrics import traced
+from profiling import profiled
+import docx_reader
 
 load_dotenv()
 # === Read text from Word doc ===
+@traced("extract.docx")
 def read_docx_text(file_path):
-    doc = Document(file_path)
-    return "\n".join([para.text for para in doc.paragraphs if para.text.strip()])
+    return docx_reader.read_text(file_path)
 
 # === Add formatted text with bold styling ===
 def add_formatted_run(paragraph, text):
@@ -31,6 +35,7 @@ def add_formatted_run(paragraph, text):
         paragraph.add_run(text[pos:])
 
 # === Write Claude output to Word ===
+@traced("render.docx")
 def write_to_word(text, output_file="generated_study_plan.docx"):
     doc = Document()
     title = doc.add_heading("Generated Topic-Wise Study Plan", level=1)
@@ -170,39 +175,37 @@ Now write the most structured, visual-friendly, and exam-focused guide possible
 """
 
 # === Main processing function ===
-def main(certificate_name="PMP Certificate"):
+@traced("stage.claude")
+@profiled("claude.main")
+def main(certificate_name="PMP Certificate", input_file="gpt_study_plan.docx", output_file="generated_study_plan.docx"):
     # Step 1: Read input context
-    context_text = read_docx_text("gpt_study_plan.docx")
+    context_text = read_docx_text(input_file)
     print(f"📘 Certificate: {certificate_name}")
 
-    # Step 2: Construct prompt
+    # Step 2: Construct prompt (with the job's output-length budget, split across the plan's parts)
+    budget = output_budget.for_reduce(len(context_text.split()), default_max_tokens=20000, plan=True)
     prompt = build_prompt(certificate_name, context_text)
+    if budget.words:
+        prompt += budget.instruction(output_budget.allocate(
+            budget.words, {"Table of contents and timeline": 1, "Topics": 7, "Quick reference": 1}))
 
-    # Step 3: Setup Anthropic Client
-    claude_api_key=os.getenv("CLAUDE_API_KEY")
-    client = anthropic.Anthropic(
-        api_key=claude_api_key  # <-- Replace with your actual key
-    )
-
-    # Step 4: Stream response
+    # Step 3: Stream response (Anthropic, or the local stand-in when LLM_PROVIDER=local)
     print("⚙️ Generating content using Claude...")
-    stream = client.messages.create(
-        model="claude-opus-4-20250514",
-        stream=True,
-        max_tokens=20000,
+    stream = model_router.stream(
+        "claude.plan",
+        [{"role": "user", "content": prompt}],
+        max_tokens=budget.max_tokens,
         temperature=0.7,
-        messages=[{"role": "user", "content": prompt}]
     )
 
-    # Step 5: Accumulate and save response
+    # Step 4: Accumulate and save response
     response_text = ""
-    for event in stream:
-        if hasattr(event, "delta") and hasattr(event.delta, "text"):
-            response_text += event.delta.text
+    for delta in stream:
+        response_text += delta
 
-    # Step 6: Write to Word
-    write_to_word(response_text, "generated_study_plan.docx")
-    print("✅ Study plan generated: generated_study_plan.docx")
+    # Step 5: Write to Word
+    write_to_word(response_text, output_file)
+    print(f"✅ Study plan generated: {output_file}")
 
 # === CLI Entry ===
 if __name__ == "__main__":
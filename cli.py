@@ -0,0 +1,258 @@
+import os
+import re
+import sys
+import json
+import time
+import hashlib
+import argparse
+import multiprocessing
+from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from dotenv import load_dotenv
+
+load_dotenv()
+# === Configuration ===
+DOCUMENT_EXTENSIONS = (".pdf", ".docx")
+VIDEO_EXTENSIONS = (".mp4", ".mov", ".avi", ".mkv", ".webm")
+MANIFEST_EXTENSIONS = (".txt", ".json")
+YOUTUBE_PATTERN = re.compile(r"^https?://(www\.|m\.)?(youtube\.com|youtu\.be)/", re.IGNORECASE)
+MANIFEST_NAME = "manifest.json"
+DEFAULT_OUTPUT_DIR = "cli_outputs"
+
+
+# === Item Discovery ===
+def _kind_of(source):
+    if YOUTUBE_PATTERN.match(source):
+        return "youtube"
+    ext = os.path.splitext(source)[1].lower()
+    if ext in DOCUMENT_EXTENSIONS:
+        return "document"
+    if ext in VIDEO_EXTENSIONS:
+        return "video"
+    return None
+
+
+def _read_manifest(path):
+    """A .json list (of sources or {"source": ...} objects) or a text file with one source per line."""
+    base = os.path.dirname(os.path.abspath(path))
+    with open(path, "r", encoding="utf-8") as f:
+        if path.lower().endswith(".json"):
+            entries = [e["source"] if isinstance(e, dict) else e for e in json.load(f)]
+        else:
+            entries = [line.strip() for line in f if line.strip() and not line.lstrip().startswith("#")]
+    # Relative paths in a manifest are relative to the manifest itself
+    sources = [e if YOUTUBE_PATTERN.match(e) or os.path.isabs(e) else os.path.join(base, e) for e in entries]
+    for source in sources:
+        if not YOUTUBE_PATTERN.match(source) and not os.path.isfile(source):
+            # Kept, so the run records the failure on that item instead of silently dropping it
+            print(f"⚠️ Listed in {os.path.basename(path)} but not found: {source}")
+    return sources
+
+
+def collect_items(inputs):
+    """
+    Expand directories (recursively), manifests, files and YouTube URLs into
+    [{"id", "kind", "source"}], skipping unsupported files and duplicates.
+    """
+    sources = []
+    for entry in inputs:
+        if YOUTUBE_PATTERN.match(entry):
+            sources.append(entry)
+        elif os.path.isdir(entry):
+            for root, dirs, files in os.walk(entry):
+                dirs.sort()
+                sources.extend(os.path.join(root, name) for name in sorted(files))
+        elif entry.lower().endswith(MANIFEST_EXTENSIONS) and os.path.isfile(entry):
+            sources.extend(_read_manifest(entry))
+        elif os.path.isfile(entry):
+            sources.append(entry)
+        else:
+            print(f"⚠️ Not found: {entry}")
+
+    items, seen = [], set()
+    for source in sources:
+        kind = _kind_of(source)
+        if kind is None:
+            continue
+        item_id = source if kind == "youtube" else os.path.abspath(source)
+        if item_id not in seen:
+            seen.add(item_id)
+            items.append({"id": item_id, "kind": kind, "source": item_id})
+    return items
+
+
+def output_path_for(item, output_dir):
+    """Stable, readable per-item output file: <name>-<hash of id>.md."""
+    name = item["source"].rstrip("/").rsplit("/", 1)[-1] if item["kind"] == "youtube" else os.path.basename(item["source"])
+    name = re.sub(r"[^A-Za-z0-9._-]+", "_", os.path.splitext(name)[0])[:60] or "item"
+    digest = hashlib.sha256(item["id"].encode("utf-8")).hexdigest()[:8]
+    return os.path.join(output_dir, "items", f"{name}-{digest}.md")
+
+
+# === Manifest ===
+def load_manifest(output_dir):
+    path = os.path.join(output_dir, MANIFEST_NAME)
+    if not os.path.exists(path):
+        return {"items": {}}
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_manifest(output_dir, manifest):
+    path = os.path.join(output_dir, MANIFEST_NAME)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+def is_complete(record, item):
+    """
+    Done before at the same output length, its output is still there and (for files) the content has not changed since.
+    A partial summary (some part failed) is never complete, so the next run retries it.
+    """
+    if not record or record.get("status") != "done" or not os.path.exists(record.get("output", "")):
+        return False
+    if record.get("mode") != item.get("mode"):
+        return False
+    return item["kind"] == "youtube" or record.get("sha256") == item.get("sha256")
+
+
+# === Item Processing ===
+def _summarize(item):
+    from pipelines import summarize_cached
+
+    if item["kind"] == "youtube":
+        from youtube_summarizer import summarize_youtube_video
+        summary = summarize_youtube_video(item["source"], work_dir=os.path.dirname(item["output"]))
+        # summarize_youtube_video reports failures as text
+        if summary and summary.startswith("❌"):
+            raise RuntimeError(summary.lstrip("❌ "))
+        return summary, False
+
+    # The app's own cache helper, so a nightly run pre-warms it for uploads of the same files
+    if item["kind"] == "document":
+        from document_summarizer import generate_summary_from_file as summarize_file
+    else:
+        from video_summarizer import get_summary_from_video as summarize_file
+    return summarize_cached(item["kind"], {"name": os.path.basename(item["source"]), "sha256": item["sha256"]},
+                            lambda: summarize_file(item["source"]))
+
+
+def process_item(item):
+    """Summarize one item and write its output. Runs in a pool worker; returns its manifest record."""
+    import metrics
+    import output_budget
+    from summary_cache import is_partial
+
+    started = time.time()
+    record = {"source": item["source"], "kind": item["kind"], "sha256": item.get("sha256"),
+              "mode": item.get("mode"), "output": item["output"], "started_at": datetime.now().isoformat(timespec="seconds"),
+              "pid": os.getpid()}
+    try:
+        with metrics.job_context(item.get("run_id")), output_budget.job_mode(item.get("mode")), \
+                metrics.span(f"cli.{item['kind']}"):
+            summary, cached = _summarize(item)
+        if not summary:
+            raise RuntimeError("no summary generated")
+        os.makedirs(os.path.dirname(item["output"]), exist_ok=True)
+        with open(item["output"], "w", encoding="utf-8") as f:
+            f.write(summary)
+        if is_partial(summary):
+            record.update(status="partial", cached=False, chars=len(summary),
+                          error="partial summary: part of the source could not be summarized")
+        else:
+            record.update(status="done", cached=cached, chars=len(summary), error=None)
+    except Exception as e:
+        record.update(status="failed", error=f"{type(e).__name__}: {e}")
+    record["duration_s"] = round(time.time() - started, 3)
+    return record
+
+
+# === Runner ===
+def run(items, output_dir, workers=2, executor="process", force=False, mode=None):
+    """Process every item not already completed; the manifest is rewritten after each one finishes."""
+    from ingest import hash_file
+
+    os.makedirs(output_dir, exist_ok=True)
+    manifest = load_manifest(output_dir)
+    run_id = f"cli-{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+    pending, skipped, failed = [], 0, 0
+    started = time.perf_counter()
+    for item in items:
+        item["output"] = os.path.abspath(output_path_for(item, output_dir))
+        item["run_id"] = run_id
+        item["mode"] = mode
+        try:
+            if item["kind"] != "youtube":
+                item["sha256"] = hash_file(item["source"])
+        except OSError as e:
+            # A missing or unreadable file fails on its own; the rest of the run goes on
+            manifest["items"][item["id"]] = {"source": item["source"], "kind": item["kind"], "sha256": None,
+                                             "mode": mode, "output": item["output"], "status": "failed",
+                                             "error": f"{type(e).__name__}: {e}", "run_id": run_id}
+            print(f"❌ {item['kind']} {os.path.basename(item['source'])} ({type(e).__name__}: {e})")
+            failed += 1
+            continue
+        if not force and is_complete(manifest["items"].get(item["id"]), item):
+            skipped += 1
+            continue
+        pending.append(item)
+    if failed:
+        save_manifest(output_dir, manifest)
+    print(f"📋 {len(items)} item(s): {len(pending)} to process, {skipped} already complete, {failed} unreadable")
+
+    if executor == "process":
+        pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+    else:
+        pool = ThreadPoolExecutor(max_workers=workers)
+    with pool:
+        futures = {pool.submit(process_item, item): item for item in pending}
+        for done, future in enumerate(as_completed(futures), start=1):
+            item = futures[future]
+            try:
+                record = future.result()
+            except Exception as e:  # the worker process itself died
+                record = {"source": item["source"], "kind": item["kind"], "sha256": item.get("sha256"),
+                          "mode": item.get("mode"), "output": item["output"], "status": "failed", "error": f"{type(e).__name__}: {e}"}
+            record["run_id"] = run_id
+            manifest["items"][item["id"]] = record
+            save_manifest(output_dir, manifest)
+            icon = {"done": "✔", "partial": "⚠"}.get(record["status"], "❌")
+            detail = record["error"] or ("cached" if record.get("cached") else f"{record.get('duration_s', 0):.1f}s")
+            print(f"{icon} [{done}/{len(pending)}] {item['kind']} {os.path.basename(item['source'])} ({detail})")
+            failed += record["status"] != "done"
+
+    manifest["last_run"] = {"run_id": run_id, "items": len(items), "processed": len(pending), "skipped": skipped,
+                            "failed": failed, "workers": workers, "executor": executor,
+                            "wall_s": round(time.perf_counter() - started, 3)}
+    save_manifest(output_dir, manifest)
+    print(f"✅ Done in {manifest['last_run']['wall_s']:.1f}s: {len(items) - skipped - failed} summarized, "
+          f"{failed} failed, {skipped} skipped")
+    return manifest
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Summarize documents, videos and YouTube URLs without the web UI. Inputs may be directories "
+                    "(scanned recursively), .txt/.json manifests, individual files or YouTube URLs.")
+    parser.add_argument("inputs", nargs="+")
+    parser.add_argument("--output-dir", default=DEFAULT_OUTPUT_DIR, help="per-item summaries and manifest.json")
+    parser.add_argument("--workers", type=int, default=int(os.getenv("CLI_WORKERS", "2")))
+    parser.add_argument("--executor", choices=["process", "thread"], default="process",
+                        help="processes for CPU-bound work (extraction, local ASR), threads for API-bound work")
+    parser.add_argument("--force", action="store_true", help="reprocess items that are already complete")
+    parser.add_argument("--mode", choices=["quick", "standard", "exhaustive"], default=None,
+                        help="output length (default: OUTPUT_MODE, else exhaustive)")
+    args = parser.parse_args()
+
+    items = collect_items(args.inputs)
+    if not items:
+        print("⚠️ Nothing to summarize (supported: PDF, DOCX, videos, YouTube URLs)")
+        return 1
+    manifest = run(items, args.output_dir, args.workers, args.executor, args.force, args.mode)
+    return 1 if manifest["last_run"]["failed"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
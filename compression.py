@@ -0,0 +1,203 @@
+import os
+import re
+import sys
+import json
+import time
+import zlib
+import argparse
+import numpy as np
+from dotenv import load_dotenv
+from providers import count_tokens
+import metrics
+
+load_dotenv()
+# === Configuration ===
+# Extractive pre-compression: keep the most central sentences of a source (TextRank over TF-IDF
+# sentence vectors) so the LLM reads fewer input tokens. Off by default; the summary quality
+# trade-off should be checked on your own material first (see the spotcheck command below).
+COMPRESSION_ENABLED = os.getenv("COMPRESSION_ENABLED", "false").lower() == "true"
+COMPRESSION_RATIO = float(os.getenv("COMPRESSION_RATIO", "0.5"))            # fraction of tokens kept
+COMPRESSION_MIN_TOKENS = int(os.getenv("COMPRESSION_MIN_TOKENS", "2000"))   # shorter sources are sent as-is
+HASH_DIMENSIONS = 4096        # hashed vocabulary size of the sentence vectors
+BLOCK_SENTENCES = 1500        # sentences ranked together; bounds the similarity matrix (n² floats)
+PSEUDO_SENTENCE_WORDS = 30    # unpunctuated text (auto captions) is cut into runs of this many words
+DAMPING = 0.85
+ITERATIONS = 50
+TOLERANCE = 1e-6
+
+SENTENCE_END = re.compile(r"(?<=[.!?])\s+(?=[\"'(\[]?[A-Z0-9])|\n{2,}")
+WORD = re.compile(r"[a-z0-9]+(?:'[a-z]+)?")
+STOPWORDS = frozenset("""
+a about above after again against all am an and any are as at be because been before being below between both but by
+can could did do does doing down during each few for from further had has have having he her here hers him his how i
+if in into is it its itself just me more most my no nor not now of off on once only or other our ours out over own
+same she should so some such than that the their them then there these they this those through to too under until up
+very was we were what when where which while who whom why will with would you your yours yeah okay um uh like
+""".split())
+
+
+# === Sentences ===
+def split_sentences(text):
+    """Sentences of text; unpunctuated runs (e.g. auto-generated captions) become fixed-length word groups."""
+    sentences = []
+    for part in SENTENCE_END.split(text):
+        words = part.split()
+        if len(words) <= PSEUDO_SENTENCE_WORDS * 3:
+            if words:
+                sentences.append(" ".join(words))
+            continue
+        for i in range(0, len(words), PSEUDO_SENTENCE_WORDS):
+            sentences.append(" ".join(words[i:i + PSEUDO_SENTENCE_WORDS]))
+    return sentences
+
+
+def _terms(sentence):
+    return [w for w in WORD.findall(sentence.lower()) if w not in STOPWORDS and len(w) > 1]
+
+
+def sentence_vectors(sentences):
+    """L2-normalised TF-IDF vectors (hashed vocabulary), one row per sentence."""
+    counts = np.zeros((len(sentences), HASH_DIMENSIONS), dtype=np.float32)
+    for row, sentence in enumerate(sentences):
+        for term in _terms(sentence):
+            counts[row, zlib.crc32(term.encode("utf-8")) % HASH_DIMENSIONS] += 1.0
+    document_frequency = np.count_nonzero(counts, axis=0)
+    idf = np.log((1.0 + len(sentences)) / (1.0 + document_frequency)) + 1.0
+    vectors = np.log1p(counts) * idf.astype(np.float32)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.where(norms == 0, 1.0, norms)
+
+
+def textrank(vectors):
+    """PageRank over the cosine-similarity graph of the sentences; returns one score per row."""
+    n = len(vectors)
+    if n == 0:
+        return np.zeros(0, dtype=np.float32)
+    similarity = vectors @ vectors.T
+    np.fill_diagonal(similarity, 0.0)
+    np.clip(similarity, 0.0, None, out=similarity)
+    out_weight = similarity.sum(axis=1, keepdims=True)
+    # Sentences with no similar neighbour spread their rank evenly
+    transition = np.where(out_weight > 0, similarity / np.where(out_weight == 0, 1.0, out_weight), 1.0 / n)
+    scores = np.full(n, 1.0 / n, dtype=np.float32)
+    for _ in range(ITERATIONS):
+        updated = (1.0 - DAMPING) / n + DAMPING * (transition.T @ scores)
+        if np.abs(updated - scores).sum() < TOLERANCE:
+            return updated
+        scores = updated
+    return scores
+
+
+def rank_sentences(sentences):
+    """TextRank scores; long inputs are ranked in blocks so memory stays bounded."""
+    scores = np.zeros(len(sentences), dtype=np.float32)
+    for start in range(0, len(sentences), BLOCK_SENTENCES):
+        block = sentences[start:start + BLOCK_SENTENCES]
+        # Normalise per block so blocks of different sizes compete fairly
+        scores[start:start + len(block)] = textrank(sentence_vectors(block)) * len(block)
+    return scores
+
+
+# === Compression ===
+def compress(text, ratio=None, max_tokens=None, min_tokens=0):
+    """
+    Keep the highest-ranked sentences, in their original order, until ratio of the tokens
+    (or max_tokens, whichever is smaller) is used, but never less than min_tokens.
+    Returns (compressed_text, stats).
+    """
+    ratio = COMPRESSION_RATIO if ratio is None else ratio
+    started = time.perf_counter()
+    sentences = split_sentences(text)
+    lengths = np.array([count_tokens(s) for s in sentences], dtype=np.int64)
+    tokens_before = int(lengths.sum())
+    budget = max(int(tokens_before * ratio), min(min_tokens, tokens_before))
+    if max_tokens is not None:
+        budget = min(budget, max_tokens)
+
+    keep = np.zeros(len(sentences), dtype=bool)
+    used = 0
+    for index in np.argsort(-rank_sentences(sentences), kind="stable"):
+        if used + lengths[index] <= budget:
+            keep[index] = True
+            used += int(lengths[index])
+    compressed = " ".join(s for s, kept in zip(sentences, keep) if kept)
+    return compressed, {"tokens_before": tokens_before, "tokens_after": used, "sentences": len(sentences),
+                        "kept": int(keep.sum()), "seconds": round(time.perf_counter() - started, 3)}
+
+
+def compress_source(text, label="source", ratio=None, max_tokens=None):
+    """
+    The pipeline hook: compress text before it is prompted when COMPRESSION_ENABLED is set and the
+    source is long enough to be worth it; otherwise return it unchanged. Call it once per source:
+    each keeps at least COMPRESSION_MIN_TOKENS, so a short source is never scored away by a long one.
+    """
+    if not COMPRESSION_ENABLED or not text or count_tokens(text) < COMPRESSION_MIN_TOKENS:
+        return text
+    with metrics.span(f"compress.{label}") as s:
+        compressed, stats = compress(text, ratio, max_tokens, min_tokens=COMPRESSION_MIN_TOKENS)
+        s.set(**stats)
+    reduction = 1 - stats["tokens_after"] / stats["tokens_before"] if stats["tokens_before"] else 0.0
+    print(f"🗜️ Compressed {label}: {stats['tokens_before']} → {stats['tokens_after']} tokens "
+          f"({reduction:.0%} fewer) in {stats['seconds']:.2f}s")
+    return compressed
+
+
+# === Quality Spot-Check ===
+def keyword_recall(original, compressed, top=30):
+    """Share of the original's most distinctive terms (by frequency x length) that survive compression."""
+    frequency = {}
+    for term in _terms(original):
+        frequency[term] = frequency.get(term, 0) + 1
+    keywords = sorted(frequency, key=lambda t: frequency[t] * len(t), reverse=True)[:top]
+    kept = set(_terms(compressed))
+    return sum(1 for k in keywords if k in kept) / len(keywords) if keywords else 1.0
+
+
+def _llm_summary(text):
+    import model_router
+    return model_router.complete("document.chunk", [{"role": "user", "content": (
+        "Summarize the following text in detail, covering every topic it mentions.\n\n" + text)}], temperature=0)
+
+
+def spotcheck(paths, ratios, with_llm=False, samples=3):
+    """Token reduction and quality proxies of compression at each ratio, per file."""
+    from document_summarizer import extract_text, clean_text
+
+    report = []
+    for path in paths:
+        text = clean_text(extract_text(path)) if path.endswith((".pdf", ".docx")) else open(path, encoding="utf-8").read()
+        reference = _llm_summary(text) if with_llm else None
+        for ratio in ratios:
+            compressed, stats = compress(text, ratio)
+            entry = dict(stats, file=path, ratio=ratio,
+                         reduction=round(1 - stats["tokens_after"] / max(1, stats["tokens_before"]), 3),
+                         keyword_recall=round(keyword_recall(text, compressed), 3))
+            if with_llm:
+                # Same question, full vs compressed input: how much of the full-input summary's content survives
+                entry["summary_keyword_recall"] = round(keyword_recall(reference, _llm_summary(compressed)), 3)
+            kept = set(split_sentences(compressed))
+            entry["dropped_examples"] = [s for s in split_sentences(text) if s not in kept][:samples]
+            report.append(entry)
+            print(f"  {os.path.basename(path):<32} ratio {ratio:.2f}: {stats['tokens_before']:>7} → "
+                  f"{stats['tokens_after']:>7} tokens ({entry['reduction']:.0%} fewer) in {stats['seconds']:.2f}s, "
+                  f"keyword recall {entry['keyword_recall']:.2f}"
+                  + (f", summary recall {entry['summary_keyword_recall']:.2f}" if with_llm else ""))
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Spot-check extractive compression on sample sources.")
+    parser.add_argument("files", nargs="+", help="PDF, DOCX or text files")
+    parser.add_argument("--ratios", default="0.3,0.5,0.7")
+    parser.add_argument("--llm", action="store_true",
+                        help="also summarize full vs compressed input and compare (calls the configured provider)")
+    parser.add_argument("--output", default="compression_spotcheck.json")
+    args = parser.parse_args()
+    report = spotcheck(args.files, [float(r) for r in args.ratios.split(",")], args.llm)
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"✅ Spot-check saved to {args.output}")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,115 @@
+import time
+import traceback
+import contextvars
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+import metrics
+
+
+class Node:
+    """
+    func(inputs) runs once every dependency has finished; inputs maps each successful dependency to its result.
+    requires: dependencies that must succeed (otherwise this node is skipped).
+    after: dependencies that only order the run; their failure is tolerated.
+    """
+
+    def __init__(self, name, func, requires=(), after=()):
+        self.name = name
+        self.func = func
+        self.requires = tuple(requires)
+        self.after = tuple(after)
+
+    @property
+    def deps(self):
+        return self.requires + self.after
+
+
+class DAG:
+    """A small dependency graph whose independent nodes run concurrently on a thread pool."""
+
+    def __init__(self):
+        self.nodes = {}
+
+    def add(self, name, func, requires=(), after=()):
+        if name in self.nodes:
+            raise ValueError(f"Duplicate node: {name}")
+        self.nodes[name] = Node(name, func, requires, after)
+        return name
+
+    def validate(self):
+        for node in self.nodes.values():
+            missing = [d for d in node.deps if d not in self.nodes]
+            if missing:
+                raise ValueError(f"Node '{node.name}' depends on unknown node(s): {', '.join(missing)}")
+        visiting, visited = set(), set()
+
+        def visit(name):
+            if name in visited:
+                return
+            if name in visiting:
+                raise ValueError(f"Cycle through node '{name}'")
+            visiting.add(name)
+            for dep in self.nodes[name].deps:
+                visit(dep)
+            visiting.discard(name)
+            visited.add(name)
+
+        for name in self.nodes:
+            visit(name)
+
+    def _run_node(self, node, inputs, started_at):
+        with metrics.span(f"dag.{node.name}") as s:
+            start = time.perf_counter()
+            record = {"status": "done", "result": None, "error": None, "start_s": round(start - started_at, 3)}
+            try:
+                record["result"] = node.func(inputs)
+            except Exception as e:
+                # Failure isolation: a failed node is reported, not raised
+                traceback.print_exc()
+                record["status"], record["error"] = "failed", f"{type(e).__name__}: {e}"
+                s.error = record["error"]
+            record["duration_s"] = round(time.perf_counter() - start, 3)
+            return record
+
+    def run(self, max_workers=None, on_done=None):
+        """
+        Execute the graph. Returns {name: {"status", "result", "error", "start_s", "duration_s"}}
+        where status is done, failed or skipped; on_done(name, record) is called as each node settles.
+        """
+        self.validate()
+        started_at = time.perf_counter()
+        pending = dict(self.nodes)
+        running = {}
+        report = {}
+
+        def settle(name, record):
+            report[name] = record
+            if on_done:
+                on_done(name, record)
+
+        with ThreadPoolExecutor(max_workers=max_workers or max(1, len(self.nodes))) as pool:
+            while pending or running:
+                # Skipping a node settles it at once and may unblock its dependents, so keep
+                # scanning until a pass skips nothing; only then wait for a running node.
+                skipped = True
+                while skipped:
+                    skipped = False
+                    for name, node in list(pending.items()):
+                        if any(dep not in report for dep in node.deps):
+                            continue
+                        del pending[name]
+                        failed = [dep for dep in node.requires if report[dep]["status"] != "done"]
+                        if failed:
+                            settle(name, {"status": "skipped", "result": None, "error": f"needs {', '.join(failed)}",
+                                          "start_s": round(time.perf_counter() - started_at, 3), "duration_s": 0.0})
+                            skipped = True
+                            continue
+                        inputs = {dep: report[dep]["result"] for dep in node.deps if report[dep]["status"] == "done"}
+                        # copy_context so spans opened by the node stay attached to the current job
+                        future = pool.submit(contextvars.copy_context().run, self._run_node, node, inputs, started_at)
+                        running[future] = name
+                if not running:
+                    break
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    settle(running.pop(future), future.result())
+        return report
@@ -1,19 +1,81 @@
 import os
+import re
+import mmap
+import hashlib
+import threading
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
 import fitz  # PyMuPDF
-import docx
-from openai import OpenAI
+import docx_reader
 import tiktoken
 import time
 from dotenv import load_dotenv
+import model_router
+import output_budget
+from summary_cache import PartialSummary, is_partial, cache_key, get_cached_summary, put_cached_summary
+from metrics import traced
+from profiling import profiled
 
 load_dotenv()
-# === OpenAI Client Setup ===
-openai_api_key = os.getenv("OPENAI_API_KEY")
-client = OpenAI(api_key=openai_api_key)
+# Seconds to pause after each GPT call (plus a 2s buffer) to stay under the TPM limit; 0 disables
+RATE_LIMIT_DELAY = float(os.getenv("RATE_LIMIT_DELAY", "15"))
+# === Chapter Splitting ===
+CHAPTER_MIN_TOKENS = int(os.getenv("CHAPTER_MIN_TOKENS", "20000"))  # shorter PDFs stay a single prompt
+CHAPTER_MERGE_TOKENS = int(os.getenv("CHAPTER_MERGE_TOKENS", "1500"))  # shorter sections join a neighbour
+CHAPTER_WORKERS = int(os.getenv("CHAPTER_WORKERS", "4"))
+HEADING_ZONE = 0.3          # top fraction of a page searched for a chapter heading
+HEADING_SIZE_RATIO = 1.6    # a heading's font is at least this much larger than the body text
+HEADING_SAMPLE_PAGES = 8    # pages sampled to find the body text's font size
+HEADING_PAGE_SHARE = 0.5   # more pages than this starting a "chapter" means slides, not chapters
+CHAPTER_TITLE_CHARS = 120
+CHAPTER_PATTERN = re.compile(r"^(chapter|part|unit|module|lesson)\s+([0-9]+|[ivxlcdm]+)\b", re.IGNORECASE)
+# === Format Sniffing ===
+PDF_MAGIC = b"%PDF-"
+ZIP_MAGIC = b"PK\x03\x04"  # .docx is a zip container
+SNIFF_BYTES = 1024        # PDF readers accept junk before the header within the first 1 KB
+
+def sniff_format(head):
+    """Detect "pdf" or "docx" from the leading bytes of a file; None if neither."""
+    head = bytes(head[:SNIFF_BYTES])
+    if head.startswith(ZIP_MAGIC):
+        return "docx"
+    if PDF_MAGIC in head:
+        return "pdf"
+    return None
+
+def _is_path(source):
+    return isinstance(source, (str, os.PathLike))
+
+def _as_stream(source):
+    """
+    Turn an in-memory source into something PyMuPDF / python-docx can open without a disk round trip.
+    BytesIO (including Streamlit's UploadedFile) is passed through; getvalue() on it returns the
+    shared bytes object rather than a copy.
+    """
+    if isinstance(source, (bytes, bytearray, memoryview, mmap.mmap)):
+        return source
+    if hasattr(source, "getvalue"):
+        return source.getvalue()
+    if hasattr(source, "read"):
+        source.seek(0)
+        return source.read()
+    raise TypeError(f"Unsupported document source: {type(source).__name__}")
+
 # === File Extraction ===
-def extract_text_from_pdf(file_path):
+def _open_pdf(source):
+    if _is_path(source):
+        return fitz.open(source)  # MuPDF reads pages lazily from the file
+    stream = _as_stream(source)
+    if isinstance(stream, memoryview) and isinstance(stream.obj, bytes) and stream.nbytes == len(stream.obj):
+        stream = stream.obj  # view over a whole bytes object: hand over the original, no copy
+    if not isinstance(stream, bytes):
+        stream = bytes(stream)
+    return fitz.open(stream=stream, filetype="pdf")
+
+def extract_text_from_pdf(source):
+    """source: a file path, bytes/bytearray/memoryview, mmap, or a binary file object."""
     try:
-        doc = fitz.open(file_path)
+        doc = _open_pdf(source)
         text = "".join(page.get_text() for page in doc)
         doc.close()
         return text
@@ -21,40 +83,88 @@ def extract_text_from_pdf(file_path):
         print(f"[ERROR] PDF extract: {e}")
         return ""
 
-def extract_text_from_docx(file_path):
+def extract_text_from_docx(source):
+    """source: a file path, bytes/bytearray/memoryview, mmap, or a binary file object."""
     try:
-        doc = docx.Document(file_path)
-        return "\n".join(para.text for para in doc.paragraphs)
+        if not (_is_path(source) or isinstance(source, mmap.mmap) or hasattr(source, "seek")):
+            source = _as_stream(source)
+        # mmap is file-like; zipfile only reads the parts it needs
+        return "\n".join(docx_reader.iter_paragraphs(source))
     except Exception as e:
         print(f"[ERROR] DOCX extract: {e}")
         return ""
 
-def extract_text(file_path):
-    if file_path.endswith(".pdf"):
-        return extract_text_from_pdf(file_path)
-    elif file_path.endswith(".docx"):
-        return extract_text_from_docx(file_path)
+def _extract_by_format(fmt, source):
+    if fmt == "pdf":
+        return extract_text_from_pdf(source)
+    elif fmt == "docx":
+        return extract_text_from_docx(source)
+    raise ValueError("Unsupported file type. Only .pdf and .docx supported.")
+
+def _format_from_name(filename):
+    if filename and filename.lower().endswith(".pdf"):
+        return "pdf"
+    if filename and filename.lower().endswith(".docx"):
+        return "docx"
+    return None
+
+@traced("extract.document")
+def extract_text(source, filename=None, use_mmap=False):
+    """
+    Extract text from a PDF or DOCX given a path or an in-memory buffer.
+    The format is sniffed from magic bytes; the filename extension is only a fallback.
+    With use_mmap=True a path is memory-mapped instead of read.
+    """
+    if _is_path(source):
+        filename = filename or os.fspath(source)
+        with open(source, "rb") as f:
+            if not use_mmap or os.fstat(f.fileno()).st_size == 0:
+                fmt = sniff_format(f.read(SNIFF_BYTES)) or _format_from_name(filename)
+                return _extract_by_format(fmt, source)
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                fmt = sniff_format(mm[:SNIFF_BYTES]) or _format_from_name(filename)
+                # MuPDF streams PDFs from the path itself; python-docx reads the zip through the map
+                return _extract_by_format(fmt, mm if fmt == "docx" else source)
+
+    return _extract_by_format(detect_format(source, filename), source)
+
+def detect_format(source, filename=None):
+    """"pdf", "docx" or None for a path or an in-memory buffer, by magic bytes first and name second."""
+    if _is_path(source):
+        with open(source, "rb") as f:
+            return sniff_format(f.read(SNIFF_BYTES)) or _format_from_name(filename or os.fspath(source))
+    if hasattr(source, "getbuffer"):
+        head = source.getbuffer()[:SNIFF_BYTES]
+    elif hasattr(source, "read"):
+        source.seek(0)
+        head = source.read(SNIFF_BYTES)
     else:
-        raise ValueError("Unsupported file type. Only .pdf and .docx supported.")
+        head = memoryview(source)[:SNIFF_BYTES]
+    fmt = sniff_format(head) or _format_from_name(filename or getattr(source, "name", None))
+    del head  # release the buffer export before anything resizes the stream
+    return fmt
 
 # === Utility Functions ===
 def clean_text(text):
     text = ''.join(c for c in text if c.isprintable())
     return " ".join(text.split())
 
+@traced("tokenize.count")
 def count_tokens(text):
     enc = tiktoken.encoding_for_model('gpt-4')
     return len(enc.encode(text))
 
+@traced("tokenize.split")
 def split_text_by_tokens(text, max_tokens=280000):
     enc = tiktoken.encoding_for_model('gpt-4')
     tokens = enc.encode(text)
     return [enc.decode(tokens[i:i + max_tokens]) for i in range(0, len(tokens), max_tokens)]
 
 # === Prompt for summarization ===
-def build_summary_prompt(text_chunk):
+def build_summary_prompt(text_chunk, chapter_title=None, budget=None):
+    subject = f'this chapter ("{chapter_title}") of a larger document' if chapter_title else "this text"
     return f"""
-Summarize this text in detail. Cover ALL topics and important points mentioned.
+Summarize {subject} in detail. Cover ALL topics and important points mentioned.
 
 REQUIREMENTS:
 - Include every major concept, fact, and idea
@@ -73,28 +183,60 @@ TEXT:
 \"\"\"
 {text_chunk}
 \"\"\"
-
+{budget.instruction() if budget else ""}
 """
 
 # === GPT Request ===
-def get_gpt_response(prompt, model="gpt-4.1-mini"):
-    delay = 15
-    print(f"⏳ Waiting {delay}s to respect rate limits...")
+_pace_lock = threading.Lock()
+_next_call_at = 0.0
+
+def _wait_turn(delay):
+    """
+    Space call starts RATE_LIMIT_DELAY (+2s buffer) apart across all threads, so calls running
+    side by side (chapters) keep the same TPM pace as calls made one after another.
+    """
+    global _next_call_at
+    with _pace_lock:
+        now = time.monotonic()
+        start = max(now, _next_call_at)
+        _next_call_at = start + delay + 2
+    if start > now:
+        time.sleep(start - now)
+
+def get_gpt_response(prompt, model=None, max_tokens=None):
+    delay = RATE_LIMIT_DELAY
+    if delay:
+        print(f"⏳ Waiting for a rate-limit slot ({delay}s between calls)...")
+        _wait_turn(delay)
     try:
-        response = client.chat.completions.create(
+        content = model_router.complete(
+            "document.chunk",
+            [{"role": "user", "content": prompt}],
+            max_tokens=max_tokens,
             model=model,
-            messages=[{"role": "user", "content": prompt}],
             temperature=0.5,
         )
-        time.sleep(delay + 2)  # Respect TPM limit
-        return response.choices[0].message.content
+        return content
     except Exception as e:
         print("❌ GPT error:", e)
         return ""
 
+def _with_gaps(summary, missing):
+    """
+    get_gpt_response reports a failed call as "", so a summary can silently lack parts of its source.
+    With any missing (labels of the parts that failed), return a PartialSummary that says so; it is never cached.
+    Nothing summarized at all stays "", a failed summary.
+    """
+    if not missing or not summary:
+        return summary
+    return PartialSummary(f"⚠️ Summarizing failed for {', '.join(missing)}; that part of the document is "
+                          f"missing from this summary.\n\n{summary}")
+
 # === Main summary function to call externally ===
-def generate_summary_from_file(file_path):
-    raw_text = extract_text(file_path)
+def document_chunks(source, filename=None, raw_text=None):
+    """The cleaned text of a document split into prompt-sized chunks (raw_text: already extracted text)."""
+    if raw_text is None:
+        raw_text = extract_text(source, filename, use_mmap=_is_path(source))
     if not raw_text:
         raise Exception("No text extracted from the document.")
 
@@ -104,13 +246,277 @@ def generate_summary_from_file(file_path):
 
     chunks = split_text_by_tokens(context, max_tokens=280000)
     print(f"✂️ Total chunks: {len(chunks)}")
+    return chunks
+
+@traced("summary.document")
+@profiled("generate_summary_from_file")
+def generate_summary_from_file(source, filename=None):
+    """
+    source: a file path or an in-memory buffer (bytes, memoryview, BytesIO/UploadedFile).
+    Long PDFs with an outline (or detectable chapter headings) are summarized chapter by chapter;
+    everything else is split by token count.
+    """
+    raw_text = None
+    if detect_format(source, filename) == "pdf":
+        structure = read_pdf_structure(source)
+        chapters = pdf_chapters(structure)
+        if sum(c["tokens"] for c in chapters) >= CHAPTER_MIN_TOKENS:
+            return summarize_chapters(chapters)
+        raw_text = "".join(structure["pages"])  # reuse the pages already read; no second extraction
+
+    chunks = document_chunks(source, filename, raw_text)
 
     full_summary = ""
+    missing = []
     for i, chunk in enumerate(chunks):
         print(f"🚀 Summarizing chunk {i+1}/{len(chunks)}...")
-        prompt = build_summary_prompt(chunk)
-        result = get_gpt_response(prompt)
-        full_summary += result + "\n\n"
+        budget = output_budget.for_text(len(chunk.split()))
+        prompt = build_summary_prompt(chunk, budget=budget)
+        result = get_gpt_response(prompt, max_tokens=budget.max_tokens)
+        if result:
+            full_summary += result + "\n\n"
+        else:
+            missing.append(f"part {i+1} of {len(chunks)}")
+
+    return _with_gaps(full_summary.strip(), missing)
+
+# === Chapter-Aware PDF Summaries ===
+def _toc_starts(doc):
+    """(first_page, title) of each top-level outline entry; the shallowest level with several entries wins."""
+    toc = [(level, title.strip(), page) for level, title, page in doc.get_toc(simple=True)
+           if 1 <= page <= doc.page_count and title.strip()]
+    for level in sorted({entry[0] for entry in toc}):
+        starts = {}
+        for entry_level, title, page in toc:
+            if entry_level == level:
+                starts.setdefault(page - 1, title)
+        if len(starts) >= 2:
+            return sorted(starts.items())
+    return []
+
+def _line_sizes(page, clip=None):
+    """(font size, text) of each text line on a page (or within clip)."""
+    lines = []
+    for block in page.get_text("dict", clip=clip).get("blocks", []):
+        for line in block.get("lines", []):
+            text = "".join(span["text"] for span in line["spans"]).strip()
+            if text:
+                lines.append((max(span["size"] for span in line["spans"]), text))
+    return lines
+
+def _body_font_size(doc, sample_pages=HEADING_SAMPLE_PAGES):
+    """Font size most of the text is set in, from a handful of pages spread through the document."""
+    step = max(1, doc.page_count // sample_pages)
+    weights = {}
+    for number in range(0, doc.page_count, step):
+        for size, text in _line_sizes(doc[number]):
+            weights[round(size, 1)] = weights.get(round(size, 1), 0) + len(text)
+    return max(weights, key=weights.get) if weights else None
+
+def _page_heading(page, body_size):
+    """Title of a chapter starting on this page, judged from the text near the top of it; None otherwise."""
+    zone = fitz.Rect(page.rect.x0, page.rect.y0, page.rect.x1, page.rect.y0 + page.rect.height * HEADING_ZONE)
+    lines = _line_sizes(page, zone)
+    for _, text in lines[:3]:
+        if CHAPTER_PATTERN.match(text):
+            return text[:CHAPTER_TITLE_CHARS]
+    if not lines or not body_size:
+        return None
+    size, text = max(lines, key=lambda line: line[0])
+    if size >= body_size * HEADING_SIZE_RATIO and not text.isdigit():
+        return text[:CHAPTER_TITLE_CHARS]
+    return None
+
+def _merged_title(titles):
+    """"A / B" for a few merged sections; "A … Z" once that would get long (e.g. runs of slide titles)."""
+    title = " / ".join(titles)
+    if len(title) > CHAPTER_TITLE_CHARS:
+        title = f"{titles[0]} … {titles[-1]}"
+    return title[:CHAPTER_TITLE_CHARS]
+
+def _merge_short(chapters):
+    """Fold sections too short to be worth a call of their own (title pages, epigraphs) into a neighbour."""
+    merged, titles = [], []
+    for chapter in chapters:
+        if merged and (chapter["tokens"] < CHAPTER_MERGE_TOKENS or merged[-1]["tokens"] < CHAPTER_MERGE_TOKENS):
+            previous = merged[-1]
+            titles[-1].append(chapter["title"])
+            previous["title"] = _merged_title(titles[-1])
+            previous["text"] = f"{previous['text']} {chapter['text']}".strip()
+            previous["tokens"] += chapter["tokens"]
+            previous["pages"] = (previous["pages"][0], chapter["pages"][1])
+        else:
+            merged.append(chapter)
+            titles.append([chapter["title"]])
+    return merged
+
+@traced("extract.pdf_structure")
+def read_pdf_structure(source):
+    """
+    One pass over a PDF: the text of every page plus where chapters start, from its outline or, when it
+    has none, from large/"Chapter N" headings. Returns {"pages": [text], "starts": [(page index, title)]}.
+    """
+    try:
+        doc = _open_pdf(source)
+    except Exception as e:
+        print(f"[ERROR] PDF open: {e}")
+        return {"pages": [], "starts": []}
+    try:
+        pages = []
+        starts = _toc_starts(doc)
+        body_size = None if starts else _body_font_size(doc)
+        for number, page in enumerate(doc):
+            pages.append(page.get_text())
+            if body_size:
+                title = _page_heading(page, body_size)
+                if title:
+                    starts.append((number, title))
+    finally:
+        doc.close()
+    # Slide decks put a large title on (nearly) every page: those are slides, not chapters
+    if len(starts) > len(pages) * HEADING_PAGE_SHARE:
+        print(f"📑 {len(starts)} headings on {len(pages)} pages looks like slides; not splitting into chapters")
+        starts = []
+    return {"pages": pages, "starts": starts}
+
+@traced("extract.chapters")
+def pdf_chapters(source):
+    """
+    Split a PDF into chapters (source: a path/buffer, or the result of read_pdf_structure).
+    Returns [{"title", "pages": (first, last), "text", "tokens"}] with cleaned text, or [] if no structure was found.
+    """
+    structure = source if isinstance(source, dict) else read_pdf_structure(source)
+    pages, starts = structure["pages"], list(structure["starts"])
+    if len(starts) < 2:
+        return []
+    if starts[0][0] > 0:
+        starts.insert(0, (0, "Front matter"))
+    chapters = []
+    for (first, title), (end, _) in zip(starts, starts[1:] + [(len(pages), None)]):
+        text = clean_text("".join(pages[first:end]))
+        if text:
+            chapters.append({"title": title, "pages": (first + 1, end), "text": text, "tokens": count_tokens(text)})
+    chapters = _merge_short(chapters)
+    return chapters if len(chapters) >= 2 else []
+
+def _chapter_key(chapter, model=None):
+    return cache_key("chapter", hashlib.sha256(chapter["text"].encode("utf-8")).hexdigest(), model or "routed",
+                     *output_budget.cache_parts())
+
+def _chapter_chunks(chapter):
+    return split_text_by_tokens(chapter["text"], max_tokens=280000) if chapter["tokens"] > 280000 else [chapter["text"]]
+
+def summarize_chapter(chapter, model=None):
+    """Summary of one chapter, cached by a hash of its text so unchanged chapters are never redone."""
+    key = _chapter_key(chapter, model)
+    cached = get_cached_summary(key)
+    if cached:
+        print(f"♻️ Reusing summary of unchanged chapter: {chapter['title']}")
+        return cached
+    parts = []
+    for chunk in _chapter_chunks(chapter):
+        budget = output_budget.for_text(len(chunk.split()))
+        parts.append(get_gpt_response(build_summary_prompt(chunk, chapter["title"], budget), model=model,
+                                      max_tokens=budget.max_tokens))
+    summary = "\n\n".join(part for part in parts if part).strip()
+    if not all(parts):
+        return PartialSummary(summary)  # summarize_chapters names the chapter as incomplete
+    put_cached_summary(key, summary)
+    return summary
+
+def _assemble_chapters(titles, summaries):
+    """Chapter summaries under their titles, in document order; partial if any chapter is missing or incomplete."""
+    summary = "\n\n".join(f"## {title}\n\n{text}" for title, text in zip(titles, summaries) if text).strip()
+    missing = [f'"{title}"' for title, text in zip(titles, summaries) if not text or is_partial(text)]
+    return _with_gaps(summary, missing)
+
+@traced("summary.chapters")
+def summarize_chapters(chapters, model=None):
+    """Summarize chapters concurrently and assemble them in document order under their titles."""
+    print(f"📚 {len(chapters)} chapters, summarizing {CHAPTER_WORKERS} at a time")
+    with ThreadPoolExecutor(max_workers=CHAPTER_WORKERS) as pool:
+        futures = [pool.submit(contextvars.copy_context().run, summarize_chapter, chapter, model) for chapter in chapters]
+        summaries = [future.result() for future in futures]
+    return _assemble_chapters([chapter["title"] for chapter in chapters], summaries)
+
+# === Bulk (Batch API) summaries ===
+def document_units(path, model=None):
+    """
+    How generate_summary_from_file splits a document, for the batch path to follow:
+    [{"title", "chunks", "key"}], one per chapter of a long structured PDF (with its chapter cache key),
+    else a single untitled unit holding the token chunks.
+    """
+    raw_text = None
+    if detect_format(path) == "pdf":
+        structure = read_pdf_structure(path)
+        chapters = pdf_chapters(structure)
+        if sum(c["tokens"] for c in chapters) >= CHAPTER_MIN_TOKENS:
+            return [{"title": c["title"], "chunks": _chapter_chunks(c), "key": _chapter_key(c, model)} for c in chapters]
+        raw_text = "".join(structure["pages"])
+    return [{"title": None, "chunks": document_chunks(path, raw_text=raw_text), "key": None}]
+
+@traced("summary.documents_batch")
+def generate_summaries_batch(paths, model=None, state_path=None, progress=None):
+    """
+    Summarize many documents at once: every chunk of every document goes into one asynchronous batch,
+    so there is no per-call rate-limit sleep and tokens are billed at the batch price.
+    Documents are split exactly as generate_summary_from_file splits them (chapters of long PDFs included,
+    sharing its chapter cache), so bulk and interactive summaries have the same shape.
+    Chunks the batch could not answer are retried through the synchronous path.
+    Returns {path: summary} ("" for documents without text).
+    """
+    import batch
 
-    return full_summary.strip()
+    units_by_path, requests, summaries = {}, [], {}
+    for path in paths:
+        try:
+            units = document_units(path, model)
+        except Exception as e:
+            print(f"⚠️ {os.path.basename(path)}: {e}")
+            summaries[path] = ""
+            continue
+        units_by_path[path] = units
+        for u, unit in enumerate(units):
+            unit["cached"] = get_cached_summary(unit["key"]) if unit["key"] else None
+            if unit["cached"]:
+                print(f"♻️ Reusing summary of unchanged chapter: {unit['title']}")
+                continue
+            for i, chunk in enumerate(unit["chunks"]):
+                budget = output_budget.for_text(len(chunk.split()))
+                prompt = build_summary_prompt(chunk, unit["title"], budget)
+                chunk_model = model or model_router.route("document.chunk", [{"role": "user", "content": prompt}],
+                                                          budget.max_tokens).model
+                requests.append(batch.make_request(f"{path}::{u}::{i}", prompt, chunk_model, budget.max_tokens,
+                                                   temperature=0.5))
+    print(f"📦 {len(requests)} chunk(s) from {len(units_by_path)} document(s) in one batch")
 
+    results = batch.run_batch(requests, state_path=state_path, progress=progress)
+    prompts = {r["custom_id"]: r for r in requests}
+    for path, units in units_by_path.items():
+        texts = []
+        for u, unit in enumerate(units):
+            summary = unit["cached"]
+            if not summary:
+                parts = []
+                for i in range(len(unit["chunks"])):
+                    result = results.get(f"{path}::{u}::{i}") or {"text": None, "error": "missing from batch output"}
+                    if result["text"] is None:
+                        print(f"⚠️ Batch chunk {i+1} of {os.path.basename(path)} failed ({result['error']}); "
+                              "retrying directly")
+                        request = prompts[f"{path}::{u}::{i}"]
+                        parts.append(get_gpt_response(request["messages"][-1]["content"], model=model,
+                                                      max_tokens=request["max_tokens"]))
+                    else:
+                        parts.append(result["text"])
+                summary = "\n\n".join(part for part in parts if part).strip()
+                if not all(parts):
+                    missing = [f"part {i+1} of {len(parts)}" for i, part in enumerate(parts) if not part]
+                    summary = PartialSummary(summary) if unit["title"] is not None else _with_gaps(summary, missing)
+                elif unit["key"]:
+                    put_cached_summary(unit["key"], summary)
+            texts.append(summary)
+        if units and units[0]["title"] is None:
+            summaries[path] = texts[0]
+        else:
+            summaries[path] = _assemble_chapters([unit["title"] for unit in units], texts)
+    return summaries
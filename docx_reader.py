@@ -0,0 +1,70 @@
+import io
+import os
+import zipfile
+import xml.etree.ElementTree as ET
+
+# Streams paragraph text straight out of word/document.xml instead of building a python-docx tree.
+W_NS = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+BODY = W_NS + "body"
+PARAGRAPH = W_NS + "p"
+TEXT = W_NS + "t"
+# Inline elements python-docx renders as characters in paragraph.text
+SPECIAL_CHARS = {W_NS + "tab": "\t", W_NS + "br": "\n", W_NS + "cr": "\n", W_NS + "noBreakHyphen": "-"}
+DOCUMENT_PART = "word/document.xml"
+
+
+def _open_zip(source):
+    """source: a file path, bytes/bytearray/memoryview, mmap, or a seekable binary file object."""
+    if isinstance(source, (str, os.PathLike)):
+        return zipfile.ZipFile(source)
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        return zipfile.ZipFile(io.BytesIO(source))
+    if hasattr(source, "seek"):
+        source.seek(0)
+    return zipfile.ZipFile(source)
+
+
+def _paragraph_text(paragraph, parts=None):
+    # Text boxes hold paragraphs of their own (often twice, in mc:Choice and mc:Fallback); skip them
+    parts = [] if parts is None else parts
+    for element in paragraph:
+        if element.tag == TEXT:
+            parts.append(element.text or "")
+        elif element.tag in SPECIAL_CHARS:
+            parts.append(SPECIAL_CHARS[element.tag])
+        elif element.tag != PARAGRAPH:
+            _paragraph_text(element, parts)
+    return "".join(parts)
+
+
+def iter_paragraphs(source, include_tables=False):
+    """
+    Lazily yield the text of each paragraph, in document order.
+    Like python-docx's Document.paragraphs, only body-level paragraphs are included unless
+    include_tables is set (then paragraphs inside tables, text boxes etc. are yielded too).
+    Parsed elements are discarded as soon as their text is out, so memory stays flat.
+    """
+    with _open_zip(source) as archive, archive.open(DOCUMENT_PART) as xml_stream:
+        stack = []
+        for event, element in ET.iterparse(xml_stream, events=("start", "end")):
+            if event == "start":
+                stack.append(element)
+                continue
+            stack.pop()
+            if element.tag == PARAGRAPH:
+                parent = stack[-1] if stack else None
+                nested = any(ancestor.tag == PARAGRAPH for ancestor in stack)
+                if not nested and (include_tables or (parent is not None and parent.tag == BODY)):
+                    yield _paragraph_text(element)
+                if not nested and parent is not None:
+                    parent.remove(element)  # drop it from the tree, not just empty it
+            elif stack and stack[-1].tag == BODY:
+                stack[-1].remove(element)  # tables, section properties etc. once fully read
+
+
+def read_text(source, skip_empty=True, include_tables=False):
+    """All paragraph text joined by newlines (blank paragraphs dropped unless skip_empty is False)."""
+    paragraphs = iter_paragraphs(source, include_tables)
+    if skip_empty:
+        return "\n".join(p for p in paragraphs if p.strip())
+    return "\n".join(paragraphs)
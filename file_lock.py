@@ -0,0 +1,31 @@
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+
+# === Inter-Process File Lock ===
+@contextmanager
+def locked(path):
+    """
+    Hold an exclusive lock on path (via a "<path>.lock" file) for the block. Job workers are separate
+    processes, so read-modify-write of a shared JSON file needs more than a threading.Lock; each call
+    opens its own handle, so threads of one process exclude each other too.
+    """
+    with open(path + ".lock", "a+b") as f:
+        if fcntl:
+            fcntl.flock(f, fcntl.LOCK_EX)
+        else:
+            f.seek(0)
+            msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+        try:
+            yield
+        finally:
+            if fcntl:
+                fcntl.flock(f, fcntl.LOCK_UN)
+            else:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
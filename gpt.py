@@ -1,16 +1,30 @@
 import os
 import fitz  # PyMuPDF
-import docx
-from openai import OpenAI
 from docx import Document
+import docx_reader
 import sys
 import re
 import tiktoken
 import time
 from dotenv import load_dotenv
+import model_router
+import output_budget
+import compression
+from compression import compress_source
+from metrics import traced
+from profiling import profiled
 
 load_dotenv()
+# Seconds to pause after each GPT call (plus a 2s buffer) to stay under the TPM limit; 0 disables
+RATE_LIMIT_DELAY = float(os.getenv("RATE_LIMIT_DELAY", "15"))
+CHUNK_TOKENS = 280000
+# Upper bound on corpus text held at once while chunking; chunks shrink below CHUNK_TOKENS if it is smaller
+CORPUS_MEMORY_MB = float(os.getenv("CORPUS_MEMORY_MB", "64"))
+BYTES_PER_TOKEN = 48      # a buffered token's text plus its entry in the encoded token list
+PIECE_CHARS = 262144      # cleaned text is tokenized in slices of at most this many characters
+
 # === Save formatted Word document ===
+@traced("render.docx")
 def save_to_word(content, filename="gpt_study_plan.docx"):
     doc = Document()
     doc.add_heading("Study Plan", level=0)
@@ -31,53 +45,156 @@ def save_to_word(content, filename="gpt_study_plan.docx"):
     doc.save(filename)
 
 
-# === OpenAI Client Setup ===
-openai_api_key = os.getenv("OPENAI_API_KEY")
-client = OpenAI(api_key=openai_api_key)  # Replace with your actual key
-
-
 # === File Extraction ===
 def extract_text_from_pdf(file_path):
     try:
-        doc = fitz.open(file_path)
-        text = ""
-        for page in doc:
-            text += page.get_text()
-        doc.close()
-        return text
+        return "".join(iter_pdf_pages(file_path))
     except Exception as e:
         return ""
 
 
+def iter_pdf_pages(file_path):
+    doc = fitz.open(file_path)
+    try:
+        for page in doc:
+            yield page.get_text()
+    finally:
+        doc.close()
+
+
 def extract_text_from_docx(file_path):
     try:
-        doc = docx.Document(file_path)
-        return "\n".join([para.text for para in doc.paragraphs])
+        return "\n".join(docx_reader.iter_paragraphs(file_path))
     except Exception as e:
         return ""
 
 
-def load_all_text(folder_path):
+@traced("extract.file")
+def extract_file_text(file_path):
+    if file_path.endswith(".pdf"):
+        return extract_text_from_pdf(file_path)
+    if file_path.endswith(".docx"):
+        return extract_text_from_docx(file_path)
+    return None
+
+
+@traced("extract.file")
+def extract_file_to_text(file_path, text_path):
+    """
+    Stream a file's text (the same text extract_file_text returns) into a plain-text file, piece by piece,
+    so it can be extracted ahead of time without being held in memory. Returns text_path, or None for
+    files without text.
+    """
+    if not file_path.endswith((".pdf", ".docx")):
+        return None
+    separator = "\n" if file_path.endswith(".docx") else ""
+    tmp_path = text_path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        for i, piece in enumerate(iter_file_pieces(file_path)):
+            f.write(separator + piece if i else piece)
+    os.replace(tmp_path, text_path)
+    return text_path
+
+
+def iter_text_file(text_path):
+    """A plain-text file in slices of PIECE_CHARS."""
+    with open(text_path, "r", encoding="utf-8") as f:
+        yield from iter(lambda: f.read(PIECE_CHARS), "")
+
+
+@traced("extract.corpus")
+def load_all_text(folder_path, extracted=None):
+    """
+    extracted: {file_path: path of its text file, or None} for files already extracted elsewhere
+    (see extract_file_to_text); only the rest is read here.
+    """
+    extracted = extracted or {}
     all_text = ""
     for filename in os.listdir(folder_path):
         file_path = os.path.join(folder_path, filename)
-        if filename.endswith(".pdf"):
-            all_text += extract_text_from_pdf(file_path) + "\n"
-        elif filename.endswith(".docx"):
-            all_text += extract_text_from_docx(file_path) + "\n"
+        if file_path in extracted:
+            text = "".join(iter_text_file(extracted[file_path])) if extracted[file_path] else None
+        else:
+            text = extract_file_text(file_path)
+        if text is not None:
+            all_text += text + "\n"
     return all_text.strip()
 
 
+def iter_file_pieces(file_path):
+    """Yield a file's text a page (PDF) or paragraph (DOCX) at a time; nothing for other files."""
+    try:
+        if file_path.endswith(".pdf"):
+            yield from iter_pdf_pages(file_path)
+        elif file_path.endswith(".docx"):
+            yield from docx_reader.iter_paragraphs(file_path)
+    except Exception as e:
+        print(f"⚠️ Skipping {file_path}: {e}")
+
+
+def iter_corpus_pieces(folder_path, extracted=None, compress=False):
+    """
+    The same text load_all_text returns, as a stream of pieces, without ever concatenating it.
+    With compress (and COMPRESSION_ENABLED), each source is compressed on its own before it is
+    yielded, so only that one source is held whole while it is scored.
+    """
+    extracted = extracted or {}
+    with os.scandir(folder_path) as entries:
+        for entry in entries:
+            if entry.path in extracted:
+                if extracted[entry.path] is None:
+                    continue
+                pieces = iter_text_file(extracted[entry.path])
+            else:
+                pieces = iter_file_pieces(entry.path)
+            if compress and compression.COMPRESSION_ENABLED:
+                label = f"gpt.source.{os.path.basename(entry.path)}"
+                pieces = [compress_source(clean_text("".join(pieces)), label)]
+            yield from pieces
+
+
 # === Clean and Sanitize Text ===
 def clean_text(text):
     text = ''.join(c for c in text if c.isprintable() and c not in '\x00')
     return " ".join(text.split())
 
 
+def iter_clean_text(pieces):
+    """
+    clean_text over a stream: yields pieces whose concatenation equals clean_text("".join(pieces)),
+    in slices of at most PIECE_CHARS. (Newlines are non-printable, so pieces join with nothing between.)
+    """
+    started, pending_space = False, False
+    for piece in pieces:
+        text = ''.join(c for c in piece if c.isprintable() and c not in '\x00')
+        if not text:
+            continue
+        words = text.split()
+        if not words:
+            pending_space = started
+            continue
+        cleaned = " ".join(words)
+        if started and (pending_space or text[0].isspace()):
+            cleaned = " " + cleaned
+        started, pending_space = True, text[-1].isspace()
+        for i in range(0, len(cleaned), PIECE_CHARS):
+            yield cleaned[i:i + PIECE_CHARS]
+
+
 # === Count Tokens Using tiktoken ===
+_encoding = None
+
+
+def get_encoding():
+    global _encoding
+    if _encoding is None:
+        _encoding = tiktoken.encoding_for_model('gpt-4')
+    return _encoding
+
+
+@traced("tokenize.count")
 def count_tokens(text):
-    enc = tiktoken.encoding_for_model('gpt-4')
-    return len(enc.encode(text))
+    return len(get_encoding().encode(text))
 
 
 # === Prompt Builder ===
@@ -130,6 +247,7 @@ Important Notes:
 
 
 # === GPT Request ===
+@traced("tokenize.split")
 def split_text_by_tokens(text, max_tokens=280000, model="gpt-4.1-mini"):
     enc = tiktoken.encoding_for_model('gpt-4')
     tokens = enc.encode(text)
@@ -140,52 +258,90 @@ def split_text_by_tokens(text, max_tokens=280000, model="gpt-4.1-mini"):
     return chunks
 
 
-def get_gpt_response(prompt, model="gpt-4.1-mini", max_tpm=400000):
+def chunk_token_limit(max_tokens=CHUNK_TOKENS, memory_mb=None):
+    """Tokens per chunk: max_tokens, unless the memory budget only fits fewer."""
+    memory_mb = CORPUS_MEMORY_MB if memory_mb is None else memory_mb
+    return max(1, min(max_tokens, int(memory_mb * 1024 * 1024 // BYTES_PER_TOKEN)))
+
+
+def iter_corpus_chunks(folder_path, max_tokens=CHUNK_TOKENS, extracted=None, memory_mb=None, stats=None,
+                       compress=False):
+    """
+    Stream the folder's cleaned text as chunks of at most max_tokens, reading, cleaning and tokenizing
+    it piece by piece so only about one chunk of text is resident at a time.
+    Tokens are counted per piece, so boundaries can differ by a token or two from split_text_by_tokens.
+    stats, when given, is filled with "chars", "tokens" and "chunks" as the stream is consumed.
+    compress compresses each source before it is packed (see iter_corpus_pieces).
+    """
+    enc = get_encoding()
+    limit = chunk_token_limit(max_tokens, memory_mb)
+    stats = {} if stats is None else stats
+    stats.update(chars=0, tokens=0, chunks=0)
+    buffer, buffered = [], 0
+    for piece in iter_clean_text(iter_corpus_pieces(folder_path, extracted, compress)):
+        tokens = enc.encode(piece, disallowed_special=())
+        stats["chars"] += len(piece)
+        stats["tokens"] += len(tokens)
+        split = False
+        while buffered + len(tokens) > limit:
+            room = limit - buffered
+            buffer.append(enc.decode(tokens[:room]))
+            tokens, split = tokens[room:], True
+            stats["chunks"] += 1
+            yield "".join(buffer)
+            buffer, buffered = [], 0
+        if tokens:
+            buffer.append(enc.decode(tokens) if split else piece)
+            buffered += len(tokens)
+    if buffer:
+        stats["chunks"] += 1
+        yield "".join(buffer)
+
+
+def get_gpt_response(prompt, model=None, max_tpm=400000, max_tokens=None):
     token_count = count_tokens(prompt)
-    delay = 15
+    delay = RATE_LIMIT_DELAY
     print(f"⏳ Sleeping for {delay:.2f} seconds to respect TPM rate limit")
 
     try:
-        response = client.chat.completions.create(
+        content = model_router.complete(
+            "gpt.chunk",
+            [{"role": "user", "content": prompt}],
+            max_tokens=max_tokens,
             model=model,
-            messages=[{"role": "user", "content": prompt}],
             temperature=0.7,
         )
-        time.sleep(delay + 2)  # Add buffer
-        return response.choices[0].message.content
+        if delay:
+            time.sleep(delay + 2)  # Add buffer
+        return content
     except Exception as e:
         print("❌ Error:", str(e).encode('utf-8', errors='ignore').decode())
 
         return ""
 
 
-def main(certificate_name="Certificate"):
-    folder_path = "data"
-    raw_text = load_all_text(folder_path)
-    if not raw_text:
-        return
-
-    context = clean_text(raw_text)
-    print(f"Processing {certificate_name} with context length: {len(context)} characters")
-    total_tokens = count_tokens(context)
-    print(f"🔢 Total tokens: {total_tokens}")
-
-    chunks = split_text_by_tokens(context, max_tokens=280000)
-    print(f"✂️ Total chunks: {len(chunks)} (each ≤ 950k tokens)")
-
+@traced("stage.gpt")
+@profiled("gpt.main")
+def main(certificate_name="Certificate", folder_path="data", output_file="gpt_study_plan.docx", extracted=None):
+    # Chunks are streamed off disk and sent as they fill, so the corpus is never held in memory whole
+    stats = {}
     final_output = ""
+    for i, chunk in enumerate(iter_corpus_chunks(folder_path, CHUNK_TOKENS, extracted, stats=stats, compress=True)):
+        print(f"\n🚀 Sending chunk {i+1} ({stats['chars']} characters read so far) to GPT...")
 
-    for i, chunk in enumerate(chunks):
-        print(f"\n🚀 Sending chunk {i+1}/{len(chunks)} to GPT...")
-
-        prompt = build_prompt(certificate_name, chunk)
-        result = get_gpt_response(prompt)
+        budget = output_budget.for_text(len(chunk.split()))
+        prompt = build_prompt(certificate_name, chunk) + budget.instruction()
+        result = get_gpt_response(prompt, max_tokens=budget.max_tokens)
         if not result:
             print("⚠️ Empty response from GPT.")
         final_output += result + "\n\n"
-    print(f"Total tokens processed: {total_tokens}")
+    if not stats.get("chunks"):
+        return
+    print(f"Processing {certificate_name} with context length: {stats['chars']} characters")
+    print(f"✂️ Total chunks: {stats['chunks']} (each ≤ {chunk_token_limit()} tokens)")
+    print(f"Total tokens processed: {stats['tokens']}")
     print(f"Final output length: {len(final_output)} characters")
-    save_to_word(final_output.strip())
+    save_to_word(final_output.strip(), output_file)
 
 
 if __name__ == "__main__":
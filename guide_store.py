@@ -0,0 +1,134 @@
+import os
+import re
+import json
+from datetime import datetime
+from contextlib import contextmanager
+from file_lock import locked
+from summary_cache import is_partial
+
+# === Configuration ===
+# One learning guide per workspace: the enhanced summary, split into its "## " sections, plus the
+# summaries of the sources merged into it (keyed by content). Sources added later are merged in
+# section by section.
+SECTION_HEADING = re.compile(r"^##\s+(.+?)\s*$", re.MULTILINE)
+
+
+# === Storage ===
+def empty_guide():
+    return {"sources": {}, "sections": [], "output_mode": None, "updated_at": None}
+
+
+def load_guide(paths):
+    """The workspace's guide as last saved (a snapshot; use update_guide to change it)."""
+    path = paths["guide"]
+    if not os.path.exists(path):
+        return empty_guide()
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return dict(empty_guide(), **json.load(f))
+    except (OSError, ValueError):
+        return empty_guide()
+
+
+def _save_guide(paths, guide):
+    guide["updated_at"] = datetime.now().isoformat(timespec="seconds")
+    path = paths["guide"]
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(guide, f, indent=2)
+    os.replace(tmp_path, path)  # atomic, so readers never see a half-written guide
+
+
+@contextmanager
+def update_guide(paths):
+    """
+    Read-modify-write of the guide under the workspace's guide lock: yields the current guide and saves it
+    when the block completes (nothing is saved if it raises). Concurrent updates wait their turn instead of
+    overwriting each other.
+    """
+    with locked(paths["guide"]):
+        guide = load_guide(paths)
+        yield guide
+        _save_guide(paths, guide)
+
+
+def clear_guide(paths):
+    with locked(paths["guide"]):
+        if os.path.exists(paths["guide"]):
+            os.remove(paths["guide"])
+
+
+# === Sources ===
+def source_id(kind, item):
+    """Stable id of a source: its content hash when known (re-uploads match), else its path or URL."""
+    if isinstance(item, str):
+        return f"{kind}:{item}"
+    return f"{kind}:{item.get('sha256') or item['path']}"
+
+
+def source_record(name, kind, summary, output_mode=None):
+    record = {"name": name, "kind": kind, "summary": summary, "output_mode": output_mode}
+    if is_partial(summary):
+        record["partial"] = True
+    return record
+
+
+def stored_summary(guide, sid, output_mode=None):
+    """The summary already recorded for a source at this output length, if any; a partial one is summarized again."""
+    source = guide["sources"].get(sid)
+    if not source or source.get("partial") or source.get("output_mode") != output_mode:
+        return None
+    return source["summary"]
+
+
+def new_sources(guide, sources):
+    """The sources whose content is not in the guide yet (a re-summary of merged content is not new)."""
+    return {sid: source for sid, source in sources.items() if sid not in guide["sources"]}
+
+
+def record_sources(guide, sources):
+    """Note sources as merged; a new summary of the same content replaces the old record."""
+    guide["sources"].update(sources)
+
+
+# === Summary Sources (what one merged summary docx was built from) ===
+def summary_sources_path(summary_path):
+    return os.path.splitext(summary_path)[0] + ".sources.json"
+
+
+def save_summary_sources(summary_path, sources):
+    path = summary_sources_path(summary_path)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(sources, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+def load_summary_sources(summary_path):
+    """{source id: record} of a merged summary; {} for summaries written before sources were kept."""
+    path = summary_sources_path(summary_path or "")
+    if not summary_path or not os.path.exists(path):
+        return {}
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+# === Sections ===
+def split_sections(text):
+    """[{"title", "body"}] for each "## " section; text before the first heading is a section titled ""."""
+    sections = []
+    matches = list(SECTION_HEADING.finditer(text))
+    preamble = text[:matches[0].start()] if matches else text
+    if preamble.strip():
+        sections.append({"title": "", "body": preamble.strip()})
+    for i, match in enumerate(matches):
+        end = matches[i + 1].start() if i + 1 < len(matches) else len(text)
+        sections.append({"title": match.group(1).strip(), "body": text[match.end():end].strip()})
+    return sections
+
+
+def join_sections(sections):
+    return "\n\n".join(f"## {s['title']}\n\n{s['body']}" if s["title"] else s["body"] for s in sections).strip()
@@ -0,0 +1,111 @@
+import os
+import json
+import hashlib
+import tempfile
+from file_lock import locked
+
+# === Configuration ===
+CHUNK_SIZE = 8 * 1024 * 1024  # bytes copied per read; peak memory per upload stays at this size
+INDEX_FILENAME = ".hashes.json"
+
+
+# === Hash Index (content hash -> stored filename, per directory) ===
+def _load_index(dest_dir):
+    index_path = os.path.join(dest_dir, INDEX_FILENAME)
+    if not os.path.exists(index_path):
+        return {}
+    try:
+        with open(index_path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _save_index(dest_dir, index):
+    index_path = os.path.join(dest_dir, INDEX_FILENAME)
+    tmp_path = index_path + ".tmp"  # callers hold the index lock, so one writer uses this at a time
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(index, f, indent=2)
+    os.replace(tmp_path, index_path)  # atomic, so readers never see a half-written index
+
+
+def find_by_hash(dest_dir, digest):
+    """Return the path of an already-stored file with this content hash, if any."""
+    filename = _load_index(dest_dir).get(digest)
+    if filename and os.path.exists(os.path.join(dest_dir, filename)):
+        return os.path.join(dest_dir, filename)
+    return None
+
+
+# === Streaming Copy ===
+def copy_and_hash(source, dest, chunk_size=CHUNK_SIZE):
+    """Copy a binary file object into dest chunk by chunk, hashing on the way. Returns (sha256, size)."""
+    h = hashlib.sha256()
+    size = 0
+    buf = bytearray(chunk_size)
+    view = memoryview(buf)
+    readinto = getattr(source, "readinto", None)
+    while True:
+        if readinto is not None:
+            n = readinto(view)
+        else:
+            data = source.read(chunk_size)
+            n = len(data)
+            view[:n] = data
+        if not n:
+            break
+        h.update(view[:n])
+        dest.write(view[:n])
+        size += n
+    return h.hexdigest(), size
+
+
+def hash_file(path, chunk_size=CHUNK_SIZE):
+    """sha256 of a file on disk, read chunk by chunk (the same digest save_upload records)."""
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(chunk_size), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def save_upload(uploaded_file, dest_dir, filename=None, chunk_size=CHUNK_SIZE):
+    """
+    Stream an uploaded file (Streamlit UploadedFile or any binary file object) into dest_dir.
+    If identical content is already stored there, the new copy is discarded and the
+    existing file is reused. Returns {"name", "path", "sha256", "size", "duplicate"}.
+    """
+    filename = filename or os.path.basename(getattr(uploaded_file, "name", "upload.bin"))
+    os.makedirs(dest_dir, exist_ok=True)
+    if hasattr(uploaded_file, "seek"):
+        uploaded_file.seek(0)
+
+    fd, tmp_path = tempfile.mkstemp(dir=dest_dir, prefix=".upload-")
+    try:
+        with os.fdopen(fd, "wb") as out:
+            digest, size = copy_and_hash(uploaded_file, out, chunk_size)
+
+        # Lookup, placement and index update happen under the directory's index lock, so concurrent
+        # uploads (other sessions, job workers) neither lose each other's index entries nor store
+        # the same content twice.
+        with locked(os.path.join(dest_dir, INDEX_FILENAME)):
+            existing = find_by_hash(dest_dir, digest)
+            if existing:
+                os.remove(tmp_path)
+                return {"name": filename, "path": existing, "sha256": digest, "size": size, "duplicate": True}
+
+            final_path = os.path.join(dest_dir, filename)
+            if os.path.exists(final_path):
+                # Same name, different content: keep both
+                root, ext = os.path.splitext(filename)
+                final_path = os.path.join(dest_dir, f"{root}_{digest[:8]}{ext}")
+            os.replace(tmp_path, final_path)
+
+            index = _load_index(dest_dir)
+            index[digest] = os.path.basename(final_path)
+            _save_index(dest_dir, index)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return {"name": filename, "path": final_path, "sha256": digest, "size": size, "duplicate": False}
@@ -0,0 +1,329 @@
+import os
+import sys
+import json
+import time
+import uuid
+import sqlite3
+import importlib
+import threading
+import traceback
+import multiprocessing
+from datetime import datetime
+from dotenv import load_dotenv
+import metrics
+import profiling
+import output_budget
+
+load_dotenv()
+# === Configuration ===
+JOBS_DB = os.getenv("JOBS_DB", "jobs.db")
+POLL_INTERVAL = 1.0      # seconds between queue checks in an idle worker
+STALE_AFTER = 15 * 60    # running jobs without a heartbeat for this long are requeued
+HEARTBEAT_INTERVAL = 30  # seconds between heartbeats sent while a job runs
+STALE_CHECK_INTERVAL = 30  # seconds between checks (by every worker) for jobs whose worker is gone
+MAX_JOB_ATTEMPTS = int(os.getenv("MAX_JOB_ATTEMPTS", "2"))  # a job that loses its worker this often fails
+
+# Job kind -> "module.function" that runs it inside a worker process.
+# Handlers are called as handler(params, progress) and return a JSON-serialisable result;
+# params always include the job's own "job_id" so outputs can be job-scoped.
+JOB_HANDLERS = {
+    "summary": "pipelines.run_summary_job",
+    "bulk_summary": "pipelines.run_bulk_summary_job",
+    "reformat": "pipelines.run_reformat_job",
+    "study_plan": "pipelines.run_study_plan_job",
+}
+
+ACTIVE_STATUSES = ("queued", "running")
+
+
+# === Database Helpers ===
+def _connect(db_path=None):
+    conn = sqlite3.connect(db_path or JOBS_DB, timeout=30, isolation_level=None)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA journal_mode=WAL")
+    return conn
+
+
+def _now():
+    return datetime.now().isoformat(timespec="seconds")
+
+
+def init_db(db_path=None):
+    """Create the jobs tables if they do not exist yet."""
+    conn = _connect(db_path)
+    conn.executescript("""
+        CREATE TABLE IF NOT EXISTS jobs (
+            id TEXT PRIMARY KEY,
+            kind TEXT NOT NULL,
+            params TEXT NOT NULL,
+            status TEXT NOT NULL,
+            progress REAL NOT NULL DEFAULT 0,
+            message TEXT NOT NULL DEFAULT '',
+            result TEXT,
+            error TEXT,
+            worker TEXT,
+            worker_pid INTEGER,
+            attempts INTEGER NOT NULL DEFAULT 0,
+            created_at TEXT NOT NULL,
+            started_at TEXT,
+            finished_at TEXT,
+            heartbeat REAL
+        );
+        CREATE TABLE IF NOT EXISTS job_events (
+            job_id TEXT NOT NULL,
+            ts TEXT NOT NULL,
+            message TEXT NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs (status, created_at);
+        CREATE INDEX IF NOT EXISTS idx_job_events_job ON job_events (job_id);
+    """)
+    # Databases created before these columns existed
+    columns = {row["name"] for row in conn.execute("PRAGMA table_info(jobs)")}
+    for name, declaration in (("worker_pid", "INTEGER"), ("attempts", "INTEGER NOT NULL DEFAULT 0")):
+        if name not in columns:
+            try:
+                conn.execute(f"ALTER TABLE jobs ADD COLUMN {name} {declaration}")
+            except sqlite3.OperationalError as e:
+                if "duplicate column" not in str(e):  # another process added it first
+                    raise
+    conn.close()
+
+
+def _row_to_job(row):
+    job = dict(row)
+    job["params"] = json.loads(job["params"])
+    job["result"] = json.loads(job["result"]) if job["result"] else None
+    return job
+
+
+# === Public API ===
+def submit_job(kind, params, db_path=None):
+    """Queue a job and return its id."""
+    if kind not in JOB_HANDLERS:
+        raise ValueError(f"Unknown job kind: {kind}")
+    init_db(db_path)
+    job_id = uuid.uuid4().hex[:12]
+    conn = _connect(db_path)
+    conn.execute(
+        "INSERT INTO jobs (id, kind, params, status, message, created_at) VALUES (?, ?, ?, 'queued', 'Queued', ?)",
+        (job_id, kind, json.dumps(params), _now()),
+    )
+    conn.close()
+    return job_id
+
+
+def get_job(job_id, db_path=None):
+    """Return the job as a dict (params/result decoded), or None if unknown."""
+    init_db(db_path)
+    conn = _connect(db_path)
+    row = conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+    conn.close()
+    return _row_to_job(row) if row else None
+
+
+def get_job_events(job_id, db_path=None):
+    """Return the progress messages logged by a job, oldest first."""
+    init_db(db_path)
+    conn = _connect(db_path)
+    rows = conn.execute(
+        "SELECT ts, message FROM job_events WHERE job_id = ? ORDER BY rowid", (job_id,)
+    ).fetchall()
+    conn.close()
+    return [dict(r) for r in rows]
+
+
+def list_jobs(status=None, limit=50, db_path=None):
+    init_db(db_path)
+    conn = _connect(db_path)
+    if status:
+        rows = conn.execute(
+            "SELECT * FROM jobs WHERE status = ? ORDER BY created_at DESC LIMIT ?", (status, limit)
+        ).fetchall()
+    else:
+        rows = conn.execute("SELECT * FROM jobs ORDER BY created_at DESC LIMIT ?", (limit,)).fetchall()
+    conn.close()
+    return [_row_to_job(r) for r in rows]
+
+
+def update_progress(job_id, progress=None, message=None, db_path=None):
+    """Record progress (0..1) and/or a log message for a running job."""
+    conn = _connect(db_path)
+    if progress is not None:
+        conn.execute(
+            "UPDATE jobs SET progress = ?, heartbeat = ? WHERE id = ?",
+            (max(0.0, min(1.0, progress)), time.time(), job_id),
+        )
+    if message:
+        conn.execute("UPDATE jobs SET message = ?, heartbeat = ? WHERE id = ?", (message, time.time(), job_id))
+        conn.execute("INSERT INTO job_events (job_id, ts, message) VALUES (?, ?, ?)", (job_id, _now(), message))
+    conn.close()
+
+
+def _worker_alive(pid):
+    """
+    False when no process has this pid. Workers share a host with the database (SQLite's WAL mode
+    requires it), so the pid recorded at claim time can be checked directly.
+    """
+    if not pid or os.name == "nt":  # os.kill(pid, 0) would terminate the process on Windows
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True  # exists, owned by someone else
+    return True
+
+
+def requeue_stale_jobs(db_path=None, stale_after=STALE_AFTER):
+    """
+    Put back running jobs whose worker is gone: its process has exited, or it stopped sending heartbeats
+    (e.g. the server was restarted). A job that has already lost its worker MAX_JOB_ATTEMPTS times is
+    failed instead, so a job that kills its worker is not retried forever. Returns the number of jobs changed.
+    """
+    init_db(db_path)
+    conn = _connect(db_path)
+    cutoff = time.time() - stale_after
+    changed = 0
+    for row in conn.execute("SELECT id, worker_pid, heartbeat, attempts FROM jobs WHERE status = 'running'").fetchall():
+        if row["heartbeat"] is not None and row["heartbeat"] >= cutoff and _worker_alive(row["worker_pid"]):
+            continue
+        # Only if the job is still in the state we judged, so a job that just finished is left alone
+        guard = "WHERE id = ? AND status = 'running' AND worker_pid IS ? AND heartbeat IS ?"
+        guard_args = (row["id"], row["worker_pid"], row["heartbeat"])
+        if row["attempts"] >= MAX_JOB_ATTEMPTS:
+            error = f"Worker lost {row['attempts']} times while running this job"
+            cur = conn.execute(
+                "UPDATE jobs SET status = 'failed', message = 'Failed: worker lost', error = ?, finished_at = ? " + guard,
+                (error, _now()) + guard_args,
+            )
+        else:
+            cur = conn.execute(
+                "UPDATE jobs SET status = 'queued', worker = NULL, worker_pid = NULL, "
+                "message = 'Requeued after worker loss' " + guard,
+                guard_args,
+            )
+        changed += cur.rowcount
+    conn.close()
+    return changed
+
+
+# === Worker ===
+def _claim_next_job(conn, worker_name):
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        row = conn.execute(
+            "SELECT * FROM jobs WHERE status = 'queued' ORDER BY created_at LIMIT 1"
+        ).fetchone()
+        if row is None:
+            conn.execute("COMMIT")
+            return None
+        conn.execute(
+            "UPDATE jobs SET status = 'running', worker = ?, worker_pid = ?, attempts = attempts + 1, "
+            "started_at = ?, heartbeat = ?, message = 'Started' WHERE id = ?",
+            (worker_name, os.getpid(), _now(), time.time(), row["id"]),
+        )
+        conn.execute("COMMIT")
+        return _row_to_job(row)
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+
+
+def _resolve_handler(kind):
+    module_name, func_name = JOB_HANDLERS[kind].rsplit(".", 1)
+    return getattr(importlib.import_module(module_name), func_name)
+
+
+def run_job(job, db_path=None):
+    """Execute one claimed job and store its result or error."""
+    job_id = job["id"]
+
+    def progress(fraction=None, message=None):
+        update_progress(job_id, fraction, message, db_path=db_path)
+
+    # Long Whisper/LLM calls report no progress for minutes, so beat separately
+    stop_heartbeat = threading.Event()
+
+    def heartbeat():
+        while not stop_heartbeat.wait(HEARTBEAT_INTERVAL):
+            conn = _connect(db_path)
+            conn.execute("UPDATE jobs SET heartbeat = ? WHERE id = ?", (time.time(), job_id))
+            conn.close()
+
+    threading.Thread(target=heartbeat, daemon=True).start()
+    try:
+        handler = _resolve_handler(job["kind"])
+        profile = profiling.should_profile(job["params"])
+        with metrics.job_context(job_id), profiling.job_profiling(profile), output_budget.job_mode(job["params"].get("output_mode")), \
+                metrics.span(f"job.{job['kind']}", profiled=profile):
+            result = handler(dict(job["params"], job_id=job_id), progress)
+        conn = _connect(db_path)
+        conn.execute(
+            "UPDATE jobs SET status = 'done', progress = 1, result = ?, message = 'Done', finished_at = ? WHERE id = ?",
+            (json.dumps(result), _now(), job_id),
+        )
+        conn.close()
+    except Exception as e:
+        print(f"❌ Job {job_id} failed: {e}")
+        conn = _connect(db_path)
+        conn.execute(
+            "UPDATE jobs SET status = 'failed', error = ?, message = ?, finished_at = ? WHERE id = ?",
+            (traceback.format_exc(), f"Failed: {e}", _now(), job_id),
+        )
+        conn.close()
+    finally:
+        stop_heartbeat.set()
+
+
+def worker_loop(db_path=None, worker_name=None, max_jobs=None, initializer=None, initargs=()):
+    """
+    Poll the queue and run jobs until killed (or max_jobs have been processed).
+    initializer(*initargs) runs once in the worker before the first job (e.g. to install test stubs).
+    """
+    worker_name = worker_name or f"worker-{os.getpid()}"
+    if initializer is not None:
+        initializer(*initargs)
+    init_db(db_path)
+    conn = _connect(db_path)
+    processed = 0
+    last_stale_check = 0.0
+    print(f"👷 {worker_name} waiting for jobs...")
+    while max_jobs is None or processed < max_jobs:
+        # Every worker keeps an eye out for jobs left running by a worker that crashed or was killed
+        if time.time() - last_stale_check >= STALE_CHECK_INTERVAL:
+            last_stale_check = time.time()
+            requeued = requeue_stale_jobs(db_path)
+            if requeued:
+                print(f"♻️ {worker_name} recovered {requeued} job(s) whose worker was lost")
+        job = _claim_next_job(conn, worker_name)
+        if job is None:
+            time.sleep(POLL_INTERVAL)
+            continue
+        print(f"🚀 {worker_name} running {job['kind']} job {job['id']}")
+        run_job(job, db_path=db_path)
+        processed += 1
+    conn.close()
+
+
+def start_workers(num_workers=2, db_path=None, initializer=None, initargs=()):
+    """Spawn worker processes that consume the queue. Returns the Process objects."""
+    init_db(db_path)
+    requeue_stale_jobs(db_path)
+    ctx = multiprocessing.get_context("spawn")
+    workers = []
+    for i in range(num_workers):
+        p = ctx.Process(target=worker_loop, args=(db_path, f"worker-{i + 1}", None, initializer, initargs),
+                        daemon=True)
+        p.start()
+        workers.append(p)
+    return workers
+
+
+# === CLI Entry ===
+if __name__ == "__main__":
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else int(os.getenv("JOB_WORKERS", "2"))
+    procs = start_workers(count)
+    print(f"✅ Started {count} job workers on {JOBS_DB}")
+    for p in procs:
+        p.join()
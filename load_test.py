@@ -0,0 +1,297 @@
+import os
+import math
+import glob
+import json
+import time
+import random
+import shutil
+import argparse
+import platform
+import tempfile
+import threading
+from datetime import datetime
+
+# Same offline setup as the benchmark; spawned workers inherit these
+os.environ.setdefault("RATE_LIMIT_DELAY", "0")
+os.environ.setdefault("LLM_PROVIDER", "local")
+
+import job_queue
+from ingest import copy_and_hash
+from workspace import create_workspace, get_workspace_paths, remove_workspace
+from benchmark import git_revision
+
+# === Configuration ===
+DEFAULT_DOCUMENTS = "uploads/*.pdf"
+DEFAULT_SUPPORT_FILES = "data/*.pdf"
+DEFAULT_LEVELS = "1,2,4,8"
+DEFAULT_OUTPUT = "load_results.json"
+JOB_POLL_INTERVAL = 0.05     # how often a simulated session checks its job
+RESOURCE_SAMPLE_INTERVAL = 0.25
+CLOCK_TICKS = os.sysconf("SC_CLK_TCK") if hasattr(os, "sysconf") else 100
+
+
+# === Worker Setup ===
+def init_worker(latency, tokens_per_second, error_rate, output_tokens):
+    """Runs inside every spawned job worker: stub LLM/search/YouTube/Reddit before the first job."""
+    from benchmark import install_stubs
+    install_stubs(latency, tokens_per_second, error_rate, output_tokens)
+
+
+# === Resource Sampling ===
+def _process_stats(pid):
+    """(rss_mb, cpu_seconds) of a process from /proc, or None once it is gone."""
+    try:
+        with open(f"/proc/{pid}/statm", "r") as f:
+            rss_pages = int(f.read().split()[1])
+        with open(f"/proc/{pid}/stat", "r") as f:
+            fields = f.read().rsplit(")", 1)[1].split()
+        cpu_ticks = int(fields[11]) + int(fields[12])  # utime + stime
+    except (OSError, ValueError, IndexError):
+        return None
+    return rss_pages * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024), cpu_ticks / CLOCK_TICKS
+
+
+class ResourceSampler:
+    """Tracks combined RSS and CPU of the job workers plus queue depth while a level runs."""
+
+    def __init__(self, pids, db_path):
+        self.pids = pids
+        self.db_path = db_path
+        self.peak_rss_mb = 0.0
+        self.max_queue_depth = 0
+        self._cpu_start = self._cpu_total()
+        self._wall_start = time.perf_counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _cpu_total(self):
+        stats = [_process_stats(pid) for pid in self.pids]
+        return sum(s[1] for s in stats if s)
+
+    def _run(self):
+        while not self._stop.wait(RESOURCE_SAMPLE_INTERVAL):
+            stats = [_process_stats(pid) for pid in self.pids]
+            self.peak_rss_mb = max(self.peak_rss_mb, sum(s[0] for s in stats if s))
+            queued = job_queue.list_jobs(status="queued", limit=10000, db_path=self.db_path)
+            self.max_queue_depth = max(self.max_queue_depth, len(queued))
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+    def summary(self):
+        wall = time.perf_counter() - self._wall_start
+        cpu = self._cpu_total() - self._cpu_start
+        return {
+            "worker_peak_rss_mb": round(self.peak_rss_mb, 1),
+            "worker_cpu_s": round(cpu, 2),
+            "worker_cpu_utilization": round(cpu / wall / max(1, len(self.pids)), 3) if wall else 0.0,
+            "max_queue_depth": self.max_queue_depth,
+            "load_avg_1m": round(os.getloadavg()[0], 2) if hasattr(os, "getloadavg") else None,
+        }
+
+
+# === Simulated Sessions ===
+class Session:
+    """One simulated browser session: uploads into its own workspace and waits on its jobs like app.py."""
+
+    def __init__(self, index, args, db_path, results, lock):
+        self.index = index
+        self.args = args
+        self.db_path = db_path
+        self.results = results
+        self.lock = lock
+        self.rng = random.Random(args.seed + index)
+
+    def wait_for(self, job_id):
+        while True:
+            job = job_queue.get_job(job_id, db_path=self.db_path)
+            if job["status"] not in job_queue.ACTIVE_STATUSES:
+                return job
+            time.sleep(JOB_POLL_INTERVAL)
+
+    def run_job(self, kind, params):
+        submitted = time.perf_counter()
+        job_id = job_queue.submit_job(kind, params, db_path=self.db_path)
+        job = self.wait_for(job_id)
+        record = {"kind": kind, "status": job["status"], "latency_s": time.perf_counter() - submitted}
+        with self.lock:
+            self.results.append(record)
+        return job
+
+    def upload(self, source_path, dest_dir):
+        name = os.path.basename(source_path)
+        dest_path = os.path.join(dest_dir, name)
+        with open(source_path, "rb") as src, open(dest_path, "wb") as dst:
+            sha256, size = copy_and_hash(src, dst)
+        return {"name": name, "path": dest_path, "sha256": sha256, "size": size, "duplicate": False}
+
+    def summary_flow(self, paths):
+        documents = [self.upload(path, paths["uploads"])
+                     for path in self.rng.sample(self.args.documents, min(self.args.docs_per_job, len(self.args.documents)))]
+        if not self.args.warm_cache:
+            for document in documents:
+                document.pop("sha256")  # bypass the summary cache so every job does the full work
+        youtube_urls = [f"https://www.youtube.com/watch?v=load{self.index:03d}{i:03d}"
+                        for i in range(self.args.youtube_per_job)]
+        job = self.run_job("summary", {"workspace": paths["root"], "videos": [],
+                                       "youtube_urls": youtube_urls, "documents": documents})
+        if job["status"] == "done" and job["result"]["summary_path"]:
+            self.run_job("reformat", {"workspace": paths["root"], "summary_path": job["result"]["summary_path"],
+                                      "model": "gpt-4.1-mini"})
+
+    def study_plan_flow(self, paths):
+        files = [self.upload(path, paths["data"])["name"] for path in self.args.support_files]
+        final_data = {
+            "youtube": [f"https://www.youtube.com/watch?v=plan{self.index:03d}{i:03d}" for i in range(3)],
+            "reddit": [f"https://www.reddit.com/r/pmp/comments/load{self.index}{i}/post/" for i in range(3)],
+            "other": [f"https://example.com/guide/{self.index}/{i}" for i in range(3)],
+            "files": files,
+            "answers": {"web": "Recorded web answer"},
+        }
+        self.run_job("study_plan", {"workspace": paths["root"], "certificate_name": "PMP",
+                                    "final_data": final_data, "force_stages": []})
+
+    def loop(self, deadline):
+        while time.perf_counter() < deadline:
+            workspace_dir = create_workspace(f"load-{os.getpid()}-{self.index}-{self.rng.getrandbits(32):08x}")
+            paths = get_workspace_paths(workspace_dir)
+            started = time.perf_counter()
+            flow = "summary" if self.rng.random() < self.args.summary_share else "study_plan"
+            try:
+                getattr(self, f"{flow}_flow")(paths)
+            finally:
+                remove_workspace(workspace_dir)
+            with self.lock:
+                self.results.append({"kind": f"flow.{flow}", "status": "done",
+                                     "latency_s": time.perf_counter() - started})
+            time.sleep(self.args.think_time)
+
+
+# === Reporting ===
+def percentile(values, q):
+    """Nearest-rank percentile of a non-empty list."""
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, math.ceil(q / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def summarize_level(sessions, records, elapsed, resources):
+    by_kind = {}
+    for record in records:
+        by_kind.setdefault(record["kind"], []).append(record)
+    kinds = {}
+    for kind, items in sorted(by_kind.items()):
+        latencies = [r["latency_s"] for r in items if r["status"] == "done"]
+        kinds[kind] = {
+            "completed": len(latencies),
+            "failed": len(items) - len(latencies),
+            "throughput_per_min": round(len(latencies) / elapsed * 60, 2) if elapsed else 0.0,
+            "p50_s": round(percentile(latencies, 50), 3) if latencies else None,
+            "p95_s": round(percentile(latencies, 95), 3) if latencies else None,
+            "p99_s": round(percentile(latencies, 99), 3) if latencies else None,
+        }
+    jobs = [r for r in records if not r["kind"].startswith("flow.")]
+    return {
+        "sessions": sessions,
+        "elapsed_s": round(elapsed, 2),
+        "jobs_completed": sum(1 for r in jobs if r["status"] == "done"),
+        "jobs_failed": sum(1 for r in jobs if r["status"] != "done"),
+        "jobs_per_min": round(sum(1 for r in jobs if r["status"] == "done") / elapsed * 60, 2) if elapsed else 0.0,
+        "kinds": kinds,
+        **resources,
+    }
+
+
+def run_level(sessions, args, db_path, worker_pids):
+    records = []
+    lock = threading.Lock()
+    started = time.perf_counter()
+    deadline = started + args.duration
+    with ResourceSampler(worker_pids, db_path) as sampler:
+        threads = [threading.Thread(target=Session(i, args, db_path, records, lock).loop, args=(deadline,))
+                   for i in range(sessions)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()  # sessions finish the flow they are in, so the level drains its own jobs
+    elapsed = time.perf_counter() - started
+    return summarize_level(sessions, records, elapsed, sampler.summary())
+
+
+def print_level(level):
+    print(f"👥 {level['sessions']:>3} sessions  {level['jobs_per_min']:>7.1f} jobs/min  "
+          f"{level['jobs_failed']} failed  peak RSS {level['worker_peak_rss_mb']:.0f} MB  "
+          f"CPU {level['worker_cpu_utilization'] * 100:.0f}%  max queue {level['max_queue_depth']}")
+    for kind, stats in level["kinds"].items():
+        if stats["completed"]:
+            print(f"     {kind:<17} n={stats['completed']:<4} p50 {stats['p50_s']:>7.2f}s  "
+                  f"p95 {stats['p95_s']:>7.2f}s  p99 {stats['p99_s']:>7.2f}s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Ramp concurrent sessions through the job queue with stubbed services.")
+    parser.add_argument("--levels", default=DEFAULT_LEVELS, help="comma-separated concurrent session counts")
+    parser.add_argument("--duration", type=float, default=30.0, help="seconds each level keeps submitting work")
+    parser.add_argument("--workers", type=int, default=int(os.getenv("JOB_WORKERS", "2")),
+                        help="job worker processes (what one app.py instance starts)")
+    parser.add_argument("--summary-share", type=float, default=0.5, help="fraction of flows that are summaries")
+    parser.add_argument("--documents", default=DEFAULT_DOCUMENTS, help="glob of fixture PDFs/DOCX to upload")
+    parser.add_argument("--docs-per-job", type=int, default=1)
+    parser.add_argument("--youtube-per-job", type=int, default=1)
+    parser.add_argument("--support-files", default=DEFAULT_SUPPORT_FILES, help="glob of study-plan uploads")
+    parser.add_argument("--warm-cache", action="store_true", help="let repeated documents hit the summary cache")
+    parser.add_argument("--think-time", type=float, default=0.0, help="pause between a session's flows")
+    parser.add_argument("--latency", type=float, default=0.5, help="simulated service latency per call")
+    parser.add_argument("--tps", type=float, default=0.0, help="simulated output tokens per second (0 = instant)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of LLM/search calls that fail")
+    parser.add_argument("--output-tokens", type=int, default=800)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default=DEFAULT_OUTPUT)
+    args = parser.parse_args()
+
+    args.documents = sorted(glob.glob(args.documents))
+    args.support_files = sorted(glob.glob(args.support_files))
+    if not args.documents and args.summary_share > 0:
+        parser.error("no fixture documents matched --documents")
+    levels = [int(n) for n in args.levels.split(",") if n.strip()]
+
+    state_dir = tempfile.mkdtemp(prefix="load_test_")
+    db_path = os.path.join(state_dir, "jobs.db")
+    workers = job_queue.start_workers(args.workers, db_path=db_path, initializer=init_worker,
+                                      initargs=(args.latency, args.tps, args.error_rate, args.output_tokens))
+    worker_pids = [p.pid for p in workers]
+    print(f"👷 {args.workers} workers on {db_path}; levels {levels}, {args.duration:.0f}s each")
+
+    results = []
+    try:
+        for sessions in levels:
+            level = run_level(sessions, args, db_path, worker_pids)
+            results.append(level)
+            print_level(level)
+    finally:
+        for p in workers:
+            p.terminate()
+            p.join()
+        shutil.rmtree(state_dir, ignore_errors=True)
+
+    report = {
+        "commit": git_revision(),
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "settings": vars(args),
+        "levels": results,
+    }
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"✅ Load test results saved to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
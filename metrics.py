@@ -0,0 +1,252 @@
+import os
+import re
+import json
+import time
+import uuid
+import functools
+import threading
+import contextvars
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# === Configuration ===
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").lower() == "true"
+METRICS_LOG = os.getenv("METRICS_LOG", os.path.join("logs", "metrics.jsonl"))
+
+# USD per 1M tokens (input, output), used for cost estimates only
+MODEL_PRICES = {
+    "gpt-4.1-mini": (0.40, 1.60),
+    "gpt-4.1-nano": (0.10, 0.40),
+    "gpt-4.1": (2.00, 8.00),
+    "gpt-5-nano": (0.05, 0.40),
+    "gpt-5-mini": (0.25, 2.00),
+    "gpt-5": (1.25, 10.00),
+    "claude-opus-4-20250514": (15.00, 75.00),
+    "claude-sonnet-4-20250514": (3.00, 15.00),
+    "claude-3-5-haiku-20241022": (0.80, 4.00),
+}
+BATCH_PRICE_FACTOR = 0.5  # Batch API requests are billed at half the synchronous price
+
+# Counters that spans may carry; each becomes a Prometheus counter
+COUNTERS = ("tokens_in", "tokens_out", "cache_hits", "cache_misses", "retries", "cost_usd")
+
+_current_span = contextvars.ContextVar("current_span", default=None)
+_current_job = contextvars.ContextVar("current_job", default=None)
+_write_lock = threading.Lock()
+
+
+def estimate_cost(model, tokens_in, tokens_out, price_factor=1.0):
+    # APIs may report dated snapshots (gpt-4.1-mini-2025-04-14) of the models priced above
+    prices = MODEL_PRICES.get(model) or MODEL_PRICES.get(re.sub(r"-\d{4}-\d{2}-\d{2}$", "", model or ""))
+    price_in, price_out = prices or (0.0, 0.0)
+    return (tokens_in * price_in + tokens_out * price_out) * price_factor / 1_000_000
+
+
+# === Spans ===
+class Span:
+    def __init__(self, name, attrs):
+        self.name = name
+        self.span_id = uuid.uuid4().hex[:16]
+        parent = _current_span.get()
+        self.parent_id = parent.span_id if parent else None
+        self.job_id = _current_job.get()
+        self.attrs = dict(attrs)
+        self.counters = {}
+        self.start = time.time()
+        self.error = None
+
+    def set(self, **attrs):
+        self.attrs.update(attrs)
+
+    def add(self, counter, amount=1):
+        self.counters[counter] = self.counters.get(counter, 0) + amount
+
+    def record_llm(self, model, tokens_in, tokens_out, price_factor=1.0):
+        self.set(model=model)
+        self.add("tokens_in", tokens_in)
+        self.add("tokens_out", tokens_out)
+        self.add("cost_usd", estimate_cost(model, tokens_in, tokens_out, price_factor))
+
+
+def finish_span(s, duration, cpu_time=0.0):
+    """Record a span that was timed by hand (e.g. one spanning a generator's lifetime)."""
+    _emit({
+        "ts": s.start,
+        "name": s.name,
+        "span_id": s.span_id,
+        "parent_id": s.parent_id,
+        "job_id": s.job_id,
+        "pid": os.getpid(),
+        "duration_s": round(duration, 6),
+        "cpu_s": round(cpu_time, 6),
+        "attrs": s.attrs,
+        "counters": {k: round(v, 6) if isinstance(v, float) else v for k, v in s.counters.items()},
+        "error": s.error,
+    })
+
+
+@contextmanager
+def span(name, **attrs):
+    """Time a block and record it (with its attributes and counters) as one JSON line."""
+    s = Span(name, attrs)
+    token = _current_span.set(s)
+    wall, cpu = time.perf_counter(), time.thread_time()
+    try:
+        yield s
+    except Exception as e:
+        s.error = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        _current_span.reset(token)
+        finish_span(s, time.perf_counter() - wall, time.thread_time() - cpu)
+
+
+def traced(name=None, **attrs):
+    """Decorator form of span()."""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(name or func.__qualname__, **attrs):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def current_span():
+    return _current_span.get()
+
+
+def add(counter, amount=1):
+    """Bump a counter on the innermost open span (no-op outside a span)."""
+    s = _current_span.get()
+    if s is not None:
+        s.add(counter, amount)
+
+
+@contextmanager
+def job_context(job_id):
+    """Tag every span opened inside the block with job_id."""
+    token = _current_job.set(job_id)
+    try:
+        yield
+    finally:
+        _current_job.reset(token)
+
+
+def current_job_id():
+    return _current_job.get()
+
+
+# === JSON Lines Export ===
+def _emit(record):
+    _aggregate(record)
+    if not METRICS_ENABLED:
+        return
+    line = json.dumps(record, default=str)
+    with _write_lock:
+        directory = os.path.dirname(METRICS_LOG)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(METRICS_LOG, "a", encoding="utf-8") as f:
+            f.write(line + "\n")
+
+
+def read_spans(path=METRICS_LOG, job_id=None):
+    """Load recorded spans, optionally only those of one job."""
+    if not os.path.exists(path):
+        return []
+    spans = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            if job_id is None or record.get("job_id") == job_id:
+                spans.append(record)
+    return spans
+
+
+# === Aggregation & Prometheus Export ===
+_totals = {}          # span name -> {"count", "errors", "duration_s", counters...}
+_totals_lock = threading.Lock()
+_log_offset = 0       # how far into METRICS_LOG the exporter has read
+
+
+def _aggregate(record):
+    with _totals_lock:
+        total = _totals.setdefault(record["name"], {"count": 0, "errors": 0, "duration_s": 0.0})
+        total["count"] += 1
+        total["errors"] += 1 if record.get("error") else 0
+        total["duration_s"] += record["duration_s"]
+        for counter, value in record.get("counters", {}).items():
+            total[counter] = total.get(counter, 0) + value
+
+
+def _ingest_log(path=METRICS_LOG):
+    """Fold in spans written by other processes (job workers) since the last scrape."""
+    global _log_offset
+    if not os.path.exists(path):
+        return
+    own_pid = os.getpid()
+    with open(path, "rb") as f:
+        f.seek(_log_offset)
+        for line in f:
+            if not line.endswith(b"\n"):
+                break  # partially written line; pick it up next time
+            _log_offset += len(line)
+            record = json.loads(line)
+            if record.get("pid") != own_pid:  # our own spans were aggregated when emitted
+                _aggregate(record)
+
+
+def _label(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"')
+
+
+def render_prometheus():
+    """Current totals in the Prometheus text exposition format."""
+    _ingest_log()
+    with _totals_lock:
+        totals = {name: dict(values) for name, values in _totals.items()}
+    lines = [
+        "# HELP pipeline_span_duration_seconds Time spent in each pipeline span.",
+        "# TYPE pipeline_span_duration_seconds summary",
+    ]
+    for name, t in sorted(totals.items()):
+        lines.append(f'pipeline_span_duration_seconds_count{{span="{_label(name)}"}} {t["count"]}')
+        lines.append(f'pipeline_span_duration_seconds_sum{{span="{_label(name)}"}} {t["duration_s"]:.6f}')
+    lines += ["# HELP pipeline_span_errors_total Spans that raised.", "# TYPE pipeline_span_errors_total counter"]
+    for name, t in sorted(totals.items()):
+        lines.append(f'pipeline_span_errors_total{{span="{_label(name)}"}} {t["errors"]}')
+    for counter in COUNTERS:
+        metric = f"pipeline_{counter}_total"
+        lines += [f"# HELP {metric} Sum of {counter} recorded on spans.", f"# TYPE {metric} counter"]
+        for name, t in sorted(totals.items()):
+            if counter in t:
+                lines.append(f'{metric}{{span="{_label(name)}"}} {t[counter]}')
+    return "\n".join(lines) + "\n"
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.rstrip("/") != "/metrics":
+            self.send_response(404)
+            self.end_headers()
+            return
+        body = render_prometheus().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass  # keep scrapes out of the console
+
+
+def start_metrics_server(port, host="0.0.0.0"):
+    """Serve /metrics on a background thread. Returns the server."""
+    server = ThreadingHTTPServer((host, port), _MetricsHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    print(f"📈 Metrics endpoint on http://{host}:{port}/metrics")
+    return server
@@ -0,0 +1,225 @@
+import os
+import sys
+import time
+import threading
+from dotenv import load_dotenv
+from providers import get_chat_provider, count_tokens
+import metrics
+
+load_dotenv()
+# === Configuration ===
+# Map stages (per chunk / window / source) run on cheap, fast models; reduce stages (merging,
+# reformatting, the final plan) get the strongest model the budget allows, and only ever see
+# the already-compressed map output.
+# The default ladders are the single models each stage used before routing, so output quality and
+# cost only change when a deployment opts in, e.g. ROUTER_MAP_MODELS=gpt-4.1-nano,gpt-4.1-mini and
+# ROUTER_REDUCE_MODELS=gpt-4.1-mini,gpt-4.1. ROUTER_ENABLED=false always uses these defaults.
+ROLE_DEFAULTS = {"map": "gpt-4.1-mini", "reduce": "gpt-4.1-mini", "plan": "claude-opus-4-20250514"}
+ROUTER_ENABLED = os.getenv("ROUTER_ENABLED", "true").lower() == "true"
+MAP_MODELS = os.getenv("ROUTER_MAP_MODELS", ROLE_DEFAULTS["map"])
+REDUCE_MODELS = os.getenv("ROUTER_REDUCE_MODELS", ROLE_DEFAULTS["reduce"])
+PLAN_MODELS = os.getenv("ROUTER_PLAN_MODELS", ROLE_DEFAULTS["plan"])
+ROUTER_MAX_CALL_COST = float(os.getenv("ROUTER_MAX_CALL_COST", "0"))  # USD per call; 0 = no limit
+ROUTER_MAX_LATENCY = float(os.getenv("ROUTER_MAX_LATENCY", "0"))      # seconds per call; 0 = no limit
+# Map inputs above this size go to the next model up: small models lose detail on very long contexts
+MAP_ESCALATE_TOKENS = int(os.getenv("ROUTER_MAP_ESCALATE_TOKENS", "120000"))
+DEFAULT_OUTPUT_TOKENS = 4000
+
+# Provider, context window and rough output speed (tokens/s) of each routable model
+MODEL_PROFILES = {
+    "gpt-4.1-nano": {"provider": "openai", "context": 1_047_576, "tps": 180, "first_token_s": 0.5},
+    "gpt-4.1-mini": {"provider": "openai", "context": 1_047_576, "tps": 90, "first_token_s": 0.7},
+    "gpt-4.1": {"provider": "openai", "context": 1_047_576, "tps": 60, "first_token_s": 1.0},
+    "gpt-5-mini": {"provider": "openai", "context": 400_000, "tps": 70, "first_token_s": 4.0},
+    "gpt-5": {"provider": "openai", "context": 400_000, "tps": 50, "first_token_s": 8.0},
+    "claude-3-5-haiku-20241022": {"provider": "anthropic", "context": 200_000, "tps": 60, "first_token_s": 0.7},
+    "claude-sonnet-4-20250514": {"provider": "anthropic", "context": 200_000, "tps": 55, "first_token_s": 1.5},
+    "claude-opus-4-20250514": {"provider": "anthropic", "context": 200_000, "tps": 30, "first_token_s": 2.5},
+}
+
+# Stage -> role; the role picks the model ladder and how to climb it
+STAGE_ROLES = {
+    "document.chunk": "map",
+    "video.transcript": "map",
+    "video.window": "map",
+    "youtube.transcript": "map",
+    "youtube.chunk": "map",
+    "gpt.chunk": "map",
+    "merge.route": "map",
+    "video.merge": "reduce",
+    "reformat": "reduce",
+    "merge.section": "reduce",
+    "claude.plan": "plan",
+}
+LADDERS = {
+    "map": MAP_MODELS,
+    "reduce": REDUCE_MODELS,
+    "plan": PLAN_MODELS,
+}
+
+
+class Route:
+    def __init__(self, stage, model, input_tokens, output_tokens, reason):
+        profile = MODEL_PROFILES.get(model, {"provider": "openai", "tps": 60, "first_token_s": 1.0})
+        self.stage = stage
+        self.model = model
+        self.provider = profile["provider"]
+        self.input_tokens = input_tokens
+        self.est_cost = metrics.estimate_cost(model, input_tokens, output_tokens)
+        self.est_latency = profile["first_token_s"] + output_tokens / profile["tps"]
+        self.reason = reason
+
+    def __repr__(self):
+        return f"Route({self.stage} -> {self.model}: {self.reason})"
+
+
+def _ladder(role):
+    return [m.strip() for m in LADDERS[role].split(",") if m.strip()]
+
+
+def _within_budget(route, max_cost, max_latency):
+    return (not max_cost or route.est_cost <= max_cost) and (not max_latency or route.est_latency <= max_latency)
+
+
+def choose_model(stage, input_tokens, output_tokens=None, max_cost=None, max_latency=None):
+    """
+    Pick the model for one call of a stage.
+    map: the cheapest model whose context fits, one step up for very long inputs.
+    reduce / plan: the strongest model that fits and stays within the per-call cost and latency budget
+    (falling back to the cheapest that fits when none does).
+    """
+    output_tokens = output_tokens or DEFAULT_OUTPUT_TOKENS
+    max_cost = ROUTER_MAX_CALL_COST if max_cost is None else max_cost
+    max_latency = ROUTER_MAX_LATENCY if max_latency is None else max_latency
+    role = STAGE_ROLES.get(stage, "map")
+    ladder = _ladder(role)
+    fitting = [m for m in ladder if input_tokens + output_tokens <= MODEL_PROFILES.get(m, {}).get("context", 128_000)]
+    if not fitting:
+        return Route(stage, ladder[-1], input_tokens, output_tokens, "no model fits; largest context")
+    routes = [Route(stage, m, input_tokens, output_tokens, "") for m in fitting]
+
+    if role == "map":
+        start = 1 if input_tokens > MAP_ESCALATE_TOKENS and len(routes) > 1 else 0
+        for route in routes[start:]:
+            if _within_budget(route, max_cost, max_latency):
+                route.reason = "long input, escalated" if start else "cheapest that fits"
+                return route
+    else:
+        for route in reversed(routes):
+            if _within_budget(route, max_cost, max_latency):
+                route.reason = "strongest within budget"
+                return route
+    routes[0].reason = "over budget; cheapest that fits"
+    return routes[0]
+
+
+def route(stage, messages, max_tokens=None, model=None):
+    """
+    Route a call. An explicit model (e.g. picked in the UI) always wins; with ROUTER_ENABLED=false every
+    stage gets its role's pre-routing default model.
+    """
+    input_tokens = sum(count_tokens(m["content"]) for m in messages)
+    if model:
+        return Route(stage, model, input_tokens, max_tokens or DEFAULT_OUTPUT_TOKENS, "explicit")
+    if not ROUTER_ENABLED:
+        default = ROLE_DEFAULTS[STAGE_ROLES.get(stage, "map")]
+        return Route(stage, default, input_tokens, max_tokens or DEFAULT_OUTPUT_TOKENS, "router disabled")
+    return choose_model(stage, input_tokens, max_tokens)
+
+
+# === Calls ===
+_usage = {}   # job id -> stage -> totals, for the job's own result
+_usage_lock = threading.Lock()
+
+
+def _record(s, r, text, elapsed):
+    tokens_out = count_tokens(text or "")
+    cost = metrics.estimate_cost(r.model, r.input_tokens, tokens_out)
+    # Attributes rather than counters: the provider's llm.* span already counts these tokens
+    s.set(output_tokens=tokens_out, cost_usd=round(cost, 6))
+    with _usage_lock:
+        stage = _usage.setdefault(metrics.current_job_id(), {}).setdefault(r.stage, _empty_stage())
+        _add(stage, r.model, elapsed, r.input_tokens, tokens_out, cost)
+
+
+def _span_attrs(r):
+    return {"model": r.model, "reason": r.reason, "input_tokens": r.input_tokens,
+            "est_cost_usd": round(r.est_cost, 6), "est_latency_s": round(r.est_latency, 2)}
+
+
+def complete(stage, messages, max_tokens=None, temperature=None, model=None, **options):
+    """get_chat_provider(...).complete() on the model the router picks for this stage."""
+    r = route(stage, messages, max_tokens, model)
+    with metrics.span(f"route.{r.stage}", **_span_attrs(r)) as s:
+        start = time.perf_counter()
+        text = get_chat_provider(r.provider).complete(messages, r.model, max_tokens, temperature, **options)
+        _record(s, r, text, time.perf_counter() - start)
+        return text
+
+
+def stream(stage, messages, max_tokens=None, temperature=None, model=None, **options):
+    """Streaming counterpart of complete()."""
+    r = route(stage, messages, max_tokens, model)
+    # Timed by hand: a context-managed span must not stay open across yields
+    s = metrics.Span(f"route.{r.stage}", _span_attrs(r))
+    start = time.perf_counter()
+    parts = []
+    try:
+        for delta in get_chat_provider(r.provider).stream(messages, r.model, max_tokens, temperature, **options):
+            parts.append(delta)
+            yield delta
+    except Exception as e:
+        s.error = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        elapsed = time.perf_counter() - start
+        _record(s, r, "".join(parts), elapsed)
+        metrics.finish_span(s, elapsed)
+
+
+# === Reporting ===
+def _empty_stage():
+    return {"models": {}, "calls": 0, "latency_s": 0.0, "tokens_in": 0, "tokens_out": 0, "cost_usd": 0.0}
+
+
+def _add(stage, model, latency, tokens_in, tokens_out, cost):
+    stage["models"][model] = stage["models"].get(model, 0) + 1
+    stage["calls"] += 1
+    stage["latency_s"] = round(stage["latency_s"] + latency, 3)
+    stage["tokens_in"] += tokens_in
+    stage["tokens_out"] += tokens_out
+    stage["cost_usd"] = round(stage["cost_usd"] + cost, 6)
+
+
+def job_usage(job_id=None, clear=True):
+    """
+    Per-stage model usage recorded in this process for a job:
+    {stage: {"models": {model: calls}, "calls", "latency_s", "tokens_in", "tokens_out", "cost_usd"}}.
+    """
+    job_id = job_id or metrics.current_job_id()
+    with _usage_lock:
+        return _usage.pop(job_id, {}) if clear else dict(_usage.get(job_id, {}))
+
+
+def stage_report(job_id=None, path=None):
+    """The same per-stage usage, rebuilt from recorded spans (all processes, optionally one job)."""
+    report = {}
+    for s in metrics.read_spans(path or metrics.METRICS_LOG, job_id):
+        if s["name"].startswith("route."):
+            attrs = s["attrs"]
+            _add(report.setdefault(s["name"][len("route."):], _empty_stage()), attrs.get("model"), s["duration_s"],
+                 attrs.get("input_tokens", 0), attrs.get("output_tokens", 0), attrs.get("cost_usd", 0.0))
+    return report
+
+
+def print_report(report):
+    print(f"{'stage':<20}{'models':<42}{'calls':>6}{'latency_s':>11}{'tok_in':>10}{'tok_out':>9}{'cost_usd':>10}")
+    for name, stage in sorted(report.items()):
+        models = ", ".join(f"{m} x{n}" for m, n in stage["models"].items())
+        print(f"{name:<20}{models:<42}{stage['calls']:>6}{stage['latency_s']:>11.2f}"
+              f"{stage['tokens_in']:>10}{stage['tokens_out']:>9}{stage['cost_usd']:>10.4f}")
+
+
+# === CLI Entry ===
+if __name__ == "__main__":
+    print_report(stage_report(sys.argv[1] if len(sys.argv) > 1 else None))
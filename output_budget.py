@@ -0,0 +1,137 @@
+import os
+import contextvars
+from contextlib import contextmanager
+
+# === Configuration ===
+# Output tokens dominate generation time, so each job picks how much text it wants back.
+# Budgets scale with the source (minutes of media, pages of text) and are enforced twice:
+# as a word target in the prompt and as max_tokens on the call. The default, exhaustive, is the
+# unbudgeted output every job produced before modes existed; shorter modes are chosen per job.
+DEFAULT_OUTPUT_MODE = os.getenv("OUTPUT_MODE", "exhaustive")
+TOKENS_PER_WORD = 1.35
+MAX_TOKENS_HEADROOM = 1.25     # max_tokens is a hard stop; leave room to finish the last section
+WORDS_PER_PAGE = 500           # "page" of source text
+SPOKEN_WORDS_PER_MINUTE = 150  # used when only a transcript's text is known
+
+# None for a setting means "no limit": the original prompts and max_tokens are used unchanged.
+# verbosity is passed to models that take it instead of max_tokens (gpt-5)
+MODES = {
+    "quick": {"words_per_minute": 12, "words_per_page": 40, "min_words": 120, "max_words": 700,
+              "reduce_ratio": 0.35, "max_reduce_words": 1200, "max_plan_words": 2500, "verbosity": "low"},
+    "standard": {"words_per_minute": 35, "words_per_page": 120, "min_words": 250, "max_words": 2500,
+                 "reduce_ratio": 0.6, "max_reduce_words": 4000, "max_plan_words": 7000, "verbosity": "medium"},
+    "exhaustive": {"words_per_minute": None, "words_per_page": None, "min_words": None, "max_words": None,
+                   "reduce_ratio": None, "max_reduce_words": None, "max_plan_words": None, "verbosity": "high"},
+}
+MODE_LABELS = {
+    "quick": "⚡ Quick overview",
+    "standard": "📘 Standard",
+    "exhaustive": "📚 Exhaustive",
+}
+
+_current_mode = contextvars.ContextVar("output_mode", default=None)
+
+
+@contextmanager
+def job_mode(mode):
+    """Apply an output mode to every budget computed inside the block (set per job by the worker)."""
+    token = _current_mode.set(mode if mode in MODES else None)
+    try:
+        yield
+    finally:
+        _current_mode.reset(token)
+
+
+def current_mode():
+    return _current_mode.get() or (DEFAULT_OUTPUT_MODE if DEFAULT_OUTPUT_MODE in MODES else "exhaustive")
+
+
+def verbosity(mode=None):
+    return MODES[mode or current_mode()]["verbosity"]
+
+
+def cache_parts():
+    """Extra summary-cache key parts, so summaries of different lengths never replace each other.
+    Exhaustive output is what the cache always held, so its keys stay as they were."""
+    mode = current_mode()
+    return () if MODES[mode]["max_words"] is None else (mode,)
+
+
+# === Budgets ===
+class Budget:
+    """A word target (None = unlimited) with the matching max_tokens and prompt instruction."""
+
+    def __init__(self, words, default_max_tokens=None):
+        self.words = words
+        self.default_max_tokens = default_max_tokens
+
+    @property
+    def max_tokens(self):
+        if self.words is None:
+            return self.default_max_tokens
+        tokens = int(self.words * TOKENS_PER_WORD * MAX_TOKENS_HEADROOM)
+        return min(tokens, self.default_max_tokens) if self.default_max_tokens else tokens
+
+    def instruction(self, sections=None):
+        """Length requirement to append to a prompt ("" when unlimited); sections: {name: words}."""
+        if self.words is None:
+            return ""
+        text = (f"\n\nLENGTH LIMIT: Write about {self.words} words in total (hard limit {int(self.words * 1.1)}). "
+                "Spend the words on the most important points first; leave out minor detail rather than running long.")
+        if sections:
+            text += " Split it roughly as: " + "; ".join(f"{name} ~{words} words" for name, words in sections.items()) + "."
+        return text
+
+
+def _clamp(words, settings, ceiling_key="max_words"):
+    words = max(settings["min_words"], int(words))
+    return min(words, settings[ceiling_key])
+
+
+def for_media(seconds, default_max_tokens=None, mode=None):
+    """Budget for a summary of seconds of audio/video."""
+    settings = MODES[mode or current_mode()]
+    if settings["words_per_minute"] is None:
+        return Budget(None, default_max_tokens)
+    return Budget(_clamp(seconds / 60 * settings["words_per_minute"], settings), default_max_tokens)
+
+
+def for_text(words, default_max_tokens=None, mode=None):
+    """Budget for a summary of a text of this many words."""
+    settings = MODES[mode or current_mode()]
+    if settings["words_per_page"] is None:
+        return Budget(None, default_max_tokens)
+    return Budget(_clamp(words / WORDS_PER_PAGE * settings["words_per_page"], settings), default_max_tokens)
+
+
+def for_transcript(text, default_max_tokens=None, mode=None):
+    """Budget for a transcript whose media length is unknown (estimated from its word count)."""
+    return for_media(len(text.split()) / SPOKEN_WORDS_PER_MINUTE * 60, default_max_tokens, mode)
+
+
+def for_reduce(input_words, default_max_tokens=None, plan=False, mode=None):
+    """Budget for a merge/rewrite of already-summarized input (merges, reformat, the final plan)."""
+    settings = MODES[mode or current_mode()]
+    if settings["reduce_ratio"] is None:
+        return Budget(None, default_max_tokens)
+    ceiling = "max_plan_words" if plan else "max_reduce_words"
+    return Budget(_clamp(input_words * settings["reduce_ratio"], settings, ceiling), default_max_tokens)
+
+
+def for_delta(existing_words, added_words, default_max_tokens=None, mode=None):
+    """
+    Budget for rewriting an existing section with new material: its length plus the reduce share of
+    the new material, capped at the mode's max_reduce_words so repeated merges cannot grow it unbounded.
+    """
+    settings = MODES[mode or current_mode()]
+    if settings["reduce_ratio"] is None:
+        return Budget(None, default_max_tokens)
+    growth = min(int(added_words * settings["reduce_ratio"]), settings["max_reduce_words"])
+    words = min(existing_words + growth, settings["max_reduce_words"])
+    return Budget(max(settings["min_words"], words), default_max_tokens)
+
+
+def allocate(total_words, weights):
+    """Split a word budget across sections in proportion to weights ({name: weight}), in whole words."""
+    total_weight = sum(weights.values()) or 1
+    return {name: max(1, int(total_words * weight / total_weight)) for name, weight in weights.items()}
@@ -0,0 +1,619 @@
+import os
+import re
+import contextvars
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from docx import Document
+from docx.enum.text import WD_PARAGRAPH_ALIGNMENT
+from dotenv import load_dotenv
+from workspace import create_workspace, ensure_workspace, get_workspace_paths, clear_directory
+from summary_cache import cache_key, get_cached_summary, put_cached_summary, is_partial
+import json
+import model_router
+import output_budget
+import guide_store
+import docx_reader
+import metrics
+from metrics import traced
+
+load_dotenv()
+# === Configuration ===
+MERGE_WORKERS = int(os.getenv("MERGE_WORKERS", "4"))  # concurrent calls when merging new sources into a guide
+ROUTE_RETRY_FACTOR = 2  # a routing reply cut off by max_tokens is retried once with this much more room
+
+
+def _no_progress(fraction=None, message=None):
+    if message:
+        print(message)
+
+
+def _workspace_paths(params):
+    """Paths of the job's workspace (a fresh one when the caller did not pass any)."""
+    workspace_dir = params.get("workspace") or create_workspace()
+    return get_workspace_paths(ensure_workspace(workspace_dir))
+
+
+# === Word Output Helpers ===
+def add_formatted_run(paragraph, text):
+    pattern = re.compile(r'(\*\*.*?\*\*|\*.*?\*\*)')
+    pos = 0
+    for match in pattern.finditer(text):
+        start, end = match.span()
+        if pos < start:
+            paragraph.add_run(text[pos:start])
+        matched_text = match.group()
+        cleaned_text = matched_text.strip('*')
+        run = paragraph.add_run(cleaned_text)
+        run.bold = True
+        pos = end
+    if pos < len(text):
+        paragraph.add_run(text[pos:])
+
+@traced("render.docx")
+def write_to_word(text, output_file="generated_summary.docx"):
+    doc = Document()
+    title = doc.add_heading("Generated Topic-Wise Plan", level=1)
+    title.alignment = WD_PARAGRAPH_ALIGNMENT.CENTER
+
+    lines = text.split("\n")
+    for line in lines:
+        line = line.strip()
+        if not line:
+            continue
+
+        if line.startswith("### "):
+            doc.add_heading(line[4:], level=3)
+        elif line.startswith("## "):
+            doc.add_heading(line[3:], level=2)
+        elif line.startswith("# "):
+            doc.add_heading(line[2:], level=1)
+        elif re.match(r"^Chapter \d+: ", line, re.IGNORECASE):
+            doc.add_heading(line, level=2)
+        elif line.startswith(("-", "*", "•")):
+            p = doc.add_paragraph(style="List Bullet")
+            add_formatted_run(p, line[1:].strip())
+        elif re.match(r"^\d+\.", line):
+            p = doc.add_paragraph(style="List Number")
+            add_formatted_run(p, line.strip())
+        else:
+            p = doc.add_paragraph()
+            add_formatted_run(p, line)
+
+    doc.save(output_file)
+
+
+# === Summary Generator Pipeline ===
+def summarize_cached(kind, item, summarize, progress=_no_progress):
+    """
+    Reuse the summary of byte-identical content (same upload hash) instead of calling the models again.
+    item: {"name", "sha256"}. Returns (summary, reused_from_cache).
+    """
+    sha256 = item.get("sha256")
+    if not sha256:
+        return summarize(), False
+    key = cache_key(kind, sha256, *output_budget.cache_parts())
+    cached = get_cached_summary(key)
+    if cached:
+        metrics.add("cache_hits")
+        progress(None, f"♻️ Reusing cached summary for: {item['name']}")
+        return cached, True
+    metrics.add("cache_misses")
+    summary = summarize()
+    # Partial summaries (e.g. a transcription that failed part-way) are shown but never reused
+    if summary and not is_partial(summary):
+        put_cached_summary(key, summary)
+    return summary, False
+
+
+def _summarize_cached(kind, item, summarize, progress):
+    return summarize_cached(kind, item, summarize, progress)[0]
+
+
+def run_summary_job(params, progress=_no_progress, document_summaries=None):
+    """
+    Summarize every uploaded video, YouTube URL and document and merge them into one docx.
+    params: {"workspace": ..., "youtube_urls": [...],
+             "videos": [{"name", "path", "sha256"}], "documents": [{"name", "path", "sha256"}]}
+    document_summaries: {path: summary} for documents already summarized elsewhere (see run_bulk_summary_job).
+    """
+    from youtube_summarizer import summarize_youtube_video
+    from document_summarizer import generate_summary_from_file
+    from video_summarizer import get_summary_from_video
+
+    paths = _workspace_paths(params)
+    videos = params.get("videos", [])
+    youtube_urls = [u for u in params.get("youtube_urls", []) if u.strip()]
+    documents = params.get("documents", [])
+    total = max(1, len(videos) + len(youtube_urls) + len(documents))
+    completed = 0
+
+    doc = Document()
+    doc.add_heading("Merged Summaries", level=1)
+    added_any_summary = False
+    warnings = []
+    # The sources behind this summary are kept next to its docx, so reformatting can tell which of them
+    # the workspace's guide already covers; the guide itself is only written by the reformat job
+    guide = guide_store.load_guide(paths)
+    mode = output_budget.current_mode()
+    sources = {}
+
+    # Videos transcribe side by side when an ASR pool with several warm workers is running
+    import asr_pool
+    video_workers = max(1, min(len(asr_pool.pool_health() or {}), len(videos)))
+    if videos:
+        progress(0.0, f"🔄 Generating summaries for {len(videos)} video(s) on {video_workers} ASR worker(s)")
+    video_summaries = {}
+    with ThreadPoolExecutor(max_workers=video_workers) as pool:
+        video_futures = {
+            pool.submit(contextvars.copy_context().run, _summarize_cached, "video", video,
+                        lambda path=video["path"]: get_summary_from_video(path), progress): index
+            for index, video in enumerate(videos)
+        }
+        # Report each video as it finishes; the docx still lists them in upload order below
+        for future in as_completed(video_futures):
+            index = video_futures[future]
+            video_summaries[index] = future.result()
+            completed += 1
+            done = "✔ Summarized" if video_summaries[index] else "⚠ No summary for"
+            progress(completed / total, f"{done} video {completed}/{len(videos)}: {videos[index]['name']}")
+
+    for index, video in enumerate(videos):
+        summary = video_summaries[index]
+        if summary:
+            sources[guide_store.source_id("video", video)] = guide_store.source_record(video["name"], "video", summary, mode)
+            doc.add_heading("Video File Summary", level=2)
+            doc.add_heading(f"File: {video['name']}", level=2)
+            doc.add_paragraph(summary)
+            added_any_summary = True
+            progress(None, f"✔ Summary added for video: {video['name']}")
+        else:
+            warnings.append(f"⚠ No summary generated for video: {video['name']}")
+            progress(None, warnings[-1])
+
+    count = 1
+    for url in youtube_urls:
+        progress(completed / total, f"🔄 Generating summary for YouTube URL-{count}")
+        summary = guide_store.stored_summary(guide, guide_store.source_id("youtube", url), mode)
+        if summary:
+            progress(None, f"♻️ Reusing summary of URL-{count} from this workspace's guide")
+        else:
+            summary = summarize_youtube_video(url, work_dir=paths["uploads"])
+        if summary:
+            sources[guide_store.source_id("youtube", url)] = guide_store.source_record(url, "youtube", summary, mode)
+            doc.add_heading("YouTube Video Summary", level=2)
+            doc.add_heading(f"URL: {url}", level=2)
+            doc.add_paragraph(summary)
+            added_any_summary = True
+            progress(None, f"✔ Summary added for: URL-{count}")
+            count += 1
+        else:
+            warnings.append(f"⚠ No summary for: {url}")
+            progress(None, warnings[-1])
+        completed += 1
+
+    for document in documents:
+        progress(completed / total, f"🔄 Generating summary for document: {document['name']}")
+        if document_summaries is not None and document["path"] in document_summaries:
+            summary = document_summaries[document["path"]]
+        else:
+            summary = _summarize_cached("document", document,
+                                        lambda: generate_summary_from_file(document["path"]), progress)
+        if summary:
+            sources[guide_store.source_id("document", document)] = guide_store.source_record(
+                document["name"], "document", summary, mode)
+            doc.add_heading("Document Summary", level=2)
+            doc.add_heading(f"File: {document['name']}", level=2)
+            doc.add_paragraph(summary)
+            added_any_summary = True
+            progress(None, f"✔ Summary added for document: {document['name']}")
+        else:
+            warnings.append(f"⚠ No summary generated for document: {document['name']}")
+            progress(None, warnings[-1])
+        completed += 1
+
+    if not added_any_summary:
+        return {"summary_path": "", "timestamp": "", "warnings": warnings, "models": model_router.job_usage()}
+
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    output_path = os.path.join(paths["outputs"], f"merged_summary_{timestamp}.docx")
+    doc.save(output_path)
+    guide_store.save_summary_sources(output_path, sources)
+    progress(1.0, "✅ Summary generation complete!")
+    return {"summary_path": output_path, "timestamp": timestamp, "warnings": warnings,
+            "models": model_router.job_usage()}
+
+
+def run_bulk_summary_job(params, progress=_no_progress):
+    """
+    Same as run_summary_job, for loads nobody is waiting on: all document chunks are summarized in one
+    asynchronous Batch API job (no rate-limit sleeps, batch pricing), polled until it completes.
+    The batch id is checkpointed in the workspace, so a requeued job resumes the same batch.
+    params: as for run_summary_job, plus an optional "model".
+    """
+    from document_summarizer import generate_summaries_batch
+
+    paths = _workspace_paths(params)
+    documents = params.get("documents", [])
+    summaries, pending = {}, []
+    for document in documents:
+        key = cache_key("document", document["sha256"], *output_budget.cache_parts()) if document.get("sha256") else None
+        cached = get_cached_summary(key) if key else None
+        if cached:
+            metrics.add("cache_hits")
+            progress(None, f"♻️ Reusing cached summary for: {document['name']}")
+            summaries[document["path"]] = cached
+        else:
+            pending.append(document)
+
+    if pending:
+        progress(0.0, f"📦 Submitting {len(pending)} document(s) as one batch")
+        state_path = os.path.join(paths["checkpoints"], f"batch_{params.get('job_id', 'latest')}.json")
+        batched = generate_summaries_batch([d["path"] for d in pending], params.get("model"),
+                                           state_path=state_path, progress=progress)
+        for document in pending:
+            summary = batched.get(document["path"], "")
+            summaries[document["path"]] = summary
+            if summary and document.get("sha256"):
+                metrics.add("cache_misses")
+                put_cached_summary(cache_key("document", document["sha256"], *output_budget.cache_parts()), summary)
+
+    return run_summary_job(params, progress, document_summaries=summaries)
+
+
+# === GPT Reformatting ===
+def build_reformat_prompt(full_text, budget=None):
+    if budget and budget.words:
+        length_note = budget.instruction(output_budget.allocate(
+            budget.words, {"FUNDAMENTALS": 2, "KEY TOPICS": 4, "ADVANCED CONCEPTS": 2, "SUMMARY": 1})).strip()
+    else:
+        length_note = "note: generate a detailed summary as much as tokens allow"
+    return f"""
+        You are an expert tutor. Merge these study materials summaries into one complete learning guide.
+
+        TASK:
+        1. Combine all notes/chapters/topics into a single, organized summary
+        2. Arrange topics in logical learning order (basics → advanced)
+        3. Include ALL points from every source
+        4. Highlight any conflicts between sources and explain why they exist
+        5. Add your own knowledge to fill gaps and provide context
+        6. Ensure the final summary is comprehensive and easy to follow
+
+        {length_note}
+
+        STRUCTURE:
+        ## FUNDAMENTALS
+        Core concepts and definitions
+
+        ## KEY TOPICS
+        Main ideas with examples and applications
+
+        ## ADVANCED CONCEPTS
+        Complex topics and expert insights
+
+        ## SUMMARY
+        Key takeaways and important points to remember
+
+        Make it easy to understand and study from. Don't skip anything.
+
+        Study Material summaries:
+        {full_text}
+        Now write the final, detailed, well-organized explanation """
+
+
+def _complete_reduce(stage, prompt, selected_model, budget):
+    """One reduce-stage call on the model picked in the UI ("auto" lets the router choose)."""
+    if selected_model in ("auto", "gpt-4.1-mini"):
+        return model_router.complete(
+            stage,
+            [
+                {"role": "system", "content": "You are an expert summarizer and tutor."},
+                {"role": "user", "content": prompt}
+            ],
+            model=None if selected_model == "auto" else selected_model,
+            max_tokens=budget.max_tokens,
+            temperature=0.5
+        ).strip()
+    return model_router.complete(
+        stage,
+        [{"role": "user", "content": prompt}],
+        model=selected_model,
+        verbosity=output_budget.verbosity(),
+        reasoning="low",
+    ).strip()
+
+
+SOURCE_LABELS = {"video": "Video File Summary", "youtube": "YouTube Video Summary", "document": "Document Summary"}
+
+
+def _sources_text(sources):
+    return "\n\n".join(f"{SOURCE_LABELS.get(source['kind'], 'Summary')}: {source['name']}\n{source['summary']}"
+                       for source in sources.values())
+
+
+# === Incremental Guide Merge ===
+def build_route_prompt(section_titles, source_name, summary):
+    titles = "\n".join(f"- {title}" for title in section_titles if title)
+    return f"""
+        You maintain a study guide with these sections:
+        {titles}
+
+        A new source ("{source_name}") has been added. Sort ALL of its points into the existing sections.
+        For each section the source adds to, write notes with everything the section should gain from it
+        (facts, definitions, examples, and anything that conflicts with what a guide would usually say).
+        Only when a point fits none of the sections, put it under a new section with a short title.
+        Leave out sections the source does not touch.
+
+        Reply with JSON only, in this form:
+        {{"updates": [{{"section": "<exact existing title>", "notes": "..."}}],
+          "new_sections": [{{"title": "...", "notes": "..."}}]}}
+
+        New source summary:
+        {summary}"""
+
+
+def build_section_merge_prompt(title, body, notes, budget):
+    existing = body or "(new section; nothing written yet)"
+    return f"""
+        You are an expert tutor updating one section of a study guide with material from newly added sources.
+
+        TASK:
+        1. Fold every new point into the section, in logical learning order
+        2. Keep all existing content unless the new material corrects it
+        3. Highlight any conflicts between the new material and the section and explain why they exist
+        4. Don't repeat points the section already makes
+        5. Reply with the section body only: no "## {title}" heading (use ### subheadings if needed)
+        {budget.instruction().strip()}
+
+        SECTION: {title}
+        {existing}
+
+        NEW MATERIAL:
+        {notes}
+        Now write the updated section """
+
+
+def _parse_routes(text):
+    match = re.search(r"\{.*\}", text or "", re.DOTALL)
+    try:
+        routes = json.loads(match.group(0)) if match else None
+    except ValueError:
+        routes = None
+    return routes if isinstance(routes, dict) else None
+
+
+def _route_source(section_titles, sid, source):
+    """Notes of one new source per section: ({title: notes}, {new title: notes})."""
+    budget = output_budget.for_reduce(len(source["summary"].split()), default_max_tokens=10000)
+    messages = [{"role": "user", "content": build_route_prompt(section_titles, source["name"], source["summary"])}]
+    max_tokens = budget.max_tokens
+    for attempt in range(2):
+        reply = model_router.complete("merge.route", messages, max_tokens=max_tokens, temperature=0)
+        routes = _parse_routes(reply)
+        if routes is not None:
+            break
+        # Most often the JSON was truncated at max_tokens: log it and try once more with room to finish
+        print(f"⚠️ Routing reply for {source['name']} is not valid JSON ({len(reply or '')} characters, "
+              f"max_tokens={max_tokens}){'; retrying' if attempt == 0 else ''}")
+        max_tokens = max_tokens * ROUTE_RETRY_FACTOR if max_tokens else None
+    if routes is None:
+        # Unroutable: the whole summary becomes a section of its own rather than touching every section
+        print(f"⚠️ Could not route {source['name']} into sections; adding it as a new section")
+        return {}, {source["name"]: source["summary"]}
+    by_title = {title.lower(): title for title in section_titles}
+    updates, new_sections = {}, {}
+    for entry in routes.get("updates", []) + routes.get("new_sections", []):
+        if not isinstance(entry, dict) or not str(entry.get("notes", "")).strip():
+            continue
+        title = str(entry.get("section") or entry.get("title") or source["name"]).strip()
+        target = updates if title.lower() in by_title else new_sections
+        title = by_title.get(title.lower(), title)
+        target[title] = (target.get(title, "") + f"\n\nFrom {source['name']}:\n" + entry["notes"].strip()).strip()
+    return updates, new_sections
+
+
+def merge_sources_into_guide(guide, sources, selected_model="auto", progress=_no_progress):
+    """
+    Fold new sources into the guide's sections: each source is routed into the sections it adds to,
+    and only those sections are rewritten (new ones are inserted before the closing SUMMARY section).
+    Cost follows the new sources and the sections they touch, not the size of the whole collection.
+    Returns {"sections": [rewritten titles], "new_sections": [added titles]}.
+    """
+    sections = guide["sections"]
+    titles = [section["title"] for section in sections]
+    progress(0.2, f"🧭 Routing {len(sources)} new source(s) into {len(titles)} guide sections...")
+    with ThreadPoolExecutor(max_workers=MERGE_WORKERS) as pool:
+        futures = [pool.submit(contextvars.copy_context().run, _route_source, titles, sid, source)
+                   for sid, source in sources.items()]
+        routed = [future.result() for future in futures]
+
+    notes = {}
+    for updates, new_sections in routed:
+        for title, text in list(updates.items()) + list(new_sections.items()):
+            notes[title] = (notes.get(title, "") + "\n\n" + text).strip()
+    existing = {section["title"]: section for section in sections}
+    for title in notes:
+        if title not in existing:
+            section = {"title": title, "body": ""}
+            closing = next((i for i, s in enumerate(sections) if s["title"].upper() == "SUMMARY"), len(sections))
+            sections.insert(closing, section)
+            existing[title] = section
+
+    def rewrite(title):
+        section = existing[title]
+        budget = output_budget.for_delta(len(section["body"].split()), len(notes[title].split()),
+                                         default_max_tokens=10000)
+        prompt = build_section_merge_prompt(title or "Introduction", section["body"], notes[title], budget)
+        return _complete_reduce("merge.section", prompt, selected_model, budget)
+
+    progress(0.5, f"✍️ Rewriting {len(notes)} affected section(s)...")
+    with ThreadPoolExecutor(max_workers=MERGE_WORKERS) as pool:
+        futures = [pool.submit(contextvars.copy_context().run, rewrite, title) for title in notes]
+        bodies = [future.result() for future in futures]
+    for title, body in zip(notes, bodies):
+        # A heading echoed back despite the prompt would nest a second one under the section's own
+        existing[title]["body"] = re.sub(rf"^##\s+{re.escape(title)}\s*\n", "", body).strip()
+    return {"sections": [t for t in notes if t in titles], "new_sections": [t for t in notes if t not in titles]}
+
+
+def run_reformat_job(params, progress=_no_progress):
+    """
+    Merge a summary's sources into the workspace's enhanced learning guide.
+    Once the guide exists, sources it does not cover yet are merged into only the sections they affect;
+    a full merge runs the first time, on params["rebuild"] (over every source the guide has seen),
+    or when the output length changed.
+    params: {"workspace": ..., "summary_path": ..., "model": ..., "rebuild": bool}
+    """
+    paths = _workspace_paths(params)
+    selected_model = params.get("model", "auto")  # "auto" lets the router pick the reduce model
+    mode = output_budget.current_mode()
+    # Summaries written before sources were kept next to them have none; their docx is the only copy
+    sources = guide_store.load_summary_sources(params["summary_path"])
+
+    # Held for the whole merge: a second reformat of this workspace waits instead of merging into stale sections
+    with guide_store.update_guide(paths) as guide:
+        if guide["sections"] and not params.get("rebuild") and guide["output_mode"] == mode:
+            added = guide_store.new_sources(guide, sources)
+            merge = {"mode": "incremental", "sources": [s["name"] for s in added.values()]}
+            if added:
+                merge.update(merge_sources_into_guide(guide, added, selected_model, progress))
+            else:
+                progress(0.5, "✔ The guide already includes every source; nothing to merge")
+        else:
+            progress(0.1, "🧠 GPT is processing and enhancing the summary...")
+            everything = dict(guide["sources"], **sources) if guide["sections"] else sources
+            full_text = _sources_text(everything) or docx_reader.read_text(params["summary_path"])
+            if not full_text.strip():
+                raise ValueError("Summary content is empty. Cannot process.")
+            budget = output_budget.for_reduce(len(full_text.split()), default_max_tokens=10000)
+            formatted_content = _complete_reduce("reformat", build_reformat_prompt(full_text, budget),
+                                                 selected_model, budget)
+            guide["sources"] = {}
+            sources = everything
+            guide["sections"] = guide_store.split_sections(formatted_content)
+            guide["output_mode"] = mode
+            merge = {"mode": "full", "sources": [s["name"] for s in everything.values()]}
+        guide_store.record_sources(guide, sources)
+        sections = guide["sections"]
+
+    gpt_path = os.path.join(paths["outputs"], f"enhanced_summary_{params.get('job_id', 'latest')}.docx")
+    write_to_word(guide_store.join_sections(sections), gpt_path)
+    progress(0.9, "✅ GPT-enhanced summary is ready!")
+
+    try:
+        # Only this workspace's uploads; other sessions' files are never touched
+        clear_directory(paths["uploads"])
+        progress(None, "🧹 Temporary uploaded files have been deleted.")
+    except Exception as e:
+        progress(None, f"⚠ Error during cleanup: {e}")
+
+    return {"enhanced_path": gpt_path, "merge": merge, "models": model_router.job_usage()}
+
+
+# === Study Plan Pipeline ===
+STUDY_PLAN_STAGES = ["youtube", "reddit", "web", "gpt", "claude"]
+
+
+def _data_files(folder_path="data"):
+    if not os.path.isdir(folder_path):
+        return []
+    return [os.path.join(folder_path, name) for name in os.listdir(folder_path)
+            if name.endswith((".pdf", ".docx"))]
+
+
+def run_study_plan_job(params, progress=_no_progress):
+    """
+    Fetch all study-plan sources and build the final plan with GPT + Claude.
+    The three fetchers and the text extraction of each uploaded file have no dependencies on each other
+    and run concurrently; GPT starts once they have all settled (a failed fetcher only costs its source),
+    and Claude needs GPT. Each stage is checkpointed, so a rerun only repeats stages whose inputs changed
+    (or that are listed in params["force_stages"]).
+    params: {"workspace": ..., "certificate_name": ...,
+             "final_data": {"youtube", "reddit", "other", "files", "answers"}, "force_stages": [...]}
+    """
+    from youtube_fetch import main as youtube_main
+    from reddit_fetch import main as reddit_main
+    from urls_fetch import main as urls_main
+    from gpt import main as gpt_main, extract_file_to_text
+    from claude import main as claude_main
+    from checkpoints import run_stage
+    from dag import DAG
+
+    paths = _workspace_paths(params)
+    certificate_name = params["certificate_name"]
+    final_data = params["final_data"]
+    force_stages = set(params.get("force_stages", []))
+
+    def stage(name, message, func, inputs, input_files=(), outputs=()):
+        progress(None, message)
+        ran = run_stage(name, func, inputs, input_files, outputs, force=name in force_stages,
+                        checkpoint_dir=paths["checkpoints"])
+        if not ran:
+            progress(None, f"⏭️ Reusing previous `{name}` output (inputs unchanged)")
+
+    graph = DAG()
+    fetchers = [
+        graph.add("youtube", lambda _: stage(
+            "youtube", "▶️ Running YouTube transcript fetcher...",
+            lambda: youtube_main(final_data["youtube"], paths["transcripts"],
+                                 os.path.join(paths["logs"], "transcript_log.txt")),
+            {"urls": final_data["youtube"]},
+            outputs=[paths["transcripts"]])),
+        graph.add("reddit", lambda _: stage(
+            "reddit", "▶️ Running Reddit post fetcher...",
+            lambda: reddit_main(final_data["reddit"], paths["reddit"]),
+            {"urls": final_data["reddit"]},
+            outputs=[paths["reddit"]])),
+        graph.add("web", lambda _: stage(
+            "web", "▶️ Running Webpage text extractor...",
+            lambda: urls_main(final_data["other"], final_data["answers"]["web"], paths["data"], paths["logs"]),
+            {"urls": final_data["other"], "answer": final_data["answers"]["web"]},
+            outputs=[paths["web"]])),
+    ]
+
+    # Uploaded supporting files are already on disk, so their text can be pulled out while the fetchers run.
+    # It is streamed to text files in the workspace, so GPT reads the corpus piece by piece as before.
+    fetched = {paths["transcripts"], paths["reddit"], paths["web"]}
+    os.makedirs(paths["extracted"], exist_ok=True)
+    extractions = [
+        graph.add(f"extract:{os.path.basename(path)}", lambda _, path=path: (path, extract_file_to_text(
+            path, os.path.join(paths["extracted"], os.path.basename(path) + ".txt"))))
+        for path in _data_files(paths["data"]) if path not in fetched
+    ]
+
+    def run_gpt(inputs):
+        extracted = dict(inputs[name] for name in extractions if name in inputs)
+        stage("gpt", "🧠 Generating topic insights with GPT...",
+              lambda: gpt_main(certificate_name=certificate_name, folder_path=paths["data"],
+                               output_file=paths["gpt_plan"], extracted=extracted),
+              {"certificate_name": certificate_name, "output_mode": output_budget.current_mode()},
+              input_files=_data_files(paths["data"]),
+              outputs=[paths["gpt_plan"]])
+
+    graph.add("gpt", run_gpt, after=fetchers + extractions)
+    graph.add("claude", lambda _: stage(
+        "claude", "📚 Generating final study plan with Claude...",
+        lambda: claude_main(certificate_name=certificate_name, input_file=paths["gpt_plan"],
+                            output_file=paths["study_plan"]),
+        {"certificate_name": certificate_name, "output_mode": output_budget.current_mode()},
+        input_files=[paths["gpt_plan"]],
+        outputs=[paths["study_plan"]]), requires=["gpt"])
+
+    settled = []
+
+    def on_done(name, record):
+        settled.append(name)
+        icon = {"done": "✔", "failed": "❌", "skipped": "⏭️"}[record["status"]]
+        detail = f" ({record['error']})" if record["error"] else ""
+        progress(len(settled) / len(graph.nodes),
+                 f"{icon} {name} {record['status']} in {record['duration_s']:.1f}s{detail}")
+
+    report = graph.run(on_done=on_done)
+    timings = {name: {k: record[k] for k in ("status", "error", "start_s", "duration_s")}
+               for name, record in report.items()}
+    for name in ("gpt", "claude"):
+        if report[name]["status"] != "done":
+            raise RuntimeError(f"Stage '{name}' {report[name]['status']}: {report[name]['error']}")
+
+    progress(1.0, f"📝 Study Plan Generated: `{os.path.basename(paths['study_plan'])}`")
+    return {"study_plan_path": paths["study_plan"], "stages": timings, "models": model_router.job_usage(),
+            "warnings": [f"⚠ {name} failed: {r['error']}" for name, r in timings.items() if r["status"] == "failed"]}
@@ -0,0 +1,201 @@
+import os
+import sys
+import time
+import random
+import functools
+import threading
+import tracemalloc
+import contextvars
+from collections import Counter
+from contextlib import contextmanager
+import metrics
+
+# === Configuration ===
+PROFILE_DIR = os.getenv("PROFILE_DIR", "profiles")
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))  # fraction of jobs profiled automatically
+PROFILE_INTERVAL = float(os.getenv("PROFILE_INTERVAL", "0.01"))     # seconds between stack samples
+PROFILE_TRACEMALLOC_FRAMES = int(os.getenv("PROFILE_TRACEMALLOC_FRAMES", "1"))  # more frames = more overhead
+PROFILE_SNAPSHOT_INTERVAL = float(os.getenv("PROFILE_SNAPSHOT_INTERVAL", "1"))  # min seconds between heap snapshots
+PROFILE_TOP_ALLOCATIONS = 25
+
+_profiling = contextvars.ContextVar("profiling", default=False)
+_active = contextvars.ContextVar("profile_active", default=False)
+_counters_lock = threading.Lock()
+_call_counters = Counter()
+# tracemalloc is process-wide while _active is per context: concurrent profiled calls (e.g. videos
+# summarized side by side) share one tracing session, started by the first and stopped by the last
+_tracing_lock = threading.Lock()
+_tracing_users = 0
+_tracing_owned = False
+
+
+def should_profile(params):
+    """Profile when the job asks for it, or for a random PROFILE_SAMPLE_RATE share of jobs."""
+    return bool(params.get("profile")) or random.random() < PROFILE_SAMPLE_RATE
+
+
+@contextmanager
+def job_profiling(enabled):
+    """Enable @profiled hot paths for everything run inside the block."""
+    token = _profiling.set(bool(enabled))
+    try:
+        yield
+    finally:
+        _profiling.reset(token)
+
+
+def profiling_enabled():
+    return _profiling.get()
+
+
+# === Sampling Profiler ===
+class StackSampler:
+    """
+    Samples the stack of one thread (the profiled call's) at a fixed interval and counts them in the
+    collapsed "frame;frame;frame count" format used by flamegraph.pl and speedscope.
+    While tracemalloc is on it also keeps the heap snapshot taken closest to peak usage,
+    since by the time the call returns its large temporaries are already freed.
+    """
+
+    def __init__(self, thread_id=None, interval=PROFILE_INTERVAL):
+        self.thread_id = thread_id or threading.get_ident()
+        self.interval = interval
+        self.stacks = Counter()
+        self.samples = 0
+        self.peak_snapshot = None
+        self._snapshot_size = 0
+        self._snapshot_at = 0.0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+
+    def _run(self):
+        name = next((t.name for t in threading.enumerate() if t.ident == self.thread_id), f"thread-{self.thread_id}")
+        while not self._stop.wait(self.interval):
+            # Only the profiled thread: heartbeats and other jobs' threads would swamp the profile
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is not None:
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+                    frame = frame.f_back
+                stack.append(name)
+                self.stacks[";".join(reversed(stack))] += 1
+            self.samples += 1
+            self._maybe_snapshot()
+
+    def _maybe_snapshot(self):
+        if not tracemalloc.is_tracing():
+            return
+        current = tracemalloc.get_traced_memory()[0]
+        now = time.monotonic()
+        if current > self._snapshot_size * 1.1 and now - self._snapshot_at >= PROFILE_SNAPSHOT_INTERVAL:
+            try:
+                self.peak_snapshot = tracemalloc.take_snapshot()
+            except RuntimeError:  # tracing stopped between the check and the snapshot
+                return
+            self._snapshot_size, self._snapshot_at = current, now
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def write_folded(self, path):
+        with open(path, "w", encoding="utf-8") as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f"{stack} {count}\n")
+
+
+def _write_allocations(snapshot, peak, path, label, duration):
+    snapshot = snapshot.filter_traces([tracemalloc.Filter(False, tracemalloc.__file__)])
+    stats = snapshot.statistics("lineno")
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(f"Top allocations for {label} near peak ({duration:.2f}s, peak traced memory {peak / 1024 / 1024:.1f} MB)\n\n")
+        for stat in stats[:PROFILE_TOP_ALLOCATIONS]:
+            frame = stat.traceback[0]
+            f.write(f"{stat.size / 1024:>12.1f} KB {stat.count:>9} blocks  {frame.filename}:{frame.lineno}\n")
+
+
+def _start_tracing():
+    """Join (or start) the process-wide tracemalloc session; the peak is only reset by the first call in."""
+    global _tracing_users, _tracing_owned
+    with _tracing_lock:
+        if _tracing_users == 0:
+            _tracing_owned = not tracemalloc.is_tracing()
+            if _tracing_owned:
+                tracemalloc.start(PROFILE_TRACEMALLOC_FRAMES)
+            tracemalloc.reset_peak()
+        _tracing_users += 1
+
+
+def _stop_tracing():
+    """Leave the session and return (snapshot or None, peak); the last call out stops tracing if it started it."""
+    global _tracing_users, _tracing_owned
+    with _tracing_lock:
+        snapshot, peak = None, 0
+        try:
+            if tracemalloc.is_tracing():
+                snapshot = tracemalloc.take_snapshot()
+                peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            _tracing_users -= 1
+            if _tracing_users == 0 and _tracing_owned:
+                tracemalloc.stop()
+                _tracing_owned = False
+        return snapshot, peak
+
+
+def _output_base(label):
+    job_id = metrics.current_job_id() or "adhoc"
+    directory = os.path.join(PROFILE_DIR, job_id)
+    os.makedirs(directory, exist_ok=True)
+    with _counters_lock:
+        _call_counters[(job_id, label)] += 1
+        n = _call_counters[(job_id, label)]
+    return os.path.join(directory, f"{label}-{n}")
+
+
+def profiled(label):
+    """
+    Decorator for hot paths. When profiling is enabled for the current job, the call runs under
+    the stack sampler and tracemalloc and writes <label>-<n>.folded / .alloc.txt under
+    profiles/<job_id>/. Otherwise (and for calls nested in another profiled call) it is a plain call.
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _profiling.get() or _active.get():
+                return func(*args, **kwargs)
+            token = _active.set(True)
+            _start_tracing()
+            sampler = StackSampler()
+            sampler.start()
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                duration = time.perf_counter() - start
+                _active.reset(token)
+                # The profiler must never fail (or mask the result of) the call it measures
+                try:
+                    sampler.stop()
+                    snapshot, peak = _stop_tracing()
+                    base = _output_base(label)
+                    sampler.write_folded(base + ".folded")
+                    if sampler.peak_snapshot or snapshot:
+                        _write_allocations(sampler.peak_snapshot or snapshot, peak, base + ".alloc.txt", label, duration)
+                    print(f"🔬 Profile written: {base}.folded ({sampler.samples} samples)")
+                except Exception as e:
+                    print(f"⚠️ Profiling {label} failed: {type(e).__name__}: {e}")
+        return wrapper
+    return decorator
+
+
+def list_profiles(job_id):
+    directory = os.path.join(PROFILE_DIR, job_id)
+    if not os.path.isdir(directory):
+        return []
+    return sorted(os.path.join(directory, name) for name in os.listdir(directory))
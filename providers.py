@@ -0,0 +1,520 @@
+import os
+import json
+import time
+import uuid
+import random
+import hashlib
+import threading
+from dotenv import load_dotenv
+import metrics
+
+load_dotenv()
+# === Configuration ===
+# LLM_PROVIDER=local swaps every OpenAI/Anthropic/Tavily call for the offline stand-in below.
+LLM_PROVIDER = os.getenv("LLM_PROVIDER", "live")
+LOCAL_RECORDINGS = os.getenv("LOCAL_RECORDINGS", "")         # JSON lines written by RecordingChatProvider
+PROVIDER_RECORD_PATH = os.getenv("PROVIDER_RECORD_PATH", "")  # record live responses here when set
+LOCAL_LATENCY = float(os.getenv("LOCAL_LATENCY", "0.5"))                # seconds before the first token
+LOCAL_TOKENS_PER_SECOND = float(os.getenv("LOCAL_TOKENS_PER_SECOND", "80"))
+LOCAL_ERROR_RATE = float(os.getenv("LOCAL_ERROR_RATE", "0"))
+LOCAL_OUTPUT_TOKENS = int(os.getenv("LOCAL_OUTPUT_TOKENS", "800"))      # size of synthesized replies
+LOCAL_BATCH_LATENCY = float(os.getenv("LOCAL_BATCH_LATENCY", "5"))      # seconds until a local batch completes
+BATCH_DONE_STATUSES = ("completed", "failed", "expired", "cancelled")
+REASONING_MODEL_PREFIXES = ("gpt-5", "o1", "o3", "o4")
+
+
+class ProviderError(Exception):
+    """Raised by the local stand-in to simulate a failed API call."""
+
+
+def _approx_tokens(text):
+    # ~4 characters per token; good enough for simulated throughput and cost
+    return max(1, len(text) // 4)
+
+
+_encoding = None
+
+
+def count_tokens(text):
+    """Token count for metrics; tiktoken when available, otherwise the 4-chars-per-token estimate."""
+    global _encoding
+    if _encoding is None:
+        try:
+            import tiktoken
+            _encoding = tiktoken.get_encoding("cl100k_base")
+        except Exception:
+            _encoding = False
+    if not _encoding:
+        return _approx_tokens(text)
+    return len(_encoding.encode(text, disallowed_special=()))
+
+
+def request_key(model, messages):
+    payload = json.dumps({"model": model, "messages": messages}, sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+# === Interfaces ===
+class ChatProvider:
+    """
+    complete() returns the reply text; stream() yields text deltas.
+    Providers with an asynchronous batch API also implement the batch methods:
+    requests are {"custom_id", "messages", "model", "max_tokens", "temperature"} dicts;
+    batch_status() returns {"status", "total", "completed", "failed"} (status ends in BATCH_DONE_STATUSES);
+    batch_results() returns {custom_id: {"text", "error", "model", "tokens_in", "tokens_out"}}.
+    """
+
+    def complete(self, messages, model, max_tokens=None, temperature=None, **options):
+        raise NotImplementedError
+
+    def stream(self, messages, model, max_tokens=None, temperature=None, **options):
+        yield self.complete(messages, model, max_tokens, temperature, **options)
+
+    def submit_batch(self, requests):
+        raise NotImplementedError(f"{type(self).__name__} has no batch API")
+
+    def batch_status(self, batch_id):
+        raise NotImplementedError(f"{type(self).__name__} has no batch API")
+
+    def batch_results(self, batch_id):
+        raise NotImplementedError(f"{type(self).__name__} has no batch API")
+
+    def cancel_batch(self, batch_id):
+        raise NotImplementedError(f"{type(self).__name__} has no batch API")
+
+
+class SearchProvider:
+    """Tavily-shaped search() and extract() responses."""
+
+    def search(self, query, **kwargs):
+        raise NotImplementedError
+
+    def extract(self, urls, **kwargs):
+        raise NotImplementedError
+
+
+# === Live Providers ===
+def is_reasoning_model(model):
+    """OpenAI reasoning models take no temperature or max_tokens; they are called through the Responses API."""
+    return model.startswith(REASONING_MODEL_PREFIXES)
+
+
+class OpenAIChatProvider(ChatProvider):
+    def __init__(self, api_key=None):
+        from openai import OpenAI
+        self.client = OpenAI(api_key=api_key or os.getenv("OPENAI_API_KEY"))
+
+    def complete(self, messages, model, max_tokens=None, temperature=None, **options):
+        # The model decides the API, whoever picked it (the UI or the router); verbosity/reasoning only tune it
+        if is_reasoning_model(model):
+            kwargs = {"model": model, "input": messages,
+                      "text": {"verbosity": options.get("verbosity", "medium")},
+                      "reasoning": {"effort": options.get("reasoning", "low")}}
+            if max_tokens is not None:
+                kwargs["max_output_tokens"] = max_tokens
+            return self.client.responses.create(**kwargs).output_text
+        kwargs = {"model": model, "messages": messages}
+        if max_tokens is not None:
+            kwargs["max_tokens"] = max_tokens
+        if temperature is not None:
+            kwargs["temperature"] = temperature
+        response = self.client.chat.completions.create(**kwargs)
+        return response.choices[0].message.content
+
+    def stream(self, messages, model, max_tokens=None, temperature=None, **options):
+        if is_reasoning_model(model):
+            yield self.complete(messages, model, max_tokens, temperature, **options)
+            return
+        kwargs = {"model": model, "messages": messages, "stream": True}
+        if max_tokens is not None:
+            kwargs["max_tokens"] = max_tokens
+        if temperature is not None:
+            kwargs["temperature"] = temperature
+        for chunk in self.client.chat.completions.create(**kwargs):
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
+
+    def submit_batch(self, requests):
+        lines = []
+        for request in requests:
+            body = {"model": request["model"], "messages": request["messages"]}
+            reasoning = is_reasoning_model(request["model"])
+            if request.get("max_tokens") is not None:
+                body["max_completion_tokens" if reasoning else "max_tokens"] = request["max_tokens"]
+            if request.get("temperature") is not None and not reasoning:
+                body["temperature"] = request["temperature"]
+            lines.append(json.dumps({"custom_id": request["custom_id"], "method": "POST",
+                                     "url": "/v1/chat/completions", "body": body}))
+        input_file = self.client.files.create(file=("batch.jsonl", "\n".join(lines).encode("utf-8")), purpose="batch")
+        batch = self.client.batches.create(input_file_id=input_file.id, endpoint="/v1/chat/completions",
+                                           completion_window="24h")
+        return batch.id
+
+    def batch_status(self, batch_id):
+        batch = self.client.batches.retrieve(batch_id)
+        counts = batch.request_counts
+        return {"status": batch.status, "total": counts.total if counts else 0,
+                "completed": counts.completed if counts else 0, "failed": counts.failed if counts else 0}
+
+    def batch_results(self, batch_id):
+        batch = self.client.batches.retrieve(batch_id)
+        results = {}
+        for file_id in (batch.output_file_id, batch.error_file_id):
+            if not file_id:
+                continue
+            for line in self.client.files.content(file_id).text.splitlines():
+                if not line.strip():
+                    continue
+                record = json.loads(line)
+                response = record.get("response") or {}
+                body = response.get("body") or {}
+                if record.get("error") or response.get("status_code") != 200:
+                    error = record.get("error") or body.get("error") or {"message": f"HTTP {response.get('status_code')}"}
+                    results[record["custom_id"]] = {"text": None, "error": error.get("message", str(error)),
+                                                    "model": body.get("model"), "tokens_in": 0, "tokens_out": 0}
+                    continue
+                usage = body.get("usage") or {}
+                results[record["custom_id"]] = {"text": body["choices"][0]["message"]["content"], "error": None,
+                                                "model": body.get("model"), "tokens_in": usage.get("prompt_tokens", 0),
+                                                "tokens_out": usage.get("completion_tokens", 0)}
+        return results
+
+    def cancel_batch(self, batch_id):
+        self.client.batches.cancel(batch_id)
+
+
+class AnthropicChatProvider(ChatProvider):
+    def __init__(self, api_key=None):
+        import anthropic
+        self.client = anthropic.Anthropic(api_key=api_key or os.getenv("CLAUDE_API_KEY"))
+
+    def _kwargs(self, messages, model, max_tokens, temperature):
+        system = "\n".join(m["content"] for m in messages if m["role"] == "system")
+        kwargs = {
+            "model": model,
+            "max_tokens": max_tokens or 4096,
+            "messages": [m for m in messages if m["role"] != "system"],
+        }
+        if system:
+            kwargs["system"] = system
+        if temperature is not None:
+            kwargs["temperature"] = temperature
+        return kwargs
+
+    def complete(self, messages, model, max_tokens=None, temperature=None, **options):
+        return "".join(self.stream(messages, model, max_tokens, temperature))
+
+    def stream(self, messages, model, max_tokens=None, temperature=None, **options):
+        # Long generations must stream on Anthropic, so complete() is built on this too
+        stream = self.client.messages.create(stream=True, **self._kwargs(messages, model, max_tokens, temperature))
+        for event in stream:
+            if hasattr(event, "delta") and hasattr(event.delta, "text"):
+                yield event.delta.text
+
+
+class TavilySearchProvider(SearchProvider):
+    def __init__(self, api_key=None):
+        from tavily import TavilyClient
+        self.client = TavilyClient(api_key=api_key or os.getenv("TAVILY_API_KEY"))
+
+    def search(self, query, **kwargs):
+        return self.client.search(query=query, **kwargs)
+
+    def extract(self, urls, **kwargs):
+        return self.client.extract(urls=urls, **kwargs)
+
+
+class RecordingChatProvider(ChatProvider):
+    """Wraps a live provider and appends every request/response pair to a JSON lines file."""
+
+    def __init__(self, inner, record_path):
+        self.inner = inner
+        self.record_path = record_path
+        self._lock = threading.Lock()
+        self._batches = {}  # batch id -> requests, so results can be recorded against their messages
+
+    def _record(self, messages, model, text):
+        with self._lock, open(self.record_path, "a", encoding="utf-8") as f:
+            f.write(json.dumps({"key": request_key(model, messages), "model": model, "response": text}) + "\n")
+
+    def complete(self, messages, model, max_tokens=None, temperature=None, **options):
+        text = self.inner.complete(messages, model, max_tokens, temperature, **options)
+        self._record(messages, model, text)
+        return text
+
+    def stream(self, messages, model, max_tokens=None, temperature=None, **options):
+        parts = []
+        for delta in self.inner.stream(messages, model, max_tokens, temperature, **options):
+            parts.append(delta)
+            yield delta
+        self._record(messages, model, "".join(parts))
+
+    def submit_batch(self, requests):
+        batch_id = self.inner.submit_batch(requests)
+        self._batches[batch_id] = {r["custom_id"]: r for r in requests}
+        return batch_id
+
+    def batch_status(self, batch_id):
+        return self.inner.batch_status(batch_id)
+
+    def batch_results(self, batch_id):
+        results = self.inner.batch_results(batch_id)
+        for custom_id, request in self._batches.pop(batch_id, {}).items():
+            result = results.get(custom_id)
+            if result and result["text"] is not None:
+                self._record(request["messages"], request["model"], result["text"])
+        return results
+
+    def cancel_batch(self, batch_id):
+        return self.inner.cancel_batch(batch_id)
+
+
+# === Local Stand-in ===
+class LocalProvider(ChatProvider, SearchProvider):
+    """
+    Offline replacement for OpenAI, Anthropic and Tavily. Replays recorded responses when a request
+    matches a recording, otherwise synthesizes a deterministic reply built from the prompt's words.
+    Latency, token throughput and error rate are configurable to model the real services.
+    """
+
+    def __init__(self, recordings_path=LOCAL_RECORDINGS, latency=LOCAL_LATENCY,
+                 tokens_per_second=LOCAL_TOKENS_PER_SECOND, error_rate=LOCAL_ERROR_RATE,
+                 output_tokens=LOCAL_OUTPUT_TOKENS, batch_latency=LOCAL_BATCH_LATENCY, seed=0):
+        self.latency = latency
+        self.batch_latency = batch_latency
+        self.batches = {}
+        self.tokens_per_second = tokens_per_second
+        self.error_rate = error_rate
+        self.output_tokens = output_tokens
+        self.recordings = {}
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        if recordings_path and os.path.exists(recordings_path):
+            with open(recordings_path, "r", encoding="utf-8") as f:
+                for line in f:
+                    if line.strip():
+                        record = json.loads(line)
+                        self.recordings[record["key"]] = record["response"]
+
+    def _maybe_fail(self, what):
+        with self._lock:
+            roll = self._random.random()
+        if roll < self.error_rate:
+            raise ProviderError(f"Simulated {what} failure")
+
+    def _synthesize(self, messages, max_tokens):
+        prompt = messages[-1]["content"] if messages else ""
+        words = [w for w in prompt.split() if w.isalpha()] or ["content"]
+        target = min(max_tokens or self.output_tokens, self.output_tokens)
+        seed = int(hashlib.sha256(prompt.encode("utf-8")).hexdigest()[:8], 16)
+        rng = random.Random(seed)
+        lines, tokens, section = [], 0, 1
+        while tokens < target:
+            if tokens // 150 >= section - 1:
+                lines.append(f"## Section {section}: {' '.join(rng.choice(words) for _ in range(3)).title()}")
+                section += 1
+            sentence = " ".join(rng.choice(words) for _ in range(16)).capitalize() + "."
+            lines.append(sentence)
+            tokens += _approx_tokens(sentence)
+        return "\n".join(lines)
+
+    def _reply(self, messages, model, max_tokens):
+        return self.recordings.get(request_key(model, messages)) or self._synthesize(messages, max_tokens)
+
+    def complete(self, messages, model, max_tokens=None, temperature=None, **options):
+        return "".join(self.stream(messages, model, max_tokens, temperature, **options))
+
+    def stream(self, messages, model, max_tokens=None, temperature=None, **options):
+        self._maybe_fail("chat completion")
+        text = self._reply(messages, model, max_tokens)
+        time.sleep(self.latency)
+        # Emit in ~20-token pieces at the configured throughput
+        piece = 80
+        for i in range(0, len(text), piece):
+            delta = text[i:i + piece]
+            if self.tokens_per_second > 0:
+                time.sleep(_approx_tokens(delta) / self.tokens_per_second)
+            yield delta
+
+    def submit_batch(self, requests):
+        self._maybe_fail("batch submission")
+        batch_id = f"batch_local_{uuid.uuid4().hex[:12]}"
+        with self._lock:
+            self.batches[batch_id] = {"requests": list(requests), "submitted": time.time(),
+                                      "status": "in_progress", "results": None}
+        return batch_id
+
+    def _settle_batch(self, batch_id):
+        batch = self.batches[batch_id]
+        if batch["status"] == "in_progress" and time.time() - batch["submitted"] >= self.batch_latency:
+            # The whole batch completes at once; each request can still fail on its own
+            results = {}
+            for request in batch["requests"]:
+                try:
+                    self._maybe_fail("batch request")
+                    text = self._reply(request["messages"], request["model"], request.get("max_tokens"))
+                    results[request["custom_id"]] = {
+                        "text": text, "error": None, "model": request["model"], "tokens_in": sum(count_tokens(m["content"]) for m in request["messages"]),
+                        "tokens_out": count_tokens(text)}
+                except ProviderError as e:
+                    results[request["custom_id"]] = {"text": None, "error": str(e), "model": request["model"],
+                                                     "tokens_in": 0, "tokens_out": 0}
+            batch["results"], batch["status"] = results, "completed"
+        return batch
+
+    def batch_status(self, batch_id):
+        if batch_id not in self.batches:
+            raise ProviderError(f"Unknown batch: {batch_id}")
+        batch = self._settle_batch(batch_id)
+        results = batch["results"] or {}
+        return {"status": batch["status"], "total": len(batch["requests"]),
+                "completed": sum(1 for r in results.values() if r["error"] is None),
+                "failed": sum(1 for r in results.values() if r["error"] is not None)}
+
+    def batch_results(self, batch_id):
+        if batch_id not in self.batches:
+            raise ProviderError(f"Unknown batch: {batch_id}")
+        return dict(self._settle_batch(batch_id)["results"] or {})
+
+    def cancel_batch(self, batch_id):
+        if batch_id in self.batches and self.batches[batch_id]["status"] == "in_progress":
+            self.batches[batch_id]["status"] = "cancelled"
+
+    def search(self, query, max_results=5, include_domains=None, **kwargs):
+        self._maybe_fail("search")
+        time.sleep(self.latency)
+        domain = (include_domains or ["example.com"])[0]
+        slug = hashlib.sha256(query.encode("utf-8")).hexdigest()[:10]
+        # URL shapes the downstream fetchers can parse (video id / post id)
+        if domain == "youtube.com":
+            urls = [f"https://www.youtube.com/watch?v={slug}{i}" for i in range(max_results)]
+        elif domain == "reddit.com":
+            urls = [f"https://www.reddit.com/r/local/comments/{slug[:6]}{i}/post/" for i in range(max_results)]
+        else:
+            urls = [f"https://{domain}/local/{slug}/{i}" for i in range(max_results)]
+        results = [{"url": url, "title": f"Result {i + 1}"} for i, url in enumerate(urls)]
+        return {"results": results, "answer": f"Local stand-in answer for: {query[:80]}"}
+
+    def extract(self, urls, **kwargs):
+        self._maybe_fail("extract")
+        time.sleep(self.latency)
+        results = [{"url": url, "raw_content": self._synthesize([{"role": "user", "content": url + " web page content"}], None)}
+                   for url in urls]
+        return {"results": results, "failed_results": []}
+
+
+# === Tracing ===
+class TracedProvider(ChatProvider, SearchProvider):
+    """Records an llm.* / search.* span (latency, tokens, estimated cost) around every call."""
+
+    def __init__(self, inner, name):
+        self.inner = inner
+        self.name = name
+
+    def complete(self, messages, model, max_tokens=None, temperature=None, **options):
+        with metrics.span(f"llm.{self.name}", model=model, max_tokens=max_tokens) as s:
+            text = self.inner.complete(messages, model, max_tokens, temperature, **options)
+            s.record_llm(model, sum(count_tokens(m["content"]) for m in messages), count_tokens(text or ""))
+            return text
+
+    def stream(self, messages, model, max_tokens=None, temperature=None, **options):
+        # Timed by hand: a context-managed span must not stay open across yields
+        s = metrics.Span(f"llm.{self.name}", {"model": model, "max_tokens": max_tokens, "stream": True})
+        start = time.perf_counter()
+        first_token = None
+        parts = []
+        try:
+            for delta in self.inner.stream(messages, model, max_tokens, temperature, **options):
+                if first_token is None:
+                    first_token = time.perf_counter() - start
+                parts.append(delta)
+                yield delta
+        except Exception as e:
+            s.error = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            s.set(time_to_first_token_s=round(first_token or 0.0, 4))
+            s.record_llm(model, sum(count_tokens(m["content"]) for m in messages), count_tokens("".join(parts)))
+            metrics.finish_span(s, time.perf_counter() - start)
+
+    def submit_batch(self, requests):
+        with metrics.span(f"llm.{self.name}.batch_submit", requests=len(requests)) as s:
+            batch_id = self.inner.submit_batch(requests)
+            s.set(batch_id=batch_id)
+            return batch_id
+
+    def batch_status(self, batch_id):
+        return self.inner.batch_status(batch_id)
+
+    def batch_results(self, batch_id):
+        with metrics.span(f"llm.{self.name}.batch_results", batch_id=batch_id) as s:
+            results = self.inner.batch_results(batch_id)
+            s.set(results=len(results), failed=sum(1 for r in results.values() if r["error"] is not None))
+            for model in {r["model"] for r in results.values() if r["model"]}:
+                usage = [r for r in results.values() if r["model"] == model]
+                s.record_llm(model, sum(r["tokens_in"] for r in usage), sum(r["tokens_out"] for r in usage),
+                             metrics.BATCH_PRICE_FACTOR)
+            return results
+
+    def cancel_batch(self, batch_id):
+        return self.inner.cancel_batch(batch_id)
+
+    def search(self, query, **kwargs):
+        with metrics.span(f"search.{self.name}") as s:
+            response = self.inner.search(query, **kwargs)
+            s.set(results=len(response.get("results", [])))
+            return response
+
+    def extract(self, urls, **kwargs):
+        with metrics.span(f"extract.{self.name}", urls=len(urls)) as s:
+            response = self.inner.extract(urls, **kwargs)
+            s.set(failed=len(response.get("failed_results", [])))
+            return response
+
+
+# === Provider Lookup ===
+_providers = {}
+_providers_lock = threading.Lock()
+
+
+def _build(name):
+    if LLM_PROVIDER == "local":
+        return _providers.setdefault("local", LocalProvider())
+    if name == "openai":
+        provider = OpenAIChatProvider()
+    elif name == "anthropic":
+        provider = AnthropicChatProvider()
+    elif name == "tavily":
+        return TavilySearchProvider()
+    else:
+        raise ValueError(f"Unknown provider: {name}")
+    return RecordingChatProvider(provider, PROVIDER_RECORD_PATH) if PROVIDER_RECORD_PATH else provider
+
+
+def get_chat_provider(name="openai"):
+    """Chat provider for "openai" or "anthropic" (the local stand-in when LLM_PROVIDER=local)."""
+    with _providers_lock:
+        if name not in _providers:
+            _providers[name] = _build(name)
+        return TracedProvider(_providers[name], name)
+
+
+def get_search_provider():
+    """Search/extract provider (Tavily, or the local stand-in when LLM_PROVIDER=local)."""
+    return get_chat_provider("tavily")
+
+
+def set_provider(name, provider):
+    """Override a provider in-process, e.g. a LocalProvider with custom latency in benchmarks."""
+    with _providers_lock:
+        _providers[name] = provider
+
+
+def use_local_provider(**settings):
+    """Route every provider name to one LocalProvider configured with settings."""
+    global LLM_PROVIDER
+    LLM_PROVIDER = "local"
+    local = LocalProvider(**settings)
+    for name in ("local", "openai", "anthropic", "tavily"):
+        set_provider(name, local)
+    return local
@@ -2,6 +2,7 @@ import praw
 import re
 from docx import Document
 import os
+from metrics import traced
 # Reddit API setup
 reddit = praw.Reddit(
     client_id="neOh9sh9KTbFdYAD8EhXyA",
@@ -18,7 +19,8 @@ def extract_post_id(url):
     match = re.search(r'/comments/([a-z0-9]+)/', url)
     return match.group(1) if match else None
 
-def main(urls):
+@traced("fetch.reddit")
+def main(urls, output_path=os.path.join("data", "reddit_combined_text.docx")):
     """Main function to process Reddit URLs"""
     print("📥 Fetching Reddit posts and comments...")
 
@@ -40,6 +42,5 @@ def main(urls):
             for comment in submission.comments.list():
                 doc.add_paragraph(f"[Comment] {comment.body}", style='Intense Quote')
 
-    output_path = os.path.join("data", "reddit_combined_text.docx")
     doc.save(output_path)
     print(f"✅ Reddit post content and comments saved to '{output_path}'")
\ No newline at end of file
@@ -0,0 +1,50 @@
+import os
+import hashlib
+import tempfile
+
+# === Configuration ===
+CACHE_DIR = os.getenv("SUMMARY_CACHE_DIR", os.path.join("cache", "summaries"))
+
+
+# === Content-Addressed Summary Cache ===
+class PartialSummary(str):
+    """A summary missing part of its source (a failed transcription, window or chunk): returned, never cached."""
+    partial = True
+
+
+def is_partial(summary):
+    return getattr(summary, "partial", False)
+
+
+def cache_key(*parts):
+    """Build a cache key from a content hash plus whatever else changes the output (kind, model, ...)."""
+    return hashlib.sha256("|".join(str(p) for p in parts).encode("utf-8")).hexdigest()
+
+
+def _cache_path(key):
+    return os.path.join(CACHE_DIR, key[:2], f"{key}.md")
+
+
+def get_cached_summary(key):
+    path = _cache_path(key)
+    if not os.path.exists(path):
+        return None
+    with open(path, "r", encoding="utf-8") as f:
+        return f.read()
+
+
+def put_cached_summary(key, summary):
+    if not summary or is_partial(summary):
+        return
+    path = _cache_path(key)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    # A temp file of its own per writer: workers caching the same key at once must not share one
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix=f".{key[:12]}-", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write(summary)
+        os.replace(tmp_path, path)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
@@ -4,6 +4,7 @@ from docx import Document
 from openai import OpenAI
 import re
 from docx.enum.text import WD_PARAGRAPH_ALIGNMENT
+import docx_reader
 
 # === Set your OpenAI API key ===
 openai_api_key = os.getenv("OPENAI_API_KEY")
@@ -28,9 +29,7 @@ def get_gpt_response(prompt, model="gpt-4.1-mini"):
 
 # === Load .docx content ===
 def load_docx_text(docx_path):
-    doc = Document(docx_path)
-    full_text = [para.text.strip() for para in doc.paragraphs if para.text.strip()]
-    return "\n".join(full_text)
+    return "\n".join(p.strip() for p in docx_reader.iter_paragraphs(docx_path) if p.strip())
 
 # === Save response to .docx ===
 def save_to_docx(text, filename):
@@ -0,0 +1,16 @@
+import os
+import sys
+
+import pytest
+
+# The app is a set of top-level modules run from the repo root; make them importable from tests/
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture(autouse=True)
+def metrics_log(tmp_path, monkeypatch):
+    """Spans recorded by the code under test go to a per-test log, not the app's logs/metrics.jsonl."""
+    import metrics
+    path = str(tmp_path / "metrics.jsonl")
+    monkeypatch.setattr(metrics, "METRICS_LOG", path)
+    return path
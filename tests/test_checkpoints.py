@@ -0,0 +1,72 @@
+import checkpoints
+
+
+def _writer(path, text, calls):
+    def write():
+        calls.append(path)
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(text)
+    return write
+
+
+def test_stage_is_skipped_when_inputs_and_outputs_are_unchanged(tmp_path):
+    out, calls = str(tmp_path / "out.txt"), []
+    kwargs = dict(outputs=[out], checkpoint_dir=str(tmp_path / "cp"))
+
+    assert checkpoints.run_stage("fetch", _writer(out, "a", calls), {"q": 1}, **kwargs)
+    assert not checkpoints.run_stage("fetch", _writer(out, "a", calls), {"q": 1}, **kwargs)
+    assert len(calls) == 1
+
+
+def test_stage_reruns_when_inputs_change(tmp_path):
+    out, calls = str(tmp_path / "out.txt"), []
+    kwargs = dict(outputs=[out], checkpoint_dir=str(tmp_path / "cp"))
+
+    checkpoints.run_stage("fetch", _writer(out, "a", calls), {"q": 1}, **kwargs)
+    assert checkpoints.run_stage("fetch", _writer(out, "a", calls), {"q": 2}, **kwargs)
+    assert len(calls) == 2
+
+
+def test_stage_reruns_when_an_input_file_changes(tmp_path):
+    source, out, calls = tmp_path / "in.txt", str(tmp_path / "out.txt"), []
+    source.write_text("v1")
+    kwargs = dict(input_files=[str(source)], outputs=[out], checkpoint_dir=str(tmp_path / "cp"))
+
+    checkpoints.run_stage("merge", _writer(out, "a", calls), {}, **kwargs)
+    source.write_text("v2")
+    assert checkpoints.run_stage("merge", _writer(out, "a", calls), {}, **kwargs)
+
+
+def test_stage_reruns_when_its_output_was_edited_or_removed(tmp_path):
+    out, calls = tmp_path / "out.txt", []
+    kwargs = dict(outputs=[str(out)], checkpoint_dir=str(tmp_path / "cp"))
+
+    checkpoints.run_stage("plan", _writer(str(out), "a", calls), {}, **kwargs)
+    out.write_text("edited")
+    assert checkpoints.run_stage("plan", _writer(str(out), "a", calls), {}, **kwargs)
+    out.unlink()
+    assert checkpoints.run_stage("plan", _writer(str(out), "a", calls), {}, **kwargs)
+    assert len(calls) == 3
+
+
+def test_stage_without_its_outputs_is_not_checkpointed(tmp_path):
+    cp = str(tmp_path / "cp")
+    out = str(tmp_path / "never.txt")
+
+    assert checkpoints.run_stage("fetch", lambda: None, {}, outputs=[out], checkpoint_dir=cp)
+    assert checkpoints.load_checkpoint("fetch", cp) is None
+    assert checkpoints.run_stage("fetch", lambda: None, {}, outputs=[out], checkpoint_dir=cp)
+
+
+def test_force_runs_a_current_stage(tmp_path):
+    out, calls = str(tmp_path / "out.txt"), []
+    kwargs = dict(outputs=[out], checkpoint_dir=str(tmp_path / "cp"))
+
+    checkpoints.run_stage("fetch", _writer(out, "a", calls), {}, **kwargs)
+    assert checkpoints.run_stage("fetch", _writer(out, "a", calls), {}, force=True, **kwargs)
+    assert len(calls) == 2
+
+
+def test_fingerprint_ignores_key_order_but_not_values():
+    assert checkpoints.fingerprint({"a": 1, "b": 2}) == checkpoints.fingerprint({"b": 2, "a": 1})
+    assert checkpoints.fingerprint({"a": 1}) != checkpoints.fingerprint({"a": 2})
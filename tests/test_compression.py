@@ -0,0 +1,77 @@
+import pytest
+
+pytest.importorskip("numpy")
+
+import compression
+
+ON_TOPIC = [
+    "The critical path sets the project schedule.",
+    "Schedule risk grows when the critical path slips.",
+    "Earned value compares the schedule baseline to actual progress.",
+    "A baseline schedule anchors earned value and critical path analysis.",
+]
+OFF_TOPIC = "My cat enjoys sunny windowsills."
+
+
+@pytest.fixture(autouse=True)
+def word_tokens(monkeypatch):
+    monkeypatch.setattr(compression, "count_tokens", lambda text: len(text.split()))
+
+
+def test_split_sentences_on_punctuation_and_paragraphs():
+    text = "First one. Second one!\n\nThird without end"
+    assert compression.split_sentences(text) == ["First one.", "Second one!", "Third without end"]
+
+
+def test_unpunctuated_captions_become_word_groups():
+    words = [f"w{i}" for i in range(compression.PSEUDO_SENTENCE_WORDS * 4)]
+    sentences = compression.split_sentences(" ".join(words))
+
+    assert len(sentences) == 4
+    assert all(len(s.split()) == compression.PSEUDO_SENTENCE_WORDS for s in sentences)
+
+
+def test_compress_drops_the_least_central_sentence_and_keeps_order():
+    text = " ".join(ON_TOPIC[:2] + [OFF_TOPIC] + ON_TOPIC[2:])
+    on_topic_tokens = len(" ".join(ON_TOPIC).split())
+    compressed, stats = compression.compress(text, ratio=1.0, max_tokens=on_topic_tokens)
+
+    assert compressed == " ".join(ON_TOPIC)
+    assert stats["tokens_after"] == on_topic_tokens
+    assert (stats["sentences"], stats["kept"]) == (5, 4)
+
+
+def test_compress_respects_max_tokens():
+    compressed, stats = compression.compress(" ".join(ON_TOPIC), ratio=1.0, max_tokens=10)
+    assert stats["tokens_after"] <= 10
+    assert len(compressed.split()) == stats["tokens_after"]
+
+
+def test_rank_sentences_scores_every_sentence_across_blocks(monkeypatch):
+    monkeypatch.setattr(compression, "BLOCK_SENTENCES", 3)
+    scores = compression.rank_sentences(ON_TOPIC * 2)
+    assert len(scores) == 8 and (scores > 0).all()
+
+
+def test_compress_source_leaves_text_alone_when_disabled_or_short(monkeypatch):
+    text = " ".join(ON_TOPIC * 50)
+    monkeypatch.setattr(compression, "COMPRESSION_ENABLED", False)
+    assert compression.compress_source(text) == text
+
+    monkeypatch.setattr(compression, "COMPRESSION_ENABLED", True)
+    monkeypatch.setattr(compression, "COMPRESSION_MIN_TOKENS", len(text.split()) + 1)
+    assert compression.compress_source(text) == text
+
+    monkeypatch.setattr(compression, "COMPRESSION_MIN_TOKENS", 10)
+    assert len(compression.compress_source(text, ratio=0.5).split()) <= len(text.split()) / 2
+
+
+def test_compress_source_keeps_a_floor_of_min_tokens(monkeypatch):
+    text = " ".join(ON_TOPIC * 10)
+    floor = len(" ".join(ON_TOPIC * 3).split())
+    monkeypatch.setattr(compression, "COMPRESSION_ENABLED", True)
+    monkeypatch.setattr(compression, "COMPRESSION_MIN_TOKENS", floor)
+
+    longest = max(len(s.split()) for s in ON_TOPIC)
+    # Whole sentences only, so the floor is met to within one sentence rather than 5% of the text
+    assert floor - longest < len(compression.compress_source(text, ratio=0.05).split()) <= floor
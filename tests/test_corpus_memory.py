@@ -0,0 +1,23 @@
+import pytest
+
+pytest.importorskip("tiktoken")
+pytest.importorskip("docx")
+
+import benchmark
+
+# Small enough to run with the unit tests, large enough that loading the whole corpus would show:
+# the largest corpus holds 12 MB more text than the smallest.
+CORPUS_SIZES_MB = [4, 16]
+TOLERANCE_MB = 16.0  # the benchmark default; loading the whole corpus grows by ~10x the text added
+
+
+def test_streaming_corpus_peak_rss_stays_flat_as_corpus_grows():
+    report = benchmark.bench_corpus(CORPUS_SIZES_MB, TOLERANCE_MB)
+
+    assert not [run for run in report["runs"] if "error" in run]
+    assert report["flat"]
+    streaming = {r["corpus_mb"]: r for r in report["runs"] if r["mode"] == "streaming"}
+    whole = {r["corpus_mb"]: r for r in report["runs"] if r["mode"] == "load_all_text"}
+    largest = CORPUS_SIZES_MB[-1]
+    assert streaming[largest]["chunks"] > streaming[CORPUS_SIZES_MB[0]]["chunks"]
+    assert streaming[largest]["growth_mb"] < whole[largest]["growth_mb"]
@@ -0,0 +1,83 @@
+import time
+import threading
+
+import pytest
+
+from dag import DAG
+
+
+def _fail(inputs):
+    raise RuntimeError("boom")
+
+
+def test_nodes_receive_their_dependencies_results():
+    graph = DAG()
+    graph.add("a", lambda inputs: 1)
+    graph.add("b", lambda inputs: 2)
+    graph.add("sum", lambda inputs: inputs["a"] + inputs["b"], requires=["a", "b"])
+
+    report = graph.run()
+    assert report["sum"] == dict(report["sum"], status="done", result=3, error=None)
+
+
+def test_independent_nodes_run_concurrently():
+    barrier = threading.Barrier(3, timeout=5)
+    graph = DAG()
+    for name in ("youtube", "reddit", "web"):
+        graph.add(name, lambda inputs: barrier.wait())
+
+    report = graph.run()
+    assert all(r["status"] == "done" for r in report.values())
+
+
+def test_a_failed_requirement_skips_its_dependents_but_not_after_ones():
+    graph = DAG()
+    graph.add("fetch", _fail)
+    graph.add("merge", lambda inputs: "merged", requires=["fetch"])
+    graph.add("plan", lambda inputs: sorted(inputs), after=["merge"])
+
+    report = graph.run()
+    assert report["fetch"]["status"] == "failed"
+    assert report["fetch"]["error"] == "RuntimeError: boom"
+    assert report["merge"]["status"] == "skipped"
+    assert report["plan"] == dict(report["plan"], status="done", result=[])
+
+
+def test_nodes_unblocked_by_a_skip_do_not_wait_for_running_nodes():
+    graph = DAG()
+    graph.add("slow", lambda inputs: time.sleep(1))
+    # Added before "merge", so it is only found ready by a second scan after "merge" is skipped
+    graph.add("plan", lambda inputs: None, after=["merge"])
+    graph.add("fetch", _fail)
+    graph.add("merge", lambda inputs: None, requires=["fetch"])
+
+    report = graph.run()
+    assert report["plan"]["status"] == "done"
+    assert report["plan"]["start_s"] < 0.5
+
+
+def test_on_done_is_called_once_per_node():
+    settled = []
+    graph = DAG()
+    graph.add("a", lambda inputs: 1)
+    graph.add("b", _fail, requires=["a"])
+    graph.add("c", lambda inputs: 3, requires=["b"])
+
+    graph.run(on_done=lambda name, record: settled.append((name, record["status"])))
+    assert settled == [("a", "done"), ("b", "failed"), ("c", "skipped")]
+
+
+def test_validate_rejects_unknown_dependencies_cycles_and_duplicates():
+    graph = DAG()
+    graph.add("a", lambda inputs: None, requires=["missing"])
+    with pytest.raises(ValueError, match="unknown"):
+        graph.validate()
+
+    graph = DAG()
+    graph.add("a", lambda inputs: None, requires=["b"])
+    graph.add("b", lambda inputs: None, after=["a"])
+    with pytest.raises(ValueError, match="Cycle"):
+        graph.run()
+
+    with pytest.raises(ValueError, match="Duplicate"):
+        graph.add("a", lambda inputs: None)
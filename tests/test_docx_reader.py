@@ -0,0 +1,60 @@
+import io
+
+import pytest
+
+docx = pytest.importorskip("docx")
+
+import docx_reader
+
+
+@pytest.fixture
+def sample(tmp_path):
+    document = docx.Document()
+    document.add_heading("Exam Guide", level=1)
+    document.add_paragraph("First paragraph.")
+    document.add_paragraph("")
+    run = document.add_paragraph("Before tab").add_run()
+    run.add_tab()
+    run.add_text("after tab")
+    run.add_break()
+    run.add_text("next line")
+    table = document.add_table(rows=1, cols=2)
+    table.cell(0, 0).text = "cell one"
+    table.cell(0, 1).text = "cell two"
+    document.add_paragraph("Last paragraph.")
+    path = tmp_path / "sample.docx"
+    document.save(path)
+    return path
+
+
+def test_paragraphs_match_python_docx(sample):
+    expected = [p.text for p in docx.Document(sample).paragraphs]
+    assert list(docx_reader.iter_paragraphs(str(sample))) == expected
+
+
+def test_tables_are_included_only_when_asked(sample):
+    body = list(docx_reader.iter_paragraphs(str(sample)))
+    everything = list(docx_reader.iter_paragraphs(str(sample), include_tables=True))
+
+    assert "cell one" not in body
+    assert ["cell one", "cell two"] == [p for p in everything if p.startswith("cell")]
+
+
+def test_read_text_drops_blank_paragraphs_unless_asked(sample):
+    text = docx_reader.read_text(str(sample))
+
+    assert text.splitlines()[:2] == ["Exam Guide", "First paragraph."]
+    assert "\t" in text
+    assert docx_reader.read_text(str(sample), skip_empty=False).count("\n") > text.count("\n")
+
+
+def test_reads_bytes_and_file_objects(sample):
+    data = sample.read_bytes()
+    expected = docx_reader.read_text(str(sample))
+
+    assert docx_reader.read_text(data) == expected
+    assert docx_reader.read_text(memoryview(data)) == expected
+    with open(sample, "rb") as f:
+        f.read(10)  # a partly read upload is rewound first
+        assert docx_reader.read_text(f) == expected
+    assert docx_reader.read_text(io.BytesIO(data)) == expected
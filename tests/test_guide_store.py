@@ -0,0 +1,105 @@
+import threading
+
+import pytest
+
+import guide_store
+
+
+@pytest.fixture
+def paths(tmp_path):
+    (tmp_path / "outputs").mkdir()
+    return {"guide": str(tmp_path / "outputs" / "guide.json")}
+
+
+def test_split_and_join_sections_round_trip():
+    text = "Intro line.\n\n## Scope\n\nScope notes.\n\n## Schedule\n\nCritical path."
+    sections = guide_store.split_sections(text)
+
+    assert sections == [{"title": "", "body": "Intro line."},
+                        {"title": "Scope", "body": "Scope notes."},
+                        {"title": "Schedule", "body": "Critical path."}]
+    assert guide_store.join_sections(sections) == text
+
+
+def test_text_without_headings_is_one_section():
+    assert guide_store.split_sections("Just text.") == [{"title": "", "body": "Just text."}]
+    assert guide_store.split_sections("  ") == []
+
+
+def test_update_guide_saves_on_success_only(paths):
+    with guide_store.update_guide(paths) as guide:
+        guide["sections"] = [{"title": "Scope", "body": "v1"}]
+    with pytest.raises(RuntimeError):
+        with guide_store.update_guide(paths) as guide:
+            guide["sections"] = []
+            raise RuntimeError("merge failed")
+
+    saved = guide_store.load_guide(paths)
+    assert saved["sections"] == [{"title": "Scope", "body": "v1"}]
+    assert saved["updated_at"]
+
+
+def test_concurrent_updates_are_not_lost(paths):
+    def add_one():
+        with guide_store.update_guide(paths) as guide:
+            guide["sources"][f"s{len(guide['sources'])}"] = {}
+
+    threads = [threading.Thread(target=add_one) for _ in range(20)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert len(guide_store.load_guide(paths)["sources"]) == 20
+
+
+def test_clear_guide_and_missing_or_corrupt_guides(paths):
+    assert guide_store.load_guide(paths) == guide_store.empty_guide()
+    with guide_store.update_guide(paths) as guide:
+        guide["sections"] = [{"title": "", "body": "x"}]
+    guide_store.clear_guide(paths)
+    assert guide_store.load_guide(paths) == guide_store.empty_guide()
+
+    with open(paths["guide"], "w", encoding="utf-8") as f:
+        f.write("{not json")
+    assert guide_store.load_guide(paths) == guide_store.empty_guide()
+
+
+def test_sources_are_keyed_by_content():
+    upload = {"name": "a.pdf", "path": "/ws/uploads/a.pdf", "sha256": "abc"}
+    reupload = {"name": "a (1).pdf", "path": "/ws/uploads/a_1.pdf", "sha256": "abc"}
+
+    assert guide_store.source_id("document", upload) == guide_store.source_id("document", reupload)
+    assert guide_store.source_id("video", {"path": "/ws/v.mp4"}) == "video:/ws/v.mp4"
+    assert guide_store.source_id("youtube", "https://youtu.be/x") == "youtube:https://youtu.be/x"
+
+
+def test_new_sources_and_stored_summaries():
+    guide = guide_store.empty_guide()
+    guide_store.record_sources(guide, {"document:abc": guide_store.source_record("a.pdf", "document", "old", "quick")})
+    sources = {"document:abc": guide_store.source_record("a.pdf", "document", "new", "quick"),
+               "youtube:u": guide_store.source_record("u", "youtube", "video", "quick")}
+
+    assert list(guide_store.new_sources(guide, sources)) == ["youtube:u"]
+    assert guide_store.stored_summary(guide, "document:abc", "quick") == "old"
+    assert guide_store.stored_summary(guide, "document:abc", "exhaustive") is None
+    guide_store.record_sources(guide, sources)
+    assert guide_store.stored_summary(guide, "document:abc", "quick") == "new"
+
+
+def test_partial_summaries_are_not_reused():
+    from summary_cache import PartialSummary
+
+    guide = guide_store.empty_guide()
+    guide_store.record_sources(guide, {"youtube:u": guide_store.source_record("u", "youtube", PartialSummary("half"), "quick")})
+    assert guide_store.stored_summary(guide, "youtube:u", "quick") is None
+
+
+def test_summary_sources_sidecar(tmp_path):
+    summary_path = str(tmp_path / "merged_summary_1.docx")
+    sources = {"youtube:u": guide_store.source_record("u", "youtube", "text")}
+
+    assert guide_store.load_summary_sources(summary_path) == {}
+    assert guide_store.load_summary_sources("") == {}
+    guide_store.save_summary_sources(summary_path, sources)
+    assert guide_store.summary_sources_path(summary_path) == str(tmp_path / "merged_summary_1.sources.json")
+    assert guide_store.load_summary_sources(summary_path) == sources
@@ -0,0 +1,62 @@
+import io
+import os
+import json
+import hashlib
+import threading
+
+import ingest
+
+
+def test_save_upload_streams_content_and_records_its_hash(tmp_path):
+    data = b"exam notes " * 1000
+    saved = ingest.save_upload(io.BytesIO(data), str(tmp_path), "notes.pdf", chunk_size=64)
+
+    assert saved["duplicate"] is False
+    assert saved["size"] == len(data)
+    assert saved["sha256"] == hashlib.sha256(data).hexdigest()
+    with open(saved["path"], "rb") as f:
+        assert f.read() == data
+    assert ingest.find_by_hash(str(tmp_path), saved["sha256"]) == saved["path"]
+
+
+def test_identical_content_is_stored_once(tmp_path):
+    first = ingest.save_upload(io.BytesIO(b"same"), str(tmp_path), "a.pdf")
+    second = ingest.save_upload(io.BytesIO(b"same"), str(tmp_path), "b.pdf")
+
+    assert second["duplicate"] is True
+    assert second["path"] == first["path"]
+    assert not os.path.exists(tmp_path / "b.pdf")
+
+
+def test_same_name_with_different_content_keeps_both(tmp_path):
+    first = ingest.save_upload(io.BytesIO(b"one"), str(tmp_path), "a.pdf")
+    second = ingest.save_upload(io.BytesIO(b"two"), str(tmp_path), "a.pdf")
+
+    assert second["path"] != first["path"]
+    assert os.path.basename(second["path"]) == f"a_{second['sha256'][:8]}.pdf"
+
+
+def test_no_temporary_files_are_left_behind(tmp_path):
+    ingest.save_upload(io.BytesIO(b"one"), str(tmp_path), "a.pdf")
+    ingest.save_upload(io.BytesIO(b"one"), str(tmp_path), "b.pdf")
+
+    assert not [name for name in os.listdir(tmp_path) if name.startswith(".upload-") or name.endswith(".tmp")]
+
+
+def test_concurrent_uploads_keep_every_index_entry(tmp_path):
+    threads = [threading.Thread(target=ingest.save_upload, args=(io.BytesIO(b"file %d" % (i % 8)), str(tmp_path), f"f{i}.pdf"))
+               for i in range(32)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    with open(tmp_path / ingest.INDEX_FILENAME, encoding="utf-8") as f:
+        index = json.load(f)
+    assert len(index) == 8
+    assert len([name for name in os.listdir(tmp_path) if name.endswith(".pdf")]) == 8
+
+
+def test_hash_file_matches_save_upload(tmp_path):
+    saved = ingest.save_upload(io.BytesIO(b"x" * 5000), str(tmp_path), "a.pdf")
+    assert ingest.hash_file(saved["path"], chunk_size=100) == saved["sha256"]
@@ -0,0 +1,88 @@
+import time
+import sqlite3
+import subprocess
+import sys
+
+import pytest
+
+import job_queue
+
+
+@pytest.fixture
+def db(tmp_path):
+    path = str(tmp_path / "jobs.db")
+    job_queue.init_db(path)
+    return path
+
+
+def _claim(db, pid=None, heartbeat=None):
+    conn = job_queue._connect(db)
+    job = job_queue._claim_next_job(conn, "worker-1")
+    if pid is not None or heartbeat is not None:
+        conn.execute("UPDATE jobs SET worker_pid = COALESCE(?, worker_pid), heartbeat = COALESCE(?, heartbeat) "
+                     "WHERE id = ?", (pid, heartbeat, job["id"]))
+    conn.close()
+    return job
+
+
+def _dead_pid():
+    process = subprocess.Popen([sys.executable, "-c", "pass"])
+    process.wait()
+    return process.pid
+
+
+def test_claim_records_the_worker_pid_and_attempt(db):
+    job_id = job_queue.submit_job("summary", {}, db_path=db)
+    _claim(db)
+
+    job = job_queue.get_job(job_id, db_path=db)
+    assert (job["status"], job["attempts"]) == ("running", 1)
+    assert job["worker_pid"] == job_queue.os.getpid()
+
+
+def test_live_jobs_are_left_running(db):
+    job_id = job_queue.submit_job("summary", {}, db_path=db)
+    _claim(db)
+
+    assert job_queue.requeue_stale_jobs(db) == 0
+    assert job_queue.get_job(job_id, db_path=db)["status"] == "running"
+
+
+def test_jobs_of_an_exited_worker_are_requeued_at_once(db):
+    job_id = job_queue.submit_job("summary", {}, db_path=db)
+    _claim(db, pid=_dead_pid())
+
+    assert job_queue.requeue_stale_jobs(db) == 1
+    job = job_queue.get_job(job_id, db_path=db)
+    assert (job["status"], job["worker_pid"]) == ("queued", None)
+
+
+def test_jobs_without_a_recent_heartbeat_are_requeued(db):
+    job_id = job_queue.submit_job("summary", {}, db_path=db)
+    _claim(db, heartbeat=time.time() - job_queue.STALE_AFTER - 1)
+
+    assert job_queue.requeue_stale_jobs(db) == 1
+    assert job_queue.get_job(job_id, db_path=db)["status"] == "queued"
+
+
+def test_a_job_that_keeps_losing_its_worker_fails(db):
+    job_id = job_queue.submit_job("summary", {}, db_path=db)
+    for _ in range(job_queue.MAX_JOB_ATTEMPTS):
+        _claim(db, pid=_dead_pid())
+        job_queue.requeue_stale_jobs(db)
+
+    job = job_queue.get_job(job_id, db_path=db)
+    assert job["status"] == "failed"
+    assert "Worker lost" in job["error"]
+
+
+def test_init_db_adds_new_columns_to_an_existing_database(tmp_path):
+    path = str(tmp_path / "old.db")
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE jobs (id TEXT PRIMARY KEY, kind TEXT NOT NULL, params TEXT NOT NULL, status TEXT NOT NULL, "
+                 "progress REAL NOT NULL DEFAULT 0, message TEXT NOT NULL DEFAULT '', result TEXT, error TEXT, "
+                 "worker TEXT, created_at TEXT NOT NULL, started_at TEXT, finished_at TEXT, heartbeat REAL)")
+    conn.close()
+
+    job_id = job_queue.submit_job("summary", {}, db_path=path)
+    assert job_queue.get_job(job_id, db_path=path)["attempts"] == 0
@@ -0,0 +1,62 @@
+import pytest
+
+import model_router
+from model_router import choose_model
+
+
+@pytest.fixture(autouse=True)
+def cascade(monkeypatch):
+    # The opt-in cascade: two models per role
+    monkeypatch.setitem(model_router.LADDERS, "map", "gpt-4.1-nano,gpt-4.1-mini")
+    monkeypatch.setitem(model_router.LADDERS, "reduce", "gpt-4.1-mini,gpt-4.1")
+    monkeypatch.setitem(model_router.LADDERS, "plan", "claude-sonnet-4-20250514,claude-opus-4-20250514")
+
+
+def test_map_stages_use_the_cheapest_model():
+    route = choose_model("document.chunk", 5_000, 1_000, max_cost=0, max_latency=0)
+    assert (route.model, route.reason) == ("gpt-4.1-nano", "cheapest that fits")
+
+
+def test_long_map_inputs_escalate_one_step():
+    route = choose_model("gpt.chunk", model_router.MAP_ESCALATE_TOKENS + 1, 1_000, max_cost=0, max_latency=0)
+    assert (route.model, route.reason) == ("gpt-4.1-mini", "long input, escalated")
+
+
+def test_reduce_and_plan_stages_use_the_strongest_model_without_a_budget():
+    assert choose_model("reformat", 20_000, 4_000, max_cost=0, max_latency=0).model == "gpt-4.1"
+    assert choose_model("claude.plan", 20_000, 4_000, max_cost=0, max_latency=0).model == "claude-opus-4-20250514"
+
+
+def test_reduce_steps_down_to_stay_within_the_cost_budget():
+    strong = choose_model("reformat", 50_000, 4_000, max_cost=0, max_latency=0)
+    route = choose_model("reformat", 50_000, 4_000, max_cost=strong.est_cost / 2, max_latency=0)
+    assert (route.model, route.reason) == ("gpt-4.1-mini", "strongest within budget")
+
+
+def test_over_budget_falls_back_to_the_cheapest_that_fits():
+    route = choose_model("reformat", 50_000, 4_000, max_cost=1e-9, max_latency=0)
+    assert (route.model, route.reason) == ("gpt-4.1-mini", "over budget; cheapest that fits")
+
+
+def test_models_whose_context_is_too_small_are_skipped():
+    route = choose_model("claude.plan", 300_000, 4_000, max_cost=0, max_latency=0)
+    assert route.reason == "no model fits; largest context"
+    assert choose_model("video.merge", 300_000, 4_000, max_cost=0, max_latency=0).model == "gpt-4.1"
+
+
+def test_unknown_stages_are_routed_as_map():
+    assert choose_model("something.new", 1_000, max_cost=0, max_latency=0).model == "gpt-4.1-nano"
+
+
+def test_explicit_model_always_wins():
+    messages = [{"role": "user", "content": "summarize"}]
+    assert model_router.route("reformat", messages, model="gpt-5").model == "gpt-5"
+
+
+def test_disabled_router_uses_each_roles_previous_default(monkeypatch):
+    monkeypatch.setattr(model_router, "ROUTER_ENABLED", False)
+    messages = [{"role": "user", "content": "summarize"}]
+
+    assert model_router.route("document.chunk", messages).model == model_router.ROLE_DEFAULTS["map"]
+    assert model_router.route("reformat", messages).model == model_router.ROLE_DEFAULTS["reduce"]
+    assert model_router.route("claude.plan", messages).model == model_router.ROLE_DEFAULTS["plan"]
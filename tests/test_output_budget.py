@@ -0,0 +1,89 @@
+import contextvars
+
+import pytest
+
+import output_budget
+
+
+def test_default_mode_is_exhaustive_and_unlimited(monkeypatch):
+    monkeypatch.setattr(output_budget, "DEFAULT_OUTPUT_MODE", "exhaustive")
+    budget = output_budget.for_media(3600, default_max_tokens=8000)
+
+    assert output_budget.current_mode() == "exhaustive"
+    assert (budget.words, budget.max_tokens, budget.instruction()) == (None, 8000, "")
+    assert output_budget.cache_parts() == ()
+
+
+def test_job_mode_applies_inside_the_block_only():
+    with output_budget.job_mode("quick"):
+        assert output_budget.current_mode() == "quick"
+        assert output_budget.cache_parts() == ("quick",)
+        assert output_budget.verbosity() == "low"
+    assert output_budget.current_mode() == output_budget.DEFAULT_OUTPUT_MODE
+
+
+def test_job_mode_is_per_context():
+    with output_budget.job_mode("quick"):
+        other = contextvars.Context().run(output_budget.current_mode)
+    assert other == output_budget.DEFAULT_OUTPUT_MODE
+
+
+def test_unknown_mode_falls_back_to_the_default():
+    with output_budget.job_mode("verbose"):
+        assert output_budget.current_mode() == output_budget.DEFAULT_OUTPUT_MODE
+
+
+def test_media_budget_scales_with_length_within_bounds():
+    settings = output_budget.MODES["standard"]
+
+    assert output_budget.for_media(60, mode="standard").words == settings["min_words"]
+    assert output_budget.for_media(20 * 60, mode="standard").words == 20 * settings["words_per_minute"]
+    assert output_budget.for_media(10 * 3600, mode="standard").words == settings["max_words"]
+    assert output_budget.for_media(20 * 60, mode="quick").words < output_budget.for_media(20 * 60, mode="standard").words
+
+
+def test_text_and_transcript_budgets():
+    pages = 10 * output_budget.WORDS_PER_PAGE
+    assert output_budget.for_text(pages, mode="standard").words == 10 * output_budget.MODES["standard"]["words_per_page"]
+
+    transcript = "word " * (20 * output_budget.SPOKEN_WORDS_PER_MINUTE)
+    assert output_budget.for_transcript(transcript, mode="standard").words == output_budget.for_media(20 * 60, mode="standard").words
+
+
+def test_max_tokens_follows_the_word_target_but_never_exceeds_the_default():
+    budget = output_budget.Budget(1000)
+    assert budget.max_tokens == int(1000 * output_budget.TOKENS_PER_WORD * output_budget.MAX_TOKENS_HEADROOM)
+    assert output_budget.Budget(1000, default_max_tokens=500).max_tokens == 500
+
+
+def test_instruction_states_the_target_and_section_split():
+    text = output_budget.Budget(400).instruction({"Overview": 100, "Plan": 300})
+    assert "about 400 words" in text and "Overview ~100 words; Plan ~300 words" in text
+
+
+def test_reduce_budgets_use_the_plan_ceiling_for_plans():
+    settings = output_budget.MODES["quick"]
+    assert output_budget.for_reduce(100_000, mode="quick").words == settings["max_reduce_words"]
+    assert output_budget.for_reduce(100_000, plan=True, mode="quick").words == settings["max_plan_words"]
+    assert output_budget.for_reduce(100_000, mode="exhaustive").words is None
+
+
+def test_delta_budget_grows_the_existing_section():
+    settings = output_budget.MODES["standard"]
+    budget = output_budget.for_delta(800, 1000, mode="standard")
+    assert budget.words == 800 + int(1000 * settings["reduce_ratio"])
+
+
+def test_delta_budget_is_capped_at_max_reduce_words():
+    settings = output_budget.MODES["quick"]
+    assert output_budget.for_delta(settings["max_reduce_words"], 1000, mode="quick").words == settings["max_reduce_words"]
+    assert output_budget.for_delta(10_000, 1000, mode="quick").words == settings["max_reduce_words"]
+
+
+@pytest.mark.parametrize("weights", [{"a": 1, "b": 3}, {"a": 0, "b": 0}])
+def test_allocate_splits_words_by_weight(weights):
+    split = output_budget.allocate(400, weights)
+    assert set(split) == {"a", "b"}
+    assert all(words >= 1 for words in split.values())
+    if weights["a"]:
+        assert split == {"a": 100, "b": 300}
@@ -0,0 +1,74 @@
+import json
+import types
+
+import providers
+
+
+class FakeOpenAI:
+    """Records the calls an OpenAIChatProvider makes."""
+
+    def __init__(self):
+        self.calls = []
+        self.responses = types.SimpleNamespace(create=self._responses)
+        self.chat = types.SimpleNamespace(completions=types.SimpleNamespace(create=self._chat))
+        self.files = types.SimpleNamespace(create=self._file)
+        self.batches = types.SimpleNamespace(create=lambda **kwargs: types.SimpleNamespace(id="batch_1"))
+
+    def _responses(self, **kwargs):
+        self.calls.append(("responses", kwargs))
+        return types.SimpleNamespace(output_text="reply")
+
+    def _chat(self, **kwargs):
+        self.calls.append(("chat", kwargs))
+        message = types.SimpleNamespace(content="reply")
+        return types.SimpleNamespace(choices=[types.SimpleNamespace(message=message)])
+
+    def _file(self, file, purpose):
+        self.calls.append(("batch", [json.loads(line)["body"] for line in file[1].decode("utf-8").splitlines()]))
+        return types.SimpleNamespace(id="file_1")
+
+
+def _provider():
+    provider = providers.OpenAIChatProvider.__new__(providers.OpenAIChatProvider)
+    provider.client = FakeOpenAI()
+    return provider
+
+
+MESSAGES = [{"role": "user", "content": "summarize"}]
+
+
+def test_reasoning_models_use_the_responses_api_even_when_routed_without_options():
+    provider = _provider()
+    assert provider.complete(MESSAGES, "gpt-5", max_tokens=500, temperature=0.5) == "reply"
+
+    api, kwargs = provider.client.calls[0]
+    assert api == "responses"
+    assert kwargs["max_output_tokens"] == 500
+    assert "temperature" not in kwargs and "max_tokens" not in kwargs
+
+
+def test_other_models_use_chat_completions_even_with_reasoning_options():
+    provider = _provider()
+    provider.complete(MESSAGES, "gpt-4.1-mini", max_tokens=500, temperature=0.5, verbosity="high", reasoning="low")
+
+    api, kwargs = provider.client.calls[0]
+    assert api == "chat"
+    assert (kwargs["max_tokens"], kwargs["temperature"]) == (500, 0.5)
+
+
+def test_streaming_a_reasoning_model_returns_the_whole_reply():
+    provider = _provider()
+    assert list(provider.stream(MESSAGES, "gpt-5-mini", max_tokens=100, temperature=0.5)) == ["reply"]
+    assert provider.client.calls[0][0] == "responses"
+
+
+def test_batch_bodies_follow_the_model_family():
+    provider = _provider()
+    provider.submit_batch([
+        {"custom_id": "a", "messages": MESSAGES, "model": "gpt-5", "max_tokens": 100, "temperature": 0.5},
+        {"custom_id": "b", "messages": MESSAGES, "model": "gpt-4.1-mini", "max_tokens": 100, "temperature": 0.5},
+    ])
+
+    reasoning, chat = provider.client.calls[0][1]
+    assert reasoning == {"model": "gpt-5", "messages": MESSAGES, "max_completion_tokens": 100}
+    assert chat == {"model": "gpt-4.1-mini", "messages": MESSAGES, "max_tokens": 100, "temperature": 0.5}
@@ -0,0 +1,51 @@
+import os
+import threading
+
+import pytest
+
+import summary_cache
+
+
+@pytest.fixture(autouse=True)
+def cache_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(summary_cache, "CACHE_DIR", str(tmp_path / "summaries"))
+    return tmp_path / "summaries"
+
+
+def test_round_trip_and_keys():
+    key = summary_cache.cache_key("document", "abc", "quick")
+    assert key != summary_cache.cache_key("document", "abc")
+    assert summary_cache.get_cached_summary(key) is None
+
+    summary_cache.put_cached_summary(key, "summary")
+    assert summary_cache.get_cached_summary(key) == "summary"
+
+
+def test_empty_and_partial_summaries_are_not_cached():
+    summary_cache.put_cached_summary("k1", "")
+    summary_cache.put_cached_summary("k2", summary_cache.PartialSummary("only the first half"))
+
+    assert summary_cache.get_cached_summary("k1") is None
+    assert summary_cache.get_cached_summary("k2") is None
+    assert summary_cache.is_partial(summary_cache.PartialSummary("x"))
+    assert not summary_cache.is_partial("x")
+
+
+def test_concurrent_writers_of_one_key_do_not_collide(cache_dir):
+    errors = []
+
+    def write(i):
+        try:
+            summary_cache.put_cached_summary("same-key", f"summary {i}")
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=write, args=(i,)) for i in range(32)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert errors == []
+    assert summary_cache.get_cached_summary("same-key").startswith("summary ")
+    assert [name for name in os.listdir(cache_dir / "sa") if name.endswith(".tmp")] == []
@@ -0,0 +1,59 @@
+import pytest
+
+import transcript_utils
+
+
+@pytest.fixture(autouse=True)
+def word_tokens(monkeypatch):
+    # One token per word keeps window sizes independent of the tokenizer installed
+    monkeypatch.setattr(transcript_utils, "count_tokens", lambda text: len(text.split()))
+
+
+def _segments(*texts, length=10.0):
+    return [{"start": i * length, "end": (i + 1) * length, "text": text} for i, text in enumerate(texts)]
+
+
+def test_group_segments_fills_windows_up_to_max_tokens():
+    windows = list(transcript_utils.group_segments(_segments("a b", "c d", "e f", "g"), max_tokens=4))
+
+    assert [w["text"] for w in windows] == ["a b c d", "e f g"]
+    assert [w["tokens"] for w in windows] == [4, 3]
+    assert (windows[0]["start"], windows[0]["end"]) == (0.0, 20.0)
+    assert (windows[1]["start"], windows[1]["end"]) == (20.0, 40.0)
+
+
+def test_group_segments_keeps_an_oversized_segment_whole():
+    windows = list(transcript_utils.group_segments(_segments("a", "b c d e f", "g"), max_tokens=3))
+    assert [w["text"] for w in windows] == ["a", "b c d e f", "g"]
+
+
+def test_group_segments_by_time_only():
+    windows = list(transcript_utils.group_segments(_segments("a", "b", "c", "d", "e"), max_tokens=None, max_seconds=20))
+
+    assert [w["text"] for w in windows] == ["a b", "c d", "e"]
+    assert all(w["end"] - w["start"] <= 20 for w in windows)
+
+
+def test_group_segments_yields_each_window_as_soon_as_it_is_full():
+    consumed = []
+
+    def live():
+        for segment in _segments("a b", "c d", "e f"):
+            consumed.append(segment["text"])
+            yield segment
+
+    windows = transcript_utils.group_segments(live(), max_tokens=2)
+    assert next(windows)["text"] == "a b"
+    assert consumed == ["a b", "c d"]
+
+
+def test_group_segments_skips_blank_text_and_handles_no_segments():
+    windows = list(transcript_utils.group_segments(_segments("a", "  ", "b"), max_tokens=10))
+
+    assert windows[0]["text"] == "a b"
+    assert list(transcript_utils.group_segments([])) == []
+
+
+def test_format_timestamp():
+    assert transcript_utils.format_timestamp(65) == "1:05"
+    assert transcript_utils.format_timestamp(3723.9) == "1:02:03"
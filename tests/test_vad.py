@@ -0,0 +1,67 @@
+import pytest
+
+np = pytest.importorskip("numpy")
+
+import vad
+
+RATE = 1000  # small sample rate keeps the synthetic audio tiny
+
+
+def _tone(seconds, amplitude=0.5):
+    t = np.arange(int(seconds * RATE)) / RATE
+    return (amplitude * np.sin(2 * np.pi * 50 * t)).astype(np.float32)
+
+
+def _silence(seconds):
+    return np.zeros(int(seconds * RATE), dtype=np.float32)
+
+
+def test_time_map_maps_compressed_times_back_to_the_original():
+    # Speech at 10-12s and 30-31s of the original, joined by a 0.3s gap
+    time_map = vad.TimeMap([(0.0, 10.0, 2.0), (2.3, 30.0, 1.0)])
+
+    assert time_map.to_original(0.0) == 10.0
+    assert time_map.to_original(1.5) == 11.5
+    assert time_map.to_original(2.3) == 30.0
+    assert time_map.to_original(2.8) == pytest.approx(30.5)
+
+
+def test_time_map_clamps_times_inside_a_gap_to_the_end_of_the_piece():
+    time_map = vad.TimeMap([(0.0, 10.0, 2.0), (2.3, 30.0, 1.0)])
+    assert time_map.to_original(2.1) == 12.0
+
+
+def test_empty_time_map_is_the_identity():
+    assert vad.TimeMap([]).to_original(4.2) == 4.2
+
+
+def test_detect_speech_finds_the_voiced_regions():
+    audio = np.concatenate([_silence(3), _tone(2), _silence(4), _tone(1), _silence(2)])
+    regions = vad.detect_speech(audio, RATE)
+
+    assert len(regions) == 2
+    assert regions[0][0] == pytest.approx(3 - vad.VAD_PADDING, abs=0.05)
+    assert regions[0][1] == pytest.approx(5 + vad.VAD_PADDING, abs=0.05)
+    assert regions[1][0] == pytest.approx(9 - vad.VAD_PADDING, abs=0.05)
+
+
+def test_detect_speech_ignores_short_blips_and_quiet_noise():
+    audio = np.concatenate([_silence(2), _tone(0.06), _silence(2), _tone(2, amplitude=1e-4), _silence(1)])
+    assert vad.detect_speech(audio, RATE) == []
+
+
+def test_compress_silence_keeps_speech_and_maps_its_times():
+    audio = np.concatenate([_silence(3), _tone(2), _silence(4), _tone(1)])
+    compressed, time_map = vad.compress_silence(audio, [(3.0, 5.0), (9.0, 10.0)], RATE, gap=0.5)
+
+    assert len(compressed) == int(3.5 * RATE)
+    assert time_map.to_original(0.0) == 3.0
+    assert time_map.to_original(2.5) == 9.0
+
+
+def test_compress_silence_merges_overlapping_regions():
+    audio = _tone(10)
+    compressed, time_map = vad.compress_silence(audio, [(4.0, 6.0), (1.0, 3.0), (2.0, 5.0)], RATE, gap=0.5)
+
+    assert len(compressed) == 5 * RATE
+    assert time_map.pieces == [(0.0, 1.0, 5.0)]
@@ -0,0 +1,52 @@
+import os
+from providers import count_tokens
+
+# === Configuration ===
+WINDOW_TOKENS = int(os.getenv("TRANSCRIPT_WINDOW_TOKENS", "3000"))  # transcript tokens per summarized window
+
+
+def segments_from_api(entries):
+    """YouTube transcript API entries ({"text", "start", "duration"}) -> {"start", "end", "text"} segments."""
+    return [{"start": e["start"], "end": e["start"] + e.get("duration", 0.0), "text": e["text"]} for e in entries]
+
+
+def segments_text(segments):
+    return " ".join(s["text"].strip() for s in segments if s["text"].strip())
+
+
+def format_timestamp(seconds):
+    """1:02:03 / 4:05 style timestamps."""
+    seconds = int(seconds)
+    hours, rest = divmod(seconds, 3600)
+    minutes, secs = divmod(rest, 60)
+    return f"{hours}:{minutes:02d}:{secs:02d}" if hours else f"{minutes}:{secs:02d}"
+
+
+def _window(segments, tokens):
+    return {
+        "start": segments[0]["start"],
+        "end": segments[-1]["end"],
+        "text": segments_text(segments),
+        "tokens": tokens,
+    }
+
+
+def group_segments(segments, max_tokens=WINDOW_TOKENS, max_seconds=None):
+    """
+    Lazily group timed {"start", "end", "text"} segments into windows of about max_tokens
+    (and, when max_seconds is set, no longer than max_seconds of media; max_tokens=None groups by time only).
+    Works on a live segment stream: each window is yielded as soon as it is full.
+    Yields {"start", "end", "text", "tokens"}.
+    """
+    current, tokens = [], 0
+    for segment in segments:
+        segment_tokens = count_tokens(segment["text"]) if max_tokens is not None else 0
+        too_long = max_seconds is not None and current and segment["end"] - current[0]["start"] > max_seconds
+        too_big = max_tokens is not None and tokens + segment_tokens > max_tokens
+        if current and (too_big or too_long):
+            yield _window(current, tokens)
+            current, tokens = [], 0
+        current.append(segment)
+        tokens += segment_tokens
+    if current:
+        yield _window(current, tokens)
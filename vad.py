@@ -0,0 +1,121 @@
+import os
+import bisect
+import subprocess
+import numpy as np
+
+# === Configuration ===
+SAMPLE_RATE = 16000                                                # what both Whisper engines expect
+VAD_ENABLED = os.getenv("VAD_ENABLED", "true").lower() == "true"
+VAD_FRAME_MS = 30
+VAD_THRESHOLD_DB = float(os.getenv("VAD_THRESHOLD_DB", "10"))      # dB above the noise floor that counts as speech
+VAD_MIN_LEVEL_DB = float(os.getenv("VAD_MIN_LEVEL_DB", "-50"))     # never treat anything quieter than this as speech
+VAD_MIN_SILENCE = float(os.getenv("VAD_MIN_SILENCE", "1.0"))       # shorter pauses are kept as-is
+VAD_MIN_SPEECH = float(os.getenv("VAD_MIN_SPEECH", "0.25"))        # shorter blips (clicks, coughs) are dropped
+VAD_PADDING = float(os.getenv("VAD_PADDING", "0.2"))               # kept around each speech region
+VAD_GAP = 0.3                                                      # silence left between joined regions
+
+
+# === Decoding ===
+def load_audio(path, sample_rate=SAMPLE_RATE):
+    """Decode any audio/video file to mono float32 PCM with ffmpeg (same as whisper.load_audio)."""
+    cmd = ["ffmpeg", "-nostdin", "-threads", "0", "-i", path,
+           "-f", "s16le", "-ac", "1", "-acodec", "pcm_s16le", "-ar", str(sample_rate), "-"]
+    out = subprocess.run(cmd, capture_output=True, check=True).stdout
+    return np.frombuffer(out, np.int16).astype(np.float32) / 32768.0
+
+
+# === Detection ===
+def frame_levels(audio, sample_rate=SAMPLE_RATE, frame_ms=VAD_FRAME_MS):
+    """RMS level of each frame in dBFS."""
+    frame = int(sample_rate * frame_ms / 1000)
+    count = len(audio) // frame
+    if count == 0:
+        return np.zeros(0, dtype=np.float32)
+    frames = audio[:count * frame].reshape(count, frame)
+    rms = np.sqrt(np.mean(frames * frames, axis=1))
+    return 20 * np.log10(np.maximum(rms, 1e-10))
+
+
+def detect_speech(audio, sample_rate=SAMPLE_RATE):
+    """
+    Energy-based voice activity detection. Returns [(start_s, end_s)] speech regions.
+    The threshold adapts to the recording: frames well above its noise floor count as speech.
+    """
+    levels = frame_levels(audio, sample_rate)
+    if len(levels) == 0:
+        return []
+    frame_s = VAD_FRAME_MS / 1000
+    noise_floor = np.percentile(levels, 10)
+    threshold = max(noise_floor + VAD_THRESHOLD_DB, VAD_MIN_LEVEL_DB)
+    voiced = levels > threshold
+
+    # Runs of voiced frames -> regions
+    edges = np.diff(np.concatenate(([0], voiced.astype(np.int8), [0])))
+    starts = np.flatnonzero(edges == 1) * frame_s
+    ends = np.flatnonzero(edges == -1) * frame_s
+
+    regions = []
+    for start, end in zip(starts, ends):
+        if regions and start - regions[-1][1] < VAD_MIN_SILENCE:
+            regions[-1][1] = end  # short pause: part of the same utterance
+        else:
+            regions.append([start, end])
+
+    total = len(audio) / sample_rate
+    return [(max(0.0, start - VAD_PADDING), min(total, end + VAD_PADDING))
+            for start, end in regions if end - start >= VAD_MIN_SPEECH]
+
+
+# === Compression & Time Mapping ===
+class TimeMap:
+    """Maps a time in the compressed audio back to the original media."""
+
+    def __init__(self, pieces):
+        self.pieces = pieces  # [(compressed_start, original_start, length)]
+        self._starts = [p[0] for p in pieces]
+
+    def to_original(self, t):
+        if not self.pieces:
+            return t
+        i = max(0, bisect.bisect_right(self._starts, t) - 1)
+        compressed_start, original_start, length = self.pieces[i]
+        return original_start + min(max(0.0, t - compressed_start), length)
+
+
+def compress_silence(audio, regions, sample_rate=SAMPLE_RATE, gap=VAD_GAP):
+    """Keep only the speech regions, joined by short gaps. Returns (compressed_audio, TimeMap)."""
+    silence = np.zeros(int(gap * sample_rate), dtype=audio.dtype)
+    parts, pieces = [], []
+    position = 0.0
+    for i, (start, end) in enumerate(_merge_overlaps(regions)):
+        if i:
+            parts.append(silence)
+            position += gap
+        chunk = audio[int(start * sample_rate):int(end * sample_rate)]
+        parts.append(chunk)
+        pieces.append((position, start, len(chunk) / sample_rate))
+        position += len(chunk) / sample_rate
+    if not parts:
+        return np.zeros(0, dtype=audio.dtype), TimeMap([])
+    return np.concatenate(parts), TimeMap(pieces)
+
+
+def _merge_overlaps(regions):
+    merged = []
+    for start, end in sorted(regions):
+        if merged and start <= merged[-1][1]:
+            merged[-1][1] = max(merged[-1][1], end)
+        else:
+            merged.append([start, end])
+    return merged
+
+
+def remove_silence(path, sample_rate=SAMPLE_RATE):
+    """
+    Decode path and drop its non-speech stretches.
+    Returns (compressed_audio, TimeMap, original_duration_s).
+    """
+    audio = load_audio(path, sample_rate)
+    regions = detect_speech(audio, sample_rate)
+    compressed, time_map = compress_silence(audio, regions, sample_rate)
+    return compressed, time_map, len(audio) / sample_rate
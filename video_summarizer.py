@@ -1,34 +1,39 @@
-import whisper
-from openai import OpenAI
 import os
-import re
+import hashlib
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
+import model_router
+import output_budget
+from compression import compress_source
+from summary_cache import PartialSummary, cache_key, get_cached_summary, put_cached_summary
+from metrics import traced
+from transcript_utils import group_segments, format_timestamp
+import asr_pool
 
 load_dotenv()
-# Initialize OpenAI client
-openai_api_key = os.getenv("OPENAI_API_KEY")
+# Summarize transcript windows while Whisper is still transcribing, then merge them
+SUMMARY_STREAMING = os.getenv("SUMMARY_STREAMING", "true").lower() == "true"
+STREAM_WORKERS = int(os.getenv("SUMMARY_STREAM_WORKERS", "4"))
 
-client = OpenAI(api_key=openai_api_key)
-
-# Load Whisper model
-whisper_model = whisper.load_model("base")  # You can use "small", "medium", or "large"
 
 def transcribe_video(video_path):
-    """Transcribe the audio from a video file using Whisper."""
+    """Transcribe the audio from a video file on the ASR pool (in-process if no pool is running)."""
     print("🎧 Transcribing video...")
     try:
-        result = whisper_model.transcribe(video_path)
-        return result["text"]
+        return asr_pool.transcribe(video_path)["text"]
     except Exception as e:
         print(f"❌ Transcription failed: {e}")
-        return e
+        return None
 
 def summarize_text(text):
     """Use OpenAI GPT to summarize the text."""
     print("🧠 Summarizing transcript...")
+    budget = output_budget.for_transcript(text, default_max_tokens=10000)
+    text = compress_source(text, "video.transcript")
     try:
-        response = client.chat.completions.create(
-            model="gpt-4.1-mini",
+        content = model_router.complete(
+            "video.transcript",
             messages=[
                 {
                     "role": "system",
@@ -47,23 +52,154 @@ def summarize_text(text):
                         "- Summary should be detailed\n "
                         "- Create headings for each section if the text is divided into parts.\n"
                         f"Transcript:\n{text}"
+                        f"{budget.instruction()}"
                     )
                 }
             ],
             temperature=0.5,
-            max_tokens=10000
+            max_tokens=budget.max_tokens
         )
-        return response.choices[0].message.content.strip()
+        return content.strip()
     except Exception as e:
         print(f"❌ Summarization failed: {e}")
         return None
 
+def summarize_window(window):
+    """
+    Summarize one time window of a transcript (part of the streaming mode). Window summaries are
+    cached by their text, so a rerun after a failed transcription only pays for the windows it lacked.
+    """
+    span = f"{format_timestamp(window['start'])}–{format_timestamp(window['end'])}"
+    key = cache_key("video.window", hashlib.sha256(window["text"].encode("utf-8")).hexdigest(),
+                    *output_budget.cache_parts())
+    cached = get_cached_summary(key)
+    if cached:
+        print(f"♻️ Reusing summary of transcript window {span}")
+        return cached
+    print(f"🧠 Summarizing transcript window {span}...")
+    budget = output_budget.for_media(window["end"] - window["start"], default_max_tokens=4000)
+    text = compress_source(window["text"], "video.window")
+    try:
+        content = model_router.complete(
+            "video.window",
+            messages=[
+                {
+                    "role": "system",
+                    "content": "You are a helpful assistant that summarizes transcripts clearly."
+                },
+                {
+                    "role": "user",
+                    "content": (
+                        f"Below is the part of a recording from {span}. Summarize it thoroughly. Your summary should:\n"
+                        "- Use clear and simple English\n"
+                        "- Be organized into logical, well-structured paragraphs\n"
+                        "- Include all topics, events, and ideas in this part, in order\n"
+                        "- Highlight key points, arguments, or facts\n"
+                        "- Create headings for each section if the text is divided into parts.\n"
+                        f"Transcript:\n{text}"
+                        f"{budget.instruction()}"
+                    )
+                }
+            ],
+            temperature=0.5,
+            max_tokens=budget.max_tokens
+        )
+        put_cached_summary(key, content.strip())
+        return content.strip()
+    except Exception as e:
+        print(f"❌ Summarization of window {span} failed: {e}")
+        return None
+
+def merge_summaries(partials, seconds=None):
+    """Final pass: merge the window summaries (in order) into one summary of a recording seconds long."""
+    if len(partials) == 1:
+        return partials[0]
+    print(f"🧩 Merging {len(partials)} partial summaries...")
+    sections = "\n\n".join(f"PART {i + 1}:\n{text}" for i, text in enumerate(partials))
+    if seconds:
+        budget = output_budget.for_media(seconds, default_max_tokens=10000)
+    else:
+        budget = output_budget.for_reduce(len(sections.split()), default_max_tokens=10000)
+    try:
+        content = model_router.complete(
+            "video.merge",
+            messages=[
+                {
+                    "role": "system",
+                    "content": "You are a helpful assistant that summarizes transcripts clearly."
+                },
+                {
+                    "role": "user",
+                    "content": (
+                        "The following are summaries of consecutive parts of one recording. "
+                        "Merge them into a single detailed summary. Your summary should:\n"
+                        "- Keep the order and flow of the recording\n"
+                        "- Remove repetition between parts without dropping any topic, fact, or example\n"
+                        "- Be organized into logical, well-structured paragraphs with headings for each section\n\n"
+                        f"{sections}"
+                        f"{budget.instruction()}"
+                    )
+                }
+            ],
+            temperature=0.5,
+            max_tokens=budget.max_tokens
+        )
+        return content.strip()
+    except Exception as e:
+        print(f"❌ Merging summaries failed: {e}")
+        return "\n\n".join(partials)
+
+def _until_failure(segments, failures):
+    """Pass segments through; on an error, record it and end the stream so the last window still gets flushed."""
+    try:
+        yield from segments
+    except Exception as e:
+        failures.append(e)
+
+@traced("summary.video_stream")
+def summarize_video_streaming(video_path):
+    """
+    Transcribe and summarize at the same time: every window of transcript is handed to the
+    LLM as soon as ASR has produced it, so only the last window and the merge wait on ASR.
+    If transcription fails part-way, or a window cannot be summarized, the rest is still summarized
+    and returned as a PartialSummary that names what is missing.
+    """
+    print("🎧 Transcribing and summarizing video...")
+    windows, futures = [], []
+    duration = 0.0
+    failures = []
+    with ThreadPoolExecutor(max_workers=STREAM_WORKERS) as pool:
+        for window in group_segments(_until_failure(asr_pool.transcribe_stream(video_path), failures)):
+            duration = window["end"]
+            windows.append(window)
+            # copy_context so LLM spans stay attached to this job
+            futures.append(pool.submit(contextvars.copy_context().run, summarize_window, window))
+        if failures:
+            print(f"❌ Transcription failed at {format_timestamp(duration)}: {failures[0]}")
+    results = [f.result() for f in futures]
+    partials = [p for p in results if p]
+    if not partials:
+        return None
+    summary = merge_summaries(partials, duration)
+    missing = [f"{format_timestamp(w['start'])}–{format_timestamp(w['end'])}"
+               for w, result in zip(windows, results) if not result]
+    notes = []
+    if failures:
+        notes.append(f"⚠️ Transcription stopped at {format_timestamp(duration)} ({failures[0]}); "
+                     "this summary covers the recording up to that point.")
+    if missing:
+        notes.append(f"⚠️ These parts of the recording could not be summarized and are missing: {', '.join(missing)}.")
+    if not notes:
+        return summary
+    return PartialSummary("\n".join(notes) + f"\n\n{summary}")
+
 def save_summary(filename, summary):
     """Save summary to a text file."""
     with open(filename, "w", encoding="utf-8") as f:
         f.write(summary)
     print(f"\n💾 Summary saved to '{filename}'")
 
+@traced("summary.video")
 def get_summary_from_video(video_path):
     """
     Main function to call: Transcribes and summarizes the given video file.
@@ -73,6 +209,9 @@ def get_summary_from_video(video_path):
         print("❌ File not found.")
         return None
 
+    if SUMMARY_STREAMING:
+        return summarize_video_streaming(video_path)
+
     transcript = transcribe_video(video_path)
     
     if not transcript:
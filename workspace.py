@@ -0,0 +1,83 @@
+import os
+import time
+import uuid
+import shutil
+
+# === Configuration ===
+WORKSPACE_ROOT = os.getenv("WORKSPACE_ROOT", "workspaces")
+WORKSPACE_MAX_AGE_HOURS = float(os.getenv("WORKSPACE_MAX_AGE_HOURS", "24"))
+SUBDIRS = ("uploads", "data", "extracted", "logs", "checkpoints", "outputs")
+
+
+# === Workspace Layout ===
+def create_workspace(workspace_id=None):
+    """Create (or reuse) an isolated workspace directory and return its path."""
+    workspace_id = workspace_id or uuid.uuid4().hex[:12]
+    return ensure_workspace(os.path.join(WORKSPACE_ROOT, workspace_id))
+
+
+def ensure_workspace(workspace_dir):
+    """Make sure all subdirectories of an existing workspace path exist."""
+    for name in SUBDIRS:
+        os.makedirs(os.path.join(workspace_dir, name), exist_ok=True)
+    return workspace_dir
+
+
+def get_workspace_paths(workspace_dir):
+    """All paths a session or job is allowed to write to."""
+    return {
+        "root": workspace_dir,
+        "uploads": os.path.join(workspace_dir, "uploads"),
+        "data": os.path.join(workspace_dir, "data"),
+        "extracted": os.path.join(workspace_dir, "extracted"),  # plain text pulled out of the files in data
+        "logs": os.path.join(workspace_dir, "logs"),
+        "checkpoints": os.path.join(workspace_dir, "checkpoints"),
+        "outputs": os.path.join(workspace_dir, "outputs"),
+        "transcripts": os.path.join(workspace_dir, "data", "merged_transcripts.docx"),
+        "reddit": os.path.join(workspace_dir, "data", "reddit_combined_text.docx"),
+        "web": os.path.join(workspace_dir, "data", "extracted_web_content.docx"),
+        "gpt_plan": os.path.join(workspace_dir, "outputs", "gpt_study_plan.docx"),
+        "study_plan": os.path.join(workspace_dir, "outputs", "generated_study_plan.docx"),
+        "guide": os.path.join(workspace_dir, "outputs", "guide.json"),
+    }
+
+
+# === Cleanup ===
+def _last_modified(workspace_dir):
+    # Writes inside subdirectories don't bump the workspace's own mtime
+    paths = [workspace_dir] + [os.path.join(workspace_dir, name) for name in SUBDIRS]
+    return max(os.path.getmtime(path) for path in paths if os.path.exists(path))
+
+
+def clear_directory(directory, keep=()):
+    """Delete the files in one workspace directory (never touches other workspaces)."""
+    removed = 0
+    if not os.path.isdir(directory):
+        return removed
+    keep = {os.path.abspath(path) for path in keep}
+    for filename in os.listdir(directory):
+        file_path = os.path.join(directory, filename)
+        if os.path.isfile(file_path) and os.path.abspath(file_path) not in keep:
+            os.remove(file_path)
+            removed += 1
+    return removed
+
+
+def remove_workspace(workspace_dir):
+    shutil.rmtree(workspace_dir, ignore_errors=True)
+
+
+def cleanup_old_workspaces(max_age_hours=WORKSPACE_MAX_AGE_HOURS):
+    """Remove workspaces that have not been modified for max_age_hours."""
+    if not os.path.isdir(WORKSPACE_ROOT):
+        return 0
+    cutoff = time.time() - max_age_hours * 3600
+    removed = 0
+    for name in os.listdir(WORKSPACE_ROOT):
+        workspace_dir = os.path.join(WORKSPACE_ROOT, name)
+        if os.path.isdir(workspace_dir) and _last_modified(workspace_dir) < cutoff:
+            remove_workspace(workspace_dir)
+            removed += 1
+    if removed:
+        print(f"🧹 Removed {removed} old workspaces")
+    return removed
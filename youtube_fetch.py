@@ -3,6 +3,12 @@ from urllib.parse import urlparse, parse_qs
 from docx import Document
 import time
 import random
+import metrics
+from metrics import traced
+from transcript_utils import segments_from_api, segments_text, group_segments, format_timestamp
+
+# Transcripts are saved as timestamped passages of at most this many seconds
+PASSAGE_SECONDS = 300
 
 def extract_video_id(url):
     """Extract video ID from YouTube URL"""
@@ -14,7 +20,7 @@ def extract_video_id(url):
     return None
 
 def get_transcript_with_rate_limit(video_id, delay=3, max_retries=3):
-    """Extract transcript with rate limiting and retry logic"""
+    """Extract timed transcript segments ({"start", "end", "text"}) with rate limiting and retry logic"""
     
     for attempt in range(max_retries):
         try:
@@ -26,11 +32,10 @@ def get_transcript_with_rate_limit(video_id, delay=3, max_retries=3):
             time.sleep(actual_delay)
             
             # Try to get transcript
-            transcript = YouTubeTranscriptApi.get_transcript(video_id)
-            transcript_text = ' '.join([entry['text'] for entry in transcript])
+            segments = segments_from_api(YouTubeTranscriptApi.get_transcript(video_id))
             
-            print(f"    ✅ Success! Got {len(transcript_text)} characters")
-            return transcript_text
+            print(f"    ✅ Success! Got {len(segments)} segments")
+            return segments
             
         except (NoTranscriptFound, VideoUnavailable) as e:
             print(f"    ❌ No transcript available: ")
@@ -40,6 +45,7 @@ def get_transcript_with_rate_limit(video_id, delay=3, max_retries=3):
             print(f"    ⚠️ Error on attempt {attempt + 1}: {e}")
             
             if attempt < max_retries - 1:
+                metrics.add("retries")
                 # Exponential backoff for retries
                 retry_delay = delay * (2 ** attempt) + random.uniform(1, 3)
                 print(f"    Retrying in {retry_delay:.1f} seconds...")
@@ -50,15 +56,17 @@ def get_transcript_with_rate_limit(video_id, delay=3, max_retries=3):
     
     return None
 
+@traced("render.docx")
 def save_to_docx(transcripts_dict, output_filename="data/merged_transcripts.docx"):
     """Save transcripts to Word document"""
     doc = Document()
     doc.add_heading("Merged Video Transcripts", 0)
 
-    for url, transcript in transcripts_dict.items():
+    for url, segments in transcripts_dict.items():
         doc.add_heading(f"Transcript for: {url}", level=1)
-        if transcript:
-            doc.add_paragraph(transcript)
+        if segments:
+            for passage in group_segments(segments, max_tokens=None, max_seconds=PASSAGE_SECONDS):
+                doc.add_paragraph(f"[{format_timestamp(passage['start'])}] {passage['text']}")
         else:
             doc.add_paragraph("❌ No transcript available.")
 
@@ -72,7 +80,8 @@ def save_log(bad_urls, log_filename="logs/transcript_log.txt"):
             f.write(f"{url} - ❌ {reason}\n")
     print(f"📝 Log saved to: {log_filename}")
 
-def main(urls):
+@traced("fetch.youtube")
+def main(urls, output_filename="data/merged_transcripts.docx", log_filename="logs/transcript_log.txt"):
     """Main function using only Method 2 (Rate-limited API)"""
 
 
@@ -102,7 +111,7 @@ def main(urls):
         
         if transcript:
             transcripts[url] = transcript
-            print(f"  ✅ Success! Transcript length: {len(transcript)} characters\n")
+            print(f"  ✅ Success! Transcript length: {len(segments_text(transcript))} characters\n")
         else:
             transcripts[url] = None
             bad_urls[url] = "Transcript not available or rate limited"
@@ -114,10 +123,10 @@ def main(urls):
             time.sleep(5)
 
     print("📄 Saving results...")
-    save_to_docx(transcripts)
+    save_to_docx(transcripts, output_filename)
     
     if bad_urls:
-        save_log(bad_urls)
+        save_log(bad_urls, log_filename)
         print(f"\n⚠️ {len(bad_urls)} URLs failed:")
         for url, reason in bad_urls.items():
             print(f"  - {url}: {reason}")
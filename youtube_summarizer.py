@@ -1,30 +1,40 @@
 from youtube_transcript_api import YouTubeTranscriptApi
 from pytube import YouTube
-from openai import OpenAI
-import whisper
 import yt_dlp
 import re
 import os
+import uuid
+import tempfile
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
+import model_router
+import output_budget
+from compression import compress_source
+from metrics import traced
+from summary_cache import PartialSummary
+from transcript_utils import segments_from_api, segments_text, group_segments, format_timestamp
+import asr_pool
 
 load_dotenv()
-# Initialize OpenAI client with your API key
-openai_api_key = os.getenv("OPENAI_API_KEY")
-client = OpenAI(api_key=openai_api_key)
-whisper_model = whisper.load_model("base")  # Or 'small', 'medium', 'large'
+# Long videos are summarized as time-aligned chunks in parallel, each under a timestamped heading
+CHUNK_SECONDS = float(os.getenv("YOUTUBE_CHUNK_SECONDS", "900"))
+CHUNK_TOKENS = int(os.getenv("YOUTUBE_CHUNK_TOKENS", "6000"))
+SUMMARY_WORKERS = int(os.getenv("YOUTUBE_SUMMARY_WORKERS", "4"))
 
 def extract_video_id(youtube_url):
     match = re.search(r"(?:v=|youtu\.be/)([a-zA-Z0-9_-]{11})", youtube_url)
     return match.group(1) if match else None
 
+@traced("fetch.youtube_transcript")
 def get_youtube_transcript(video_id):
+    """Timed transcript segments ({"start", "end", "text"}), or None if YouTube has none."""
     try:
-        transcript_list = YouTubeTranscriptApi.get_transcript(video_id)
-        full_text = " ".join([segment["text"] for segment in transcript_list])
-        return full_text
+        return segments_from_api(YouTubeTranscriptApi.get_transcript(video_id))
     except Exception as e:
         return None  # Indicate failure
 
+@traced("fetch.youtube_audio")
 def download_audio_with_ytdlp(youtube_url, filename="temp_audio.mp3"):
     ydl_opts = {
         'format': 'bestaudio/best',
@@ -46,16 +56,17 @@ def download_audio_with_ytdlp(youtube_url, filename="temp_audio.mp3"):
 
 def transcribe_audio_with_whisper(audio_path):
     try:
-        result = whisper_model.transcribe(audio_path)
-        return result['text']
+        return asr_pool.transcribe(audio_path)["segments"]
     except Exception as e:
         print(f"❌ Whisper transcription error: {e}")
         return None
 
-def summarize_text(text):
+def summarize_text(text, budget=None):
+    budget = budget or output_budget.for_transcript(text, default_max_tokens=10000)
+    text = compress_source(text, "youtube.transcript")
     try:
-        response = client.chat.completions.create(
-            model="gpt-4.1-mini",
+        content = model_router.complete(
+            "youtube.transcript",
             messages=[
                 {
                     "role": "system",
@@ -75,46 +86,90 @@ def summarize_text(text):
                         "- Create headings for each section if the text is divided into parts.\n"
 
                         f"Transcript:\n{text}"
+                        f"{budget.instruction()}"
                     )
                 }
             ],
             temperature=0.5,
-            max_tokens=10000
+            max_tokens=budget.max_tokens
         )
-        return response.choices[0].message.content.strip()
+        return content.strip()
     except Exception as e:
-        return f"Error summarizing: {e}"
+        print(f"❌ Error summarizing transcript: {e}")
+        return None
+
+def chapter_link(youtube_url, seconds):
+    video_id = extract_video_id(youtube_url)
+    return f"https://www.youtube.com/watch?v={video_id}&t={int(seconds)}s"
+
+@traced("summary.youtube_chunks")
+def summarize_segments(youtube_url, segments):
+    """
+    Summarize a timed transcript. Short videos get one summary as before; longer ones are split into
+    time-aligned chunks that are summarized in parallel, each under a "start–end" heading linking to that moment.
+    If some chunks cannot be summarized, the rest is returned as a PartialSummary that names the missing
+    time ranges; None if nothing could be summarized.
+    """
+    chunks = list(group_segments(segments, max_tokens=CHUNK_TOKENS, max_seconds=CHUNK_SECONDS))
+    if len(chunks) <= 1:
+        seconds = segments[-1]["end"] - segments[0]["start"] if segments else 0
+        return summarize_text(segments_text(segments), output_budget.for_media(seconds, default_max_tokens=10000))
+
+    print(f"✂️ Summarizing {len(chunks)} time-aligned chunks in parallel...")
+    with ThreadPoolExecutor(max_workers=SUMMARY_WORKERS) as pool:
+        # copy_context so LLM spans stay attached to this job
+        futures = [pool.submit(contextvars.copy_context().run, summarize_text, chunk["text"],
+                               output_budget.for_media(chunk["end"] - chunk["start"], default_max_tokens=10000))
+                   for chunk in chunks]
+        summaries = [f.result() for f in futures]
+
+    if not any(summaries):
+        return None
+    sections, missing = [], []
+    for chunk, summary in zip(chunks, summaries):
+        heading = f"[{format_timestamp(chunk['start'])} – {format_timestamp(chunk['end'])}]"
+        if not summary:
+            missing.append(f"{format_timestamp(chunk['start'])}–{format_timestamp(chunk['end'])}")
+            summary = "⚠️ This part could not be summarized."
+        sections.append(f"## {heading} {chapter_link(youtube_url, chunk['start'])}\n{summary}")
+    summary = "\n\n".join(sections)
+    if not missing:
+        return summary
+    return PartialSummary(f"⚠️ These parts of the video could not be summarized and are missing: "
+                          f"{', '.join(missing)}.\n\n{summary}")
 
 def save_to_txt(filename, summary):
     with open(filename, "w", encoding="utf-8") as f:
         f.write(summary)
     print(f"\n💾 Summary saved to '{filename}'")
 
-def summarize_youtube_video(youtube_url, save=False):
+@traced("summary.youtube")
+def summarize_youtube_video(youtube_url, save=False, work_dir=None):
     video_id = extract_video_id(youtube_url)
     if not video_id:
         return "❌ Invalid YouTube URL."
 
     print("📥 Trying to get transcript from YouTube...")
-    transcript = get_youtube_transcript(video_id)
+    segments = get_youtube_transcript(video_id)
 
-    if not transcript:
+    if not segments:
         print("⚠️ Transcript not found. Falling back to Whisper transcription...")
-        audio_path = "temp_audio.mp3"
+        # Unique name so concurrent jobs never overwrite each other's audio
+        audio_path = os.path.join(work_dir or tempfile.gettempdir(), f"temp_audio_{uuid.uuid4().hex[:8]}.mp3")
         downloaded = download_audio_with_ytdlp(youtube_url, audio_path)
         if not downloaded:
             return "❌ Failed to retrieve transcript via Whisper."
 
-        transcript = transcribe_audio_with_whisper(audio_path)
+        segments = transcribe_audio_with_whisper(audio_path)
         os.remove(audio_path)
 
-        if not transcript:
+        if not segments:
             return "❌ Unable to transcribe audio."
 
     print("\n🧠 Summarizing transcript...")
-    summary = summarize_text(transcript)
+    summary = summarize_segments(youtube_url, segments)
 
-    if save:
+    if save and summary:
         try:
             yt = YouTube(youtube_url)
             title = re.sub(r'[\\/*?:"<>|]', "", yt.title)